@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# benchmarks/bench_http2.py
+
+"""
+Compare image fetching over the default HTTP/1.1 session adapters with the HTTP/2 transport
+(mangascraper.core.http2_transport) against local stand-in mirrors.
+
+Two servers are started on localhost, both serving /galleries/<gallery>/<page>.jpg with a fixed body
+size, an artificial per-response delay (mirror / Tor latency) and an artificial delay before a new connection's
+first response (TLS handshake / Tor stream setup, which localhost doesn't have):
+- an HTTP/1.1 server (http.server), and
+- an HTTP/2 cleartext (h2c, prior knowledge) server built on the h2 library.
+
+Each run downloads --galleries x --pages images with --threads image threads, the same shape as
+download_images_hook (one session.get(stream=True) per page), and reports wall time, throughput and the
+number of TCP connections the server accepted.
+
+Requires httpx and h2 (pip install "manga-scraper[http2]").
+
+    python benchmarks/bench_http2.py --galleries 4 --pages 40 --threads 16 --size 200000 --delay 0.05 --connect-delay 0.3
+"""
+
+import argparse, asyncio, concurrent.futures, os, sys, threading, time
+
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import h2.config, h2.connection, h2.events, h2.settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mangascraper.core.http2_transport import HTTP2Adapter
+
+################################################################################################################
+# STAND-IN SERVERS
+################################################################################################################
+
+class ConnectionCounter:
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self):
+        with self.lock:
+            self.count += 1
+
+def start_http1_server(body: bytes, delay: float, connect_delay: float, counter: ConnectionCounter) -> int:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            counter.add()
+            time.sleep(connect_delay)
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+class H2Protocol(asyncio.Protocol):
+    """
+    Minimal h2c server: answers every GET with the image body after the configured delay.
+    """
+
+    def __init__(self, body: bytes, delay: float, connect_delay: float, counter: ConnectionCounter):
+        self.body = body
+        self.delay = delay
+        self.counter = counter
+        self.ready_at = time.monotonic() + connect_delay
+        self.conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        self.transport = None
+        self.pending = {} # stream id -> remaining body
+
+    def connection_made(self, transport):
+        self.counter.add()
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.conn.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 256})
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        try:
+            events = self.conn.receive_data(data)
+        except Exception:
+            self.transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                # Streams opened before the connection is "ready" also wait out the connect delay.
+                wait = self.delay + max(0.0, self.ready_at - time.monotonic())
+                asyncio.get_running_loop().call_later(wait, self.respond, event.stream_id)
+            elif isinstance(event, (h2.events.WindowUpdated, h2.events.RemoteSettingsChanged)):
+                self.flush()
+            elif isinstance(event, h2.events.StreamReset):
+                self.pending.pop(event.stream_id, None)
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id):
+        self.conn.send_headers(stream_id, [
+            (":status", "200"),
+            ("content-type", "image/jpeg"),
+            ("content-length", str(len(self.body))),
+        ])
+        self.pending[stream_id] = self.body
+        self.flush()
+
+    def flush(self):
+        for stream_id in list(self.pending):
+            data = self.pending[stream_id]
+            while data:
+                window = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+                if window <= 0:
+                    break
+                chunk, data = data[:window], data[window:]
+                self.conn.send_data(stream_id, chunk, end_stream=not data)
+            if data:
+                self.pending[stream_id] = data
+            else:
+                del self.pending[stream_id]
+        self.transport.write(self.conn.data_to_send())
+
+def start_h2_server(body: bytes, delay: float, connect_delay: float, counter: ConnectionCounter) -> int:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def _start():
+        server = await loop.create_server(lambda: H2Protocol(body, delay, connect_delay, counter), "127.0.0.1", 0)
+        return server.sockets[0].getsockname()[1]
+
+    return asyncio.run_coroutine_threadsafe(_start(), loop).result()
+
+################################################################################################################
+# BENCHMARK
+################################################################################################################
+
+def fetch_all(session, base_url: str, galleries: int, pages: int, threads: int) -> tuple[float, int]:
+    def _fetch(gallery, page):
+        r = session.get(f"{base_url}/galleries/{gallery}/{page}.jpg", timeout=(60, 60), stream=True)
+        r.raise_for_status()
+        return sum(len(chunk) for chunk in r.iter_content(chunk_size=8192))
+
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(_fetch, g, p) for g in range(galleries) for p in range(1, pages + 1)]
+        total = sum(f.result() for f in futures)
+    return time.monotonic() - start, total
+
+def report(name: str, elapsed: float, total: int, requests_made: int, connections: int):
+    print(
+        f"{name:<10} {elapsed:7.2f}s  {requests_made / elapsed:8.1f} req/s  "
+        f"{total / elapsed / 1024 / 1024:7.1f} MiB/s  {connections:4d} connections"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/1.1 vs HTTP/2 image transport benchmark")
+    parser.add_argument("--galleries", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent image requests")
+    parser.add_argument("--size", type=int, default=200_000, help="Image size in bytes")
+    parser.add_argument("--delay", type=float, default=0.05, help="Server delay per response (seconds)")
+    parser.add_argument("--connect-delay", type=float, default=0.3, help="Delay before a new connection's first response (seconds)")
+    args = parser.parse_args()
+
+    body = os.urandom(args.size)
+    requests_made = args.galleries * args.pages
+
+    http1_connections = ConnectionCounter()
+    http1_port = start_http1_server(body, args.delay, args.connect_delay, http1_connections)
+
+    h2_connections = ConnectionCounter()
+    h2_port = start_h2_server(body, args.delay, args.connect_delay, h2_connections)
+
+    print(
+        f"{requests_made} images of {args.size} bytes, {args.threads} threads, "
+        f"{args.delay * 1000:.0f}ms server delay, {args.connect_delay * 1000:.0f}ms connect delay\n"
+    )
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=args.threads)
+    session.mount("http://", adapter)
+    elapsed, total = fetch_all(session, f"http://127.0.0.1:{http1_port}", args.galleries, args.pages, args.threads)
+    report("HTTP/1.1", elapsed, total, requests_made, http1_connections.count)
+    session.close()
+
+    session = requests.Session()
+    adapter = HTTP2Adapter(http1=False) # h2c prior knowledge, the stand-in has no TLS / ALPN
+    session.mount("http://", adapter)
+    elapsed, total = fetch_all(session, f"http://127.0.0.1:{h2_port}", args.galleries, args.pages, args.threads)
+    report("HTTP/2", elapsed, total, requests_made, h2_connections.count)
+    adapter.close()
+
+if __name__ == "__main__":
+    main()
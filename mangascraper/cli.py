@@ -6,7 +6,10 @@ import os, time, sys, argparse, re, subprocess, urllib.parse
 from mangascraper.core import orchestrator
 from mangascraper.core.orchestrator import *
 from mangascraper.core.downloader import start_downloader
-from mangascraper.core.api import get_session, fetch_gallery_ids
+from mangascraper.core.api import get_session, fetch_gallery_ids_many
+from mangascraper.core import archive_planner
+from mangascraper.core import gallery_stream
+from mangascraper.core import response_cache
 from mangascraper.extensions.extension_manager import install_selected_extension, uninstall_selected_extension
 
 INSTALLER_PATH = "/opt/manga-scraper/mangascraper-install.sh"
@@ -173,10 +176,30 @@ def parse_args():
         action="store_true",
         help="Archive EVERYTHING from NHentai (all pages of homepage)."
     )
+    parser.add_argument(
+        "--stream-galleries",
+        action="store_true",
+        default=DEFAULT_STREAM_GALLERIES,
+        help=(
+            f"Start downloading galleries as soon as the first listing page arrives, while the crawl continues (default: {DEFAULT_STREAM_GALLERIES}). "
+            "Galleries are downloaded in the order they are found instead of highest ID first, and no time estimate is shown."
+        )
+    )
+    parser.add_argument(
+        "--archive-window-days",
+        type=int,
+        default=DEFAULT_ARCHIVE_WINDOW_DAYS,
+        help=(
+            f"Split --archive-all into upload-date windows of this many days, crawled in parallel (default: {DEFAULT_ARCHIVE_WINDOW_DAYS}). "
+            "Completed windows are recorded and skipped by later runs. 0 walks the homepage one page at a time instead."
+        )
+    )
 
     # Filters
     parser.add_argument("--excluded-tags", type=str, default=None, help=f"Comma-separated list of tags to exclude galleries (default: '{DEFAULT_EXCLUDED_TAGS}')")
     parser.add_argument("--language", type=str, default=DEFAULT_LANGUAGE, help=f"Comma-separated list of languages to include (default: '{DEFAULT_LANGUAGE}')")
+    parser.add_argument("--min-pages", type=int, default=DEFAULT_MIN_GALLERY_PAGES, help="Skip galleries with fewer pages than this (default: no minimum)")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_GALLERY_PAGES, help="Skip galleries with more pages than this (default: no maximum)")
     parser.add_argument(
         "--title-type",
         choices=["english","japanese","pretty"],
@@ -209,6 +232,26 @@ def parse_args():
         )
     )
     
+    parser.add_argument(
+        "--threads-queries",
+        type=int,
+        default=DEFAULT_THREADS_QUERIES,
+        help=(
+            f"Number of query crawls (--artist, --tag, --search, file lines, etc) fetching pages at once (default: {DEFAULT_THREADS_QUERIES}). "
+            "All crawls share the listing page rate limit (--rate-api)."
+        )
+    )
+    
+    parser.add_argument(
+        "--threads-pages",
+        type=int,
+        default=DEFAULT_THREADS_PAGES,
+        help=(
+            f"Number of listing pages of each query crawl fetched at once, once the first page has reported how many there are "
+            f"(default: {DEFAULT_THREADS_PAGES}). Pages are still processed in order and share the listing page rate limit (--rate-api)."
+        )
+    )
+    
     parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help=f"Maximum number of retry attempts for failed downloads (default: {DEFAULT_MAX_RETRIES})")
     parser.add_argument(
         "--min-sleep",
@@ -229,8 +272,42 @@ def parse_args():
         )
     )
     
+    # Rate limits
+    parser.add_argument("--rate-api", type=float, default=DEFAULT_RATE_LIMIT_API, help=f"Maximum listing / search page requests per second, 0 for unlimited (default: {DEFAULT_RATE_LIMIT_API})")
+    parser.add_argument("--rate-gallery", type=float, default=DEFAULT_RATE_LIMIT_GALLERY, help=f"Maximum gallery metadata requests per second, 0 for unlimited (default: {DEFAULT_RATE_LIMIT_GALLERY})")
+    parser.add_argument("--rate-images", type=float, default=DEFAULT_RATE_LIMIT_IMAGES, help=f"Maximum image requests per second, 0 for unlimited (default: {DEFAULT_RATE_LIMIT_IMAGES})")
+    parser.add_argument(
+        "--rate-total",
+        type=float,
+        default=DEFAULT_RATE_LIMIT_TOTAL,
+        help=(
+            f"Maximum requests per second across all of the above, 0 for unlimited (default: {DEFAULT_RATE_LIMIT_TOTAL}). "
+            "Metadata requests are given priority within this limit, so metadata priority only applies when it is set."
+        )
+    )
+    parser.add_argument(
+        "--no-adaptive-concurrency",
+        dest="adaptive_concurrency",
+        action="store_false",
+        default=DEFAULT_ADAPTIVE_CONCURRENCY,
+        help=(
+            f"Disable adaptive concurrency (default: enabled). "
+            "When enabled, active gallery / image threads are halved on 429 / 403 responses (and all workers pause together, honouring Retry-After), "
+            "then grown back one at a time while responses stay healthy."
+        )
+    )
+    
     # Download / runtime options
     parser.add_argument("--use-tor", action="store_true", default=DEFAULT_USE_TOR, help=f"Use TOR network for downloads (default: {DEFAULT_USE_TOR})")
+    parser.add_argument(
+        "--tor-circuits",
+        type=int,
+        default=DEFAULT_TOR_CIRCUITS,
+        help=(
+            f"Number of isolated Tor circuits worker threads are spread over (default: {DEFAULT_TOR_CIRCUITS}). "
+            "Circuits that fall far behind the others are replaced. 1 puts every thread on the same circuit."
+        )
+    )
     parser.add_argument(
         "--skip-post-batch",
         action="store_true",
@@ -249,6 +326,99 @@ def parse_args():
             "For example, if you're using the Suwayomi extension, the download directory is still cleaned, but things like updating Suwayomi are skipped."
         )
     )
+    parser.add_argument(
+        "--use-async",
+        action="store_true",
+        default=DEFAULT_USE_ASYNC,
+        help=(
+            f"Fetch gallery metadata in batches through a single asyncio event loop, ahead of the gallery threads (default: {DEFAULT_USE_ASYNC}). "
+            "Only metadata requests use it: images are still downloaded by the image threads through the extension's download hook. "
+            "Requires aiohttp (and aiohttp-socks when using Tor)."
+        )
+    )
+    parser.add_argument(
+        "--async-concurrency",
+        type=int,
+        default=DEFAULT_ASYNC_CONCURRENCY,
+        help=f"Maximum number of in-flight metadata requests (and galleries per prefetch batch) when using --use-async (default: {DEFAULT_ASYNC_CONCURRENCY})."
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        default=DEFAULT_HTTP2,
+        help=(
+            f"Fetch images over HTTP/2, multiplexing every image thread's requests over a few connections per mirror (default: {DEFAULT_HTTP2}). "
+            "Requires httpx and h2 (and socksio when using Tor)."
+        )
+    )
+    parser.add_argument(
+        "--min-transfer-rate",
+        type=float,
+        default=DEFAULT_MIN_TRANSFER_RATE,
+        help=(
+            f"Minimum image transfer rate in KiB/s (default: {DEFAULT_MIN_TRANSFER_RATE}). Transfers slower than this for "
+            "--stall-seconds are aborted and retried on the next mirror. 0 disables stall detection."
+        )
+    )
+    parser.add_argument(
+        "--stall-seconds",
+        type=int,
+        default=DEFAULT_STALL_SECONDS,
+        help=f"Seconds an image transfer may stay below --min-transfer-rate before it is aborted (default: {DEFAULT_STALL_SECONDS})"
+    )
+    parser.add_argument(
+        "--hedge-requests",
+        action="store_true",
+        default=DEFAULT_HEDGE_REQUESTS,
+        help=(
+            f"Send a duplicate request to another mirror when an image request is slower than --hedge-percentile, "
+            f"using whichever answers first (default: {DEFAULT_HEDGE_REQUESTS}). At most 10%% of requests are hedged."
+        )
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=int,
+        default=DEFAULT_HEDGE_PERCENTILE,
+        help=f"Image request latency percentile after which a request is hedged (default: {DEFAULT_HEDGE_PERCENTILE})"
+    )
+    parser.add_argument(
+        "--metadata-cache-ttl",
+        type=int,
+        default=DEFAULT_METADATA_CACHE_TTL,
+        help=f"Days before cached gallery metadata is fetched from the API again and dropped from the cache, 0 to never expire (default: {DEFAULT_METADATA_CACHE_TTL})"
+    )
+    parser.add_argument(
+        "--refresh-metadata",
+        action="store_true",
+        default=DEFAULT_REFRESH_METADATA,
+        help=f"Ignore cached gallery metadata and fetch it from the API again (default: {DEFAULT_REFRESH_METADATA})"
+    )
+    parser.add_argument(
+        "--cache-policy",
+        choices=["always-revalidate", "prefer-cache", "offline"],
+        default=DEFAULT_CACHE_POLICY,
+        help=(
+            f"How cached listing / search pages are used (default: {DEFAULT_CACHE_POLICY}). "
+            "'always-revalidate' sends a conditional request for every page, 'prefer-cache' uses cached pages until they expire, "
+            "'offline' only uses cached pages."
+        )
+    )
+    parser.add_argument(
+        "--no-resume",
+        dest="resume_crawls",
+        action="store_false",
+        default=DEFAULT_RESUME_CRAWLS,
+        help="Start page walks from the beginning instead of resuming interrupted ones from their last checkpoint (default: resume)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=DEFAULT_INCREMENTAL,
+        help=(
+            f"Stop date-sorted page walks (e.g. --homepage, --artist NAME date) at the first page made up entirely of galleries "
+            f"a previous walk of the same query has already seen (default: {DEFAULT_INCREMENTAL})"
+        )
+    )
     parser.add_argument("--dry-run", action="store_true", default=DEFAULT_DRY_RUN, help=f"Simulate downloads without saving files (default: {DEFAULT_DRY_RUN})")
     
     # Make calm/debug mutually exclusive
@@ -258,9 +428,11 @@ def parse_args():
 
     return parser.parse_args()
 
-def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
+def _handle_gallery_args(arg_list: list | None, query_type: str, crawls: list | None = None) -> set[int]:
     """
-    Parse CLI args or file URLs and call fetch_gallery_ids for any query type.
+    Parse CLI args or file URLs and queue fetch_gallery_ids crawls for any query type.
+    If crawls is given, crawls are appended to it (to be run together by fetch_gallery_ids_many) and only
+    directly listed gallery IDs are returned. Otherwise the crawls are run before returning.
     Supports optional sort type in flags: --artist ARTIST [SORT_TYPE] [START_PAGE] [END_PAGE] [ARCHIVAL_BOOL]
     Defaults: sort='date', start_page=1, end_page=DEFAULT_PAGE_RANGE_END
 
@@ -273,6 +445,11 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
     if not arg_list:
         return set()
 
+    if crawls is None:
+        queued = []
+        gallery_ids = _handle_gallery_args(arg_list, query_type, queued)
+        return gallery_ids | fetch_gallery_ids_many(queued)
+
     gallery_ids = set()
     query_lower = query_type.lower()
     force_archive = (query_lower == "archive")
@@ -313,7 +490,7 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
                     sort_val = get_valid_sort_value(sort_val)
                     start_page = DEFAULT_PAGE_RANGE_START
                     end_page = int(m_homepage.group(1))
-                    gallery_ids.update(fetch_gallery_ids("homepage", None, sort_val, start_page, end_page, file_used=True))
+                    crawls.append(dict(query_type="homepage", query_value=None, sort_value=sort_val, start_page=start_page, end_page=end_page, file_used=True))
                     continue
 
                 # Creator / group / tag / character / parody / search URLs
@@ -330,7 +507,7 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
                     sort_val = get_valid_sort_value(sort_path if sort_path else DEFAULT_PAGE_SORT)
                     start_page = 1
                     end_page = int(page_q) if page_q else DEFAULT_PAGE_RANGE_END
-                    gallery_ids.update(fetch_gallery_ids(qtype, qvalue, sort_val, start_page, end_page, file_used=True))
+                    crawls.append(dict(query_type=qtype, query_value=qvalue, sort_value=sort_val, start_page=start_page, end_page=end_page, file_used=True))
                     continue
 
                 elif m_search:
@@ -339,7 +516,7 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
                     sort_val = get_valid_sort_value(DEFAULT_PAGE_SORT)
                     start_page = 1
                     end_page = int(page_q) if page_q else DEFAULT_PAGE_RANGE_END
-                    gallery_ids.update(fetch_gallery_ids("search", search_query, sort_val, start_page, end_page, file_used=True))
+                    crawls.append(dict(query_type="search", query_value=search_query, sort_value=sort_val, start_page=start_page, end_page=end_page, file_used=True))
                     continue
 
                 else:
@@ -367,7 +544,7 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
                 if len(arg_list) > 1:
                     end_page = int(arg_list[1])
 
-        gallery_ids.update(fetch_gallery_ids("homepage", None, sort_val, start_page, end_page))
+        crawls.append(dict(query_type="homepage", query_value=None, sort_value=sort_val, start_page=start_page, end_page=end_page))
         return gallery_ids
 
     # --- Other queries (CLI flags) ---
@@ -402,22 +579,28 @@ def _handle_gallery_args(arg_list: list | None, query_type: str) -> set[int]:
                 end_page = int(entry[2])
 
         archival_flag = archive_mode or force_archive
-        gallery_ids.update(fetch_gallery_ids(query_lower, name, sort_val, start_page, end_page, fetch_as_archival=archival_flag))
+        crawls.append(dict(query_type=query_lower, query_value=name, sort_value=sort_val, start_page=start_page, end_page=end_page, fetch_as_archival=archival_flag))
 
     return gallery_ids
 
-def build_gallery_list(args):
+def build_gallery_list(args, id_sink=None):
+    """
+    Collect gallery IDs from every gallery-selection flag and run the query crawls.
+    If id_sink (a gallery_stream.GalleryStream) is given, IDs are pushed into it as they are found.
+    """
     
     log_clarification()
     log(f"Parsing galleries from NHentai. This may take a while...")
     
     gallery_ids = set()
+    crawls = [] # Query crawls, run together on a bounded pool once every flag is parsed
+    archive_crawls = [] # --archive-all upload-date windows (archive_planner), run on the same pool
 
     # ------------------------------------------------------------
     # File input (overrides .env galleries)
     # ------------------------------------------------------------
     if args.file:
-        gallery_ids.update(_handle_gallery_args(args.file, "file"))
+        gallery_ids.update(_handle_gallery_args(args.file, "file", crawls))
 
     # ------------------------------------------------------------
     # Range
@@ -437,36 +620,51 @@ def build_gallery_list(args):
     # Artist / Group / Tag / Character / Parody / Search
     # ------------------------------------------------------------
     if args.homepage:
-        gallery_ids.update(_handle_gallery_args(args.homepage, "homepage"))
+        gallery_ids.update(_handle_gallery_args(args.homepage, "homepage", crawls))
     
     if args.artist:
-        gallery_ids.update(_handle_gallery_args(args.artist, "artist"))
+        gallery_ids.update(_handle_gallery_args(args.artist, "artist", crawls))
 
     if args.group:
-        gallery_ids.update(_handle_gallery_args(args.group, "group"))
+        gallery_ids.update(_handle_gallery_args(args.group, "group", crawls))
 
     if args.tag:
-        gallery_ids.update(_handle_gallery_args(args.tag, "tag"))
+        gallery_ids.update(_handle_gallery_args(args.tag, "tag", crawls))
         
     if args.character:
-        gallery_ids.update(_handle_gallery_args(args.character, "character"))
+        gallery_ids.update(_handle_gallery_args(args.character, "character", crawls))
 
     if args.parody:
-        gallery_ids.update(_handle_gallery_args(args.parody, "parody"))
+        gallery_ids.update(_handle_gallery_args(args.parody, "parody", crawls))
     
     if args.search:
-        gallery_ids.update(_handle_gallery_args(args.search, "search"))
+        gallery_ids.update(_handle_gallery_args(args.search, "search", crawls))
         
     # ------------------------------------------------------------
     # Archive Queries
     # ------------------------------------------------------------
     if args.archive:
         # Same as search crawl but infinite
-        gallery_ids.update(_handle_gallery_args(args.archive, "archive"))
+        gallery_ids.update(_handle_gallery_args(args.archive, "archive", crawls))
     
     if args.archive_all:
-        # Same as homepage crawl but infinite
-        gallery_ids.update(fetch_gallery_ids("homepage", None, DEFAULT_PAGE_SORT, start_page=1, end_page=None, fetch_as_archival=True))
+        if orchestrator.archive_window_days > 0:
+            # Disjoint upload-date windows, crawled in parallel and recorded once complete
+            archive_crawls = archive_planner.plan_crawls()
+        else:
+            # Same as homepage crawl but infinite
+            crawls.append(dict(query_type="homepage", query_value=None, sort_value=DEFAULT_PAGE_SORT, start_page=1, end_page=None, fetch_as_archival=True))
+
+    # ------------------------------------------------------------
+    # Run all query crawls
+    # ------------------------------------------------------------
+    if id_sink is not None:
+        id_sink.put_many(sorted(gallery_ids, reverse=True)) # Directly listed galleries can start right away
+    # Other queries first, so they aren't queued behind hundreds of archive windows.
+    gallery_ids.update(fetch_gallery_ids_many(crawls + archive_crawls, id_sink=id_sink))
+    if archive_crawls:
+        archive_planner.record_crawls(archive_crawls)
+    response_cache.prune() # Keep the listing page cache from growing without bound
 
     # ------------------------------------------------------------
     # Final sorted list (Processes highest gallery ID (latest gallery) first.)
@@ -503,13 +701,37 @@ def update_config(args, archive_all: bool = False):
         if isinstance(excluded_tags, str):
             update_env("EXCLUDED_TAGS", [t.strip().lower() for t in orchestrator.excluded_tags.split(",")])
     
+    update_env("STREAM_GALLERIES", args.stream_galleries)
+    update_env("ARCHIVE_WINDOW_DAYS", max(0, args.archive_window_days))
     update_env("LANGUAGE", [lang.strip().lower() for lang in args.language.split(",")])
+    update_env("MIN_GALLERY_PAGES", max(0, args.min_pages))
+    update_env("MAX_GALLERY_PAGES", max(0, args.max_pages))
     update_env("TITLE_TYPE", args.title_type)
     update_env("THREADS_GALLERIES", args.threads_galleries)
     update_env("THREADS_IMAGES", args.threads_images)
+    update_env("THREADS_QUERIES", min(max(MIN_THREADS_QUERIES, args.threads_queries), MAX_THREADS_QUERIES))
+    update_env("THREADS_PAGES", min(max(MIN_THREADS_PAGES, args.threads_pages), MAX_THREADS_PAGES))
     update_env("MAX_RETRIES", args.max_retries)
+    update_env("RATE_LIMIT_API", args.rate_api)
+    update_env("RATE_LIMIT_GALLERY", args.rate_gallery)
+    update_env("RATE_LIMIT_IMAGES", args.rate_images)
+    update_env("RATE_LIMIT_TOTAL", args.rate_total)
+    update_env("ADAPTIVE_CONCURRENCY", args.adaptive_concurrency)
     update_env("DRY_RUN", args.dry_run)
     update_env("USE_TOR", args.use_tor)
+    update_env("TOR_CIRCUITS", max(1, args.tor_circuits))
+    update_env("USE_ASYNC", args.use_async)
+    update_env("ASYNC_CONCURRENCY", args.async_concurrency)
+    update_env("HTTP2", args.http2)
+    update_env("MIN_TRANSFER_RATE", max(0.0, args.min_transfer_rate))
+    update_env("STALL_SECONDS", max(1, args.stall_seconds))
+    update_env("HEDGE_REQUESTS", args.hedge_requests)
+    update_env("HEDGE_PERCENTILE", min(max(50, args.hedge_percentile), 99))
+    update_env("METADATA_CACHE_TTL", args.metadata_cache_ttl)
+    update_env("REFRESH_METADATA", args.refresh_metadata)
+    update_env("CACHE_POLICY", args.cache_policy)
+    update_env("RESUME_CRAWLS", args.resume_crawls)
+    update_env("INCREMENTAL", args.incremental)
     update_env("SKIP_POST_BATCH", args.skip_post_batch)
     update_env("SKIP_POST_RUN", args.skip_post_run)
     update_env("CALM", args.calm)
@@ -604,6 +826,21 @@ def main():
     # Build initial session.
     get_session(referrer="CLI", status="build")
     
+    if orchestrator.stream_galleries:
+        # Crawl in the background and start downloading as soon as the first Gallery IDs arrive.
+        stream = gallery_stream.GalleryStream()
+        gallery_stream.start_producer(lambda sink: build_gallery_list(args, id_sink=sink), stream)
+        if not stream.wait():
+            logger.warning("No galleries provided. Exiting.")
+            sys.exit(0)
+        
+        log_clarification("debug")
+        log(f"Final Config:\n{config}", "debug")
+        
+        start_downloader(stream) # Start download
+        update_env("GALLERIES", stream.seen())
+        return
+    
     # Build Gallery List (make sure not empty.)
     gallery_list = build_gallery_list(args)
     if not gallery_list:
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# mangascraper/core/adaptive_timeouts.py
+
+import threading, requests
+
+from collections import deque
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Adaptive per-endpoint timeouts.
+#
+# Requests used a fixed (60, 60) timeout: far too long to notice a dead API connection, and sometimes too short
+# for a large GIF over Tor. Instead, each endpoint class ("list" pages, gallery "metadata", "image") keeps a
+# rolling window of observed latencies and its timeouts are the live p99 times SAFETY_FACTOR, within bounds.
+#
+# requests' read timeout is the longest wait for the NEXT bytes, not for the whole body, so:
+# - "list" / "metadata": connect and read timeouts come from the time to response headers.
+# - "image": the read timeout also covers the longest gap between chunks seen in recent transfers, so a
+#   large page that keeps trickling in is never cut off, while a connection that stops sending is.
+#
+# Timeouts are classified as "connect", "first-byte" (no response headers) or "stall" (the body stopped part
+# way). Slow but progressing transfers never time out, they show up in the per-size throughput figures instead.
+# A timeout also counts as a latency sample at the timeout used, so a run of them raises the timeout.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+ENDPOINTS = ("list", "metadata", "image")
+
+DEFAULT_TIMEOUT = (60, 60) # Used until an endpoint has MIN_SAMPLES samples
+SAFETY_FACTOR = 3.0
+PERCENTILE = 99
+WINDOW = 500
+MIN_SAMPLES = 20
+
+MIN_CONNECT_TIMEOUT = 5.0
+MAX_CONNECT_TIMEOUT = 60.0
+MIN_READ_TIMEOUT = 10.0
+MAX_READ_TIMEOUT = 60.0
+MAX_IMAGE_READ_TIMEOUT = 180.0 # Large GIFs over Tor can pause for a while and still finish
+
+# Image size classes for throughput figures (upper bound in bytes, name)
+SIZE_CLASSES = ((500 * 1024, "small"), (2 * 1024 * 1024, "medium"), (None, "large"))
+
+_latencies = {endpoint: deque(maxlen=WINDOW) for endpoint in ENDPOINTS} # Seconds to response headers
+_gaps = deque(maxlen=WINDOW) # Longest gap between chunks per image transfer
+_throughput = {name: deque(maxlen=WINDOW) for _, name in SIZE_CLASSES} # Bytes per second per image transfer
+_timeouts = {endpoint: {"connect": 0, "first-byte": 0, "stall": 0} for endpoint in ENDPOINTS}
+_last_timeout = {} # endpoint -> (connect, read) handed out most recently
+_lock = threading.Lock()
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _percentile(samples, percentile: int = PERCENTILE) -> float | None:
+    if len(samples) < MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return round(min(high, max(low, value)), 2)
+
+def size_class(nbytes: int) -> str:
+    for limit, name in SIZE_CLASSES:
+        if limit is None or nbytes <= limit:
+            return name
+
+def classify(e: Exception) -> str | None:
+    """
+    "connect", "first-byte" or "stall" for a timeout-type error, None for anything else.
+    """
+
+    if isinstance(e, requests.ConnectTimeout):
+        return "connect"
+    if isinstance(e, requests.ReadTimeout):
+        return "first-byte"
+    # A read timeout while streaming the body surfaces as a ConnectionError (urllib3 ReadTimeoutError)
+    # or a ChunkedEncodingError, after some of the body arrived.
+    if isinstance(e, requests.exceptions.ChunkedEncodingError):
+        return "stall"
+    if isinstance(e, requests.ConnectionError) and "timed out" in str(e).lower():
+        return "stall"
+    return None
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def timeout(endpoint: str) -> tuple[float, float]:
+    """
+    (connect, read) timeout to use for a request to this endpoint class.
+    """
+
+    with _lock:
+        latency = _percentile(_latencies[endpoint])
+        gap = _percentile(_gaps) if endpoint == "image" else None
+
+    if latency is None:
+        result = DEFAULT_TIMEOUT
+    else:
+        connect = _clamp(latency * SAFETY_FACTOR, MIN_CONNECT_TIMEOUT, MAX_CONNECT_TIMEOUT)
+        if endpoint == "image":
+            read = _clamp(max(latency, gap or 0.0) * SAFETY_FACTOR, MIN_READ_TIMEOUT, MAX_IMAGE_READ_TIMEOUT)
+        else:
+            read = _clamp(latency * SAFETY_FACTOR, MIN_READ_TIMEOUT, MAX_READ_TIMEOUT)
+        result = (connect, read)
+
+    with _lock:
+        _last_timeout[endpoint] = result
+    return result
+
+def record_latency(endpoint: str, seconds: float):
+    """
+    Report the time a request took to return its response headers (resp.elapsed).
+    """
+
+    if seconds is None or seconds < 0:
+        return
+    with _lock:
+        _latencies[endpoint].append(seconds)
+
+def record_transfer(nbytes: int, seconds: float, max_gap: float):
+    """
+    Report a completed image body: its size, how long it took and the longest wait between chunks.
+    """
+
+    with _lock:
+        _gaps.append(max_gap)
+        if nbytes and seconds > 0:
+            _throughput[size_class(nbytes)].append(nbytes / seconds)
+
+def record_error(endpoint: str, e: Exception):
+    """
+    Report a failed request. Timeouts are counted by kind and fed back as latency samples at the timeout used.
+    """
+
+    kind = classify(e)
+    if kind is None:
+        return
+
+    with _lock:
+        _timeouts[endpoint][kind] += 1
+        connect, read = _last_timeout.get(endpoint, DEFAULT_TIMEOUT)
+        if kind == "stall" and endpoint == "image":
+            _gaps.append(read)
+        else:
+            _latencies[endpoint].append(connect if kind == "connect" else read)
+
+    log(f"Adaptive Timeouts: {endpoint} {kind} timeout: {e}", "debug")
+
+def summary() -> dict:
+    """
+    Current timeouts, latency / throughput percentiles and timeout counts, for logging / the dashboard.
+    """
+
+    timeouts = {endpoint: timeout(endpoint) for endpoint in ENDPOINTS}
+    with _lock:
+        return {
+            "timeouts": timeouts,
+            "latency_p50": {e: _percentile(_latencies[e], 50) for e in ENDPOINTS},
+            "latency_p99": {e: _percentile(_latencies[e]) for e in ENDPOINTS},
+            "image_gap_p99": _percentile(_gaps),
+            "image_throughput_p50": {name: _percentile(samples, 50) for name, samples in _throughput.items()},
+            "timeout_counts": {e: dict(counts) for e, counts in _timeouts.items()},
+        }
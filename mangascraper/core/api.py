@@ -1,21 +1,34 @@
 #!/usr/bin/env python3
 # mangascraper/core/api.py
 
-import os, time, random, cloudscraper, requests, re, json, threading, socket, urllib.parse
+import os, time, math, random, cloudscraper, requests, re, json, threading, socket, urllib.parse, concurrent.futures
 
-from datetime import datetime
+from datetime import datetime, timezone
 from urllib.parse import urljoin
 from pathlib import Path
+from tqdm import tqdm
 
 from mangascraper.core import orchestrator
 from mangascraper.core.orchestrator import *
 from mangascraper.core import database
+from mangascraper.core import session_pool
+from mangascraper.core import rate_limiter
+from mangascraper.core import concurrency_controller
+from mangascraper.core import response_cache
+from mangascraper.core import mirror_registry
+from mangascraper.core import tor_circuits
+from mangascraper.core import tor_control
+from mangascraper.core import circuit_breaker
+from mangascraper.core import clearance_store
+from mangascraper.core import http2_transport
+from mangascraper.core import adaptive_timeouts
 
 ################################################################################################################
 # GLOBAL VARIABLES
 ################################################################################################################
 
 possible_broken_symbols_lock = threading.Lock()
+total_gallery_images_lock = threading.Lock() # Query crawls run in parallel (fetch_gallery_ids_many)
 
 ################################################################################################################
 # HTTP SESSION
@@ -76,8 +89,14 @@ def get_session(referrer: str = "Undisclosed Module", status: str = "rebuild"):
         browser_profile = random.choice(browsers) if RandomiseBrowserProfile else DefaultBrowserProfile
 
         # Create or rebuild session if needed
-        if session is None or status == "rebuild":
+        created = session is None or status == "rebuild"
+        if created:
             session = cloudscraper.create_scraper(browser=browser_profile)
+            session_pool.size_session_pools(session) # Size pools for every gallery / image thread
+            if orchestrator.http2 and http2_transport.is_available():
+                # Image mirrors only, the API keeps cloudscraper's adapter (and its TLS fingerprint).
+                http2_transport.mount(session, [mirror.rstrip("/") + "/" for mirror in orchestrator.nhentai_mirrors])
+            session.hooks["response"].append(clearance_store.on_response) # Persist cookies (Cloudflare clearance) as they're set
 
         # Random User-Agents (only randomised if flag is True)
         DefaultUserAgent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
@@ -109,9 +128,13 @@ def get_session(referrer: str = "Undisclosed Module", status: str = "rebuild"):
             "Referer": referer,
         })
 
+        # Start from the stored Cloudflare clearance (and the User-Agent it was issued to) instead of solving the challenge again.
+        clearance_store.seed(session)
+        clearance_store.start_refresher(lambda: session)
+
         # Update proxies
         if use_tor:
-            proxy = "socks5h://127.0.0.1:9050"
+            proxy = tor_circuits.proxy_url()
             session.proxies = {"http": proxy, "https": proxy}
             logger.info(f"Using Tor proxy: {proxy}")
         else:
@@ -126,6 +149,57 @@ def get_session(referrer: str = "Undisclosed Module", status: str = "rebuild"):
         #logger.debug(f"Session ready: {session}") # NOTE: DEBUGGING, not really needed.
 
         return session # Return the current session
+
+tor_rotation_lock = threading.Lock()
+tor_rotation_generation = 0
+tor_last_rotation = 0.0
+
+def rotate_tor_identity(referrer: str = "Undisclosed Module") -> int:
+    """
+    Move onto a new Tor exit after a request keeps failing.
+    - Sends NEWNYM over the Tor control port and drops idle pooled connections, keeping the session
+      (and its Cloudflare clearance). Falls back to rebuilding the session if the control port can't be used.
+    - Single-flight: callers that arrive while a rotation is running wait for it and reuse it,
+      and rotations closer together than Tor's NEWNYM interval are skipped.
+    Returns the rotation generation, so callers can tell whether they have already seen the latest rotation.
+    """
+
+    global tor_rotation_generation, tor_last_rotation
+
+    orchestrator.refresh_globals()
+
+    observed = tor_rotation_generation
+    with tor_rotation_lock:
+        if tor_rotation_generation != observed:
+            log(f"{referrer}: Tor identity was just rotated by another worker, reusing it.", "debug")
+            return tor_rotation_generation
+
+        if time.monotonic() - tor_last_rotation < tor_control.NEWNYM_INTERVAL:
+            log(f"{referrer}: Tor identity rotated less than {tor_control.NEWNYM_INTERVAL}s ago, reusing it.", "debug")
+            return tor_rotation_generation
+
+        if orchestrator.use_tor and tor_control.signal_newnym():
+            session_pool.drop_idle_connections(session)
+        else:
+            logger.warning(f"{referrer}: Could not signal Tor, rebuilding session instead.")
+            get_session(referrer=referrer, status="rebuild")
+
+        tor_rotation_generation += 1
+        tor_last_rotation = time.monotonic()
+        return tor_rotation_generation
+
+def get_worker_session(referrer: str = "Undisclosed Module"):
+    """
+    Return the calling thread's own session.
+    Worker sessions share the global session's cookies (and Cloudflare clearance), headers, proxies and
+    connection pools, but aren't shared between threads.
+    """
+    
+    base_session = get_session(referrer=referrer, status="return")
+    if base_session is None:
+        base_session = get_session(referrer=referrer, status="build")
+    
+    return session_pool.worker_session(base_session)
     
 ################################################################################################################
 # METADATA CLEANING
@@ -516,19 +590,83 @@ def dynamic_sleep(stage, attempt: int = 1):
 # ===============================
 # BUILD API URLS
 # ===============================
+def search_filter_terms() -> list[str]:
+    """
+    Search terms that apply the --excluded-tags, --language and --min-pages / --max-pages filters server-side,
+    so galleries that would be filtered out don't take up listing pages.
+    Search terms are ANDed, so the language is only pushed down when exactly one is allowed.
+    fetch_gallery_ids still filters every page client-side (homepage listings can't take a query).
+    """
+
+    orchestrator.refresh_globals()
+
+    excluded = orchestrator.excluded_tags
+    if isinstance(excluded, str):
+        excluded = excluded.split(",")
+    languages = orchestrator.language
+    if isinstance(languages, str):
+        languages = languages.split(",")
+
+    terms = []
+    for tag in sorted({t.strip().lower() for t in excluded if t.strip()}):
+        terms.append(f'-tag:"{tag}"' if " " in tag else f"-tag:{tag}")
+
+    languages = sorted({l.strip().lower() for l in languages if l.strip()})
+    if len(languages) == 1:
+        terms.append(f'language:"{languages[0]}"' if " " in languages[0] else f"language:{languages[0]}")
+
+    if orchestrator.min_gallery_pages > 0:
+        terms.append(f"pages:>{orchestrator.min_gallery_pages - 1}")
+    if orchestrator.max_gallery_pages > 0:
+        terms.append(f"pages:<{orchestrator.max_gallery_pages + 1}")
+
+    return terms
+
+uploaded_reference_time = None # Pinned on first use, so upload-date windows don't slide during a run
+uploaded_reference_lock = threading.Lock()
+
+def uploaded_terms(window: str) -> list[str]:
+    """
+    Search terms selecting an upload-date window "YYYY-MM-DD..YYYY-MM-DD" (UTC, end exclusive, either end may be
+    left open). NHentai only takes upload ages relative to now, so the dates are converted to hours against a
+    reference time pinned for the whole run. Each bound is widened by an hour, so neighbouring windows overlap
+    slightly rather than leaving gaps, and as time passes galleries only enter a window at its newer end
+    (duplicates, which are deduplicated) and never shift the pages already walked.
+    """
+
+    global uploaded_reference_time
+
+    with uploaded_reference_lock:
+        if uploaded_reference_time is None:
+            uploaded_reference_time = datetime.now(timezone.utc)
+        now = uploaded_reference_time
+
+    start, _, end = window.partition("..")
+    terms = []
+    if end:
+        newest_age = (now - datetime.fromisoformat(end).replace(tzinfo=timezone.utc)).total_seconds() / 3600
+        if newest_age > 1:
+            terms.append(f"uploaded:>{math.floor(newest_age) - 1}h")
+    if start:
+        oldest_age = (now - datetime.fromisoformat(start).replace(tzinfo=timezone.utc)).total_seconds() / 3600
+        terms.append(f"uploaded:<{math.ceil(oldest_age) + 1}h")
+    return terms
+
 def build_url(query_type: str, query_value: str, sort_value: str, page: int) -> str:
     """
     Build the NHentai API URL for a given query type, value, sort type, and page number.
 
-    query_type: homepage, artist, group, tag, character, parody, search
-    query_value: string value of query (None for homepage)
+    query_type: homepage, artist, group, tag, character, parody, search, uploaded
+    query_value: string value of query (None for homepage, "YYYY-MM-DD..YYYY-MM-DD" for uploaded)
     sort_value: date / recent / today / week / popular / all_time
     page: page number (1-based)
+    Search-based queries also carry the configured filters (search_filter_terms).
     """
     
     orchestrator.refresh_globals()
     
     query_lower = query_type.lower()
+    filter_terms = search_filter_terms()
 
     # Homepage
     if query_lower == "homepage":
@@ -547,7 +685,7 @@ def build_url(query_type: str, query_value: str, sort_value: str, page: int) ->
             search_value = f'"{search_value}"'
         
         # Use urllib.parse.quote so spaces become '%20'
-        encoded = urllib.parse.quote(f"{query_type}:{search_value}", safe=':"')
+        encoded = urllib.parse.quote(" ".join([f"{query_type}:{search_value}", *filter_terms]), safe=':"')
         
         if sort_value == "date":
             built_url = f"{nhentai_api_base}/galleries/search?query={encoded}&page={page}"
@@ -561,7 +699,17 @@ def build_url(query_type: str, query_value: str, sort_value: str, page: int) ->
         search_value = query_value.strip('"').strip("'")
 
         # Use urllib.parse.quote_plus so spaces become '+', not '%20'
-        encoded = urllib.parse.quote_plus(search_value)
+        encoded = urllib.parse.quote_plus(" ".join([search_value, *filter_terms]))
+
+        if sort_value == "date":
+            built_url = f"{nhentai_api_base}/galleries/search?query={encoded}&page={page}"
+        else:
+            built_url = f"{nhentai_api_base}/galleries/search?query={encoded}&page={page}&sort={sort_value}"
+        return built_url
+
+    # Upload-date windows (archive_planner)
+    if query_lower == "uploaded":
+        encoded = urllib.parse.quote_plus(" ".join([*uploaded_terms(query_value), *filter_terms]))
 
         if sort_value == "date":
             built_url = f"{nhentai_api_base}/galleries/search?query={encoded}&page={page}"
@@ -574,6 +722,33 @@ def build_url(query_type: str, query_value: str, sort_value: str, page: int) ->
 # ===============================
 # FETCH GALLERY IDS
 # ===============================
+def query_filter_suffix(query_type: str) -> str:
+    """
+    Key suffix for the filters pushed into a query (search_filter_terms). Filters change which galleries a
+    search returns, so checkpoints and high-water marks are only valid for the same filters.
+    Homepage listings don't take filters.
+    """
+
+    if query_type.lower() == "homepage":
+        return ""
+    terms = search_filter_terms()
+    return "|" + " ".join(terms) if terms else ""
+
+def query_high_water_key(query_type: str, query_value: str | None) -> str:
+    return f"{query_type.lower()}|{query_value or ''}" + query_filter_suffix(query_type)
+
+def query_crawl_key(query_type: str, query_value: str | None, sort_value: str, start_page: int, end_page: int | None) -> str:
+    """
+    Checkpoint key for a crawl. Upload-date windows also carry the upload ages their URLs ask for (uploaded_terms):
+    those are relative to now, so a window's page N only holds the same galleries for a run asking the same ages.
+    """
+
+    value = query_value or ""
+    if query_type.lower() == "uploaded":
+        value += "|" + " ".join(uploaded_terms(query_value))
+    key = f"{query_type.lower()}|{value}|{sort_value}|{start_page}|{end_page if end_page is not None else 'all'}"
+    return key + query_filter_suffix(query_type)
+
 def fetch_gallery_ids(
     query_type: str,
     query_value: str,
@@ -582,15 +757,26 @@ def fetch_gallery_ids(
     end_page: int | None = None,
     file_used: bool = False,
     fetch_as_archival: bool = DEFAULT_ARCHIVING,
-) -> set[int]:
+    return_metadata: bool = False,
+    progress_callback=None,
+    crawl_stats: dict | None = None,
+    id_sink=None,
+) -> set[int] | tuple[set[int], dict[int, dict]]:
     """
     Fetch gallery IDs from NHentai based on query type, value, and optional sort type.
+    Listing pages already contain full gallery objects, these are stored in the metadata cache
+    so process_galleries doesn't need to fetch them again.
 
     query_type: homepage, artist, group, tag, character, parody, search
     query_value: string query value (None for homepage)
     sort_value: date / recent / today / week / popular / all_time (defaults to 'date')
     start_page, end_page: pagination (auto-defaults depend on archival flag)
     archival: if True, crawl until NHentai returns no more results (ignores end_page)
+    return_metadata: if True, return (ids, {id: meta}) instead of just the IDs
+    progress_callback: called as progress_callback(page, num_ids) after each page
+    crawl_stats: optional dict filled in with what this run walked (first_page, last_page, num_pages, per_page,
+                 results, failed_pages, finished), so callers can check a crawl is complete
+    id_sink: optional gallery_stream.GalleryStream, each page's IDs are pushed into it as soon as they are found
     """
     
     global archiving
@@ -618,13 +804,123 @@ def fetch_gallery_ids(
             end_page = DEFAULT_PAGE_RANGE_END
 
     ids: set[int] = set()
+    metas: dict[int, dict] = {}
     page = start_page
+    crawl_images = 0
+
+    # Resume an interrupted crawl of the same query / sort / page range from its checkpoint.
+    # NOTE: metas only covers pages fetched in this run, earlier pages are already in the metadata cache.
+    crawl_key = query_crawl_key(query_type, query_value, sort_value, start_page, end_page)
+    crawl_finished = True
+    if orchestrator.resume_crawls:
+        checkpoint = database.load_crawl_checkpoint(crawl_key)
+        if checkpoint:
+            ids.update(checkpoint["ids"])
+            page = checkpoint["last_page"] + 1
+            crawl_images = checkpoint["num_images"]
+            with total_gallery_images_lock:
+                orchestrator.total_gallery_images += crawl_images
+            log_clarification()
+            logger.info(f"Fetcher: {query_type}{query_str}: Resuming from Page {page} ({len(ids)} Gallery IDs from checkpoint saved {checkpoint['updated_at']})")
+            if id_sink is not None:
+                id_sink.put_many(ids)
+    else:
+        database.clear_crawl_checkpoint(crawl_key)
+
+    stats = crawl_stats if crawl_stats is not None else {}
+    stats.update(first_page=page, last_page=page - 1, num_pages=None, per_page=None, results=0, failed_pages=0, finished=False)
+
+    # Incremental mode: date-sorted walks stop at the first page made up entirely of galleries
+    # at or below the highest ID a previous walk of this query has seen.
+    high_water_key = query_high_water_key(query_type, query_value)
+    high_water_mark = None
+    highest_seen = 0
+    if sort_value == "date" and orchestrator.incremental:
+        high_water_mark = database.get_high_water_mark(high_water_key)
+        if high_water_mark:
+            log(f"Fetcher: {query_type}{query_str}: Incremental, stopping at Gallery {high_water_mark}", "debug")
     
     #log_clarification("debug") # NOTE: DEBUGGING
     #log(f"START PAGE = {start_page}", "debug")
     #log(f"END PAGE = {end_page}", "debug")
     
-    gallery_ids_session = get_session(referrer="API", status="return")
+    def _fetch_page(page: int) -> tuple[str, requests.Response | None]:
+        """
+        Fetch one listing page on the calling (pool) thread.
+        Returns ("ok", resp), ("failed", None) to skip the page, ("offline", None) or ("down", None).
+        """
+
+        gallery_ids_session = get_worker_session(referrer="API")
+        url = build_url(query_type, query_value, sort_value, page)
+        log(f"Fetcher: Requesting URL: {url}", "debug")
+
+        resp = None
+        for attempt in range(1, orchestrator.max_retries + 1):
+            try:
+                resp = response_cache.get(gallery_ids_session, url, budget="api", timeout=adaptive_timeouts.timeout("list"))
+                if resp is None:
+                    return "offline", None
+
+                if resp.status_code == 429:
+                    wait = concurrency_controller.throttle_wait(resp, dynamic_sleep("api", attempt=attempt))
+                    logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: 429 rate limit, waiting {wait:.2f}s")
+                    concurrency_controller.backoff("gallery", resp.status_code, wait)
+                    continue
+
+                if resp.status_code == 403:
+                    wait = concurrency_controller.throttle_wait(resp, dynamic_sleep("api", attempt=attempt))
+                    logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: 403 forbidden, retrying in {wait:.2f}s")
+                    concurrency_controller.backoff("gallery", resp.status_code, wait)
+                    continue
+
+                resp.raise_for_status()
+                if resp.cache_status != "hit":
+                    concurrency_controller.record("gallery", resp.status_code, resp.elapsed.total_seconds())
+                    adaptive_timeouts.record_latency("list", resp.elapsed.total_seconds())
+                return "ok", resp
+
+            except circuit_breaker.CircuitOpenError as e:
+                logger.warning(f"{query_type}{query_str}, Page {page}: {e}")
+                return "down", None
+
+            except requests.RequestException as e:
+                adaptive_timeouts.record_error("list", e)
+                if attempt >= orchestrator.max_retries:
+                    log_clarification("debug")
+                    logger.warning(f"{query_type} {f'{query_value}' if query_value == None else ''}, Page {page}: Failed after {attempt} retries: {e}")
+                    resp = None
+
+                    # Tor fallback
+                    if use_tor:
+                        wait = dynamic_sleep("api", attempt=attempt) * 2
+                        logger.warning(f"{query_type}{query_str}, Page {page}: Retrying with new Tor node in {wait:.2f}s")
+                        time.sleep(wait)
+                        rotate_tor_identity(referrer="API")
+                        gallery_ids_session = get_worker_session(referrer="API")
+                        try:
+                            resp = response_cache.get(gallery_ids_session, url, budget="api", timeout=adaptive_timeouts.timeout("list"))
+                            resp.raise_for_status()
+                        except Exception as e2:
+                            logger.warning(f"{query_type}{query_str}, Page {page}: Still failed after Tor rotate: {e2}")
+                            resp = None
+                    break
+
+                wait = dynamic_sleep("api", attempt=attempt)
+                logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: Request failed: {e}, retrying in {wait:.2f}s")
+                time.sleep(wait)
+
+        return ("ok", resp) if resp is not None and resp.ok else ("failed", None)
+
+    # Listing responses report num_pages. Until a page has said how many there are, pages are fetched one at a
+    # time; after that up to --threads-pages pages are fetched ahead on a pool (all drawing from the shared
+    # "api" rate limit). Pages are still processed strictly in page order, so filtering, checkpoints and the
+    # stop conditions behave exactly as in a serial walk; pages fetched past a stop are just discarded.
+    # Beyond the last known page the walk carries on one page at a time, in case new uploads added pages.
+    page_workers = max(1, orchestrator.threads_pages)
+    page_executor = concurrent.futures.ThreadPoolExecutor(max_workers=page_workers, thread_name_prefix="listing-pages")
+    in_flight = {} # page -> future
+    next_page = page # Next page to submit
+    listing_pages = None # Last page number, from the latest listing response
 
     try:
         log_clarification("debug")
@@ -638,54 +934,31 @@ def fetch_gallery_ids(
             if end_page is not None and page > end_page:
                 break
 
-            url = build_url(query_type, query_value, sort_value, page)
-            log(f"Fetcher: Requesting URL: {url}", "debug")
-
-            resp = None
-            for attempt in range(1, orchestrator.max_retries + 1):
-                try:
-                    resp = gallery_ids_session.get(url, timeout=(60, 60))
-
-                    if resp.status_code == 429:
-                        wait = dynamic_sleep("api", attempt=attempt)
-                        logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: 429 rate limit, waiting {wait:.2f}s")
-                        time.sleep(wait)
-                        continue
-
-                    if resp.status_code == 403:
-                        wait = dynamic_sleep("api", attempt=attempt)
-                        logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: 403 forbidden, retrying in {wait:.2f}s")
-                        time.sleep(wait)
-                        continue
+            # Keep the pool busy with the pages after this one, up to the last known page.
+            last_known = max(page, listing_pages or page)
+            if end_page is not None:
+                last_known = min(last_known, end_page)
+            next_page = max(next_page, page)
+            while next_page <= last_known and len(in_flight) < page_workers:
+                in_flight[next_page] = page_executor.submit(_fetch_page, next_page)
+                next_page += 1
+
+            status, resp = in_flight.pop(page).result()
+            offline_miss = status == "offline"
+            host_down = status == "down"
+
+            if offline_miss:
+                logger.info(f"Fetcher: {query_type}{query_str}, Page {page}: Not in response cache (offline), stopping.")
+                crawl_finished = False # Keep the checkpoint so an online run carries on from here
+                break
 
-                    resp.raise_for_status()
-                    break  # success
-
-                except requests.RequestException as e:
-                    if attempt >= orchestrator.max_retries:
-                        log_clarification("debug")
-                        logger.warning(f"{query_type} {f'{query_value}' if query_value == None else ''}, Page {page}: Failed after {attempt} retries: {e}")
-                        resp = None
-
-                        # Tor fallback
-                        if use_tor:
-                            wait = dynamic_sleep("api", attempt=attempt) * 2
-                            logger.warning(f"{query_type}{query_str}, Page {page}: Retrying with new Tor node in {wait:.2f}s")
-                            time.sleep(wait)
-                            gallery_ids_session = get_session(referrer="API", status="rebuild")
-                            try:
-                                resp = gallery_ids_session.get(url, timeout=(60, 60))
-                                resp.raise_for_status()
-                            except Exception as e2:
-                                logger.warning(f"{query_type}{query_str}, Page {page}: Still failed after Tor rotate: {e2}")
-                                resp = None
-                        break
-
-                    wait = dynamic_sleep("api", attempt=attempt)
-                    logger.warning(f"{query_type}{query_str}, Page {page}: Attempt {attempt}: Request failed: {e}, retrying in {wait:.2f}s")
-                    time.sleep(wait)
+            if host_down:
+                logger.warning(f"Fetcher: {query_type}{query_str}: API is down, stopping at Page {page}.")
+                crawl_finished = False # Keep the checkpoint so the next run carries on from here
+                break
 
             if resp is None:
+                stats["failed_pages"] += 1
                 page += 1
                 continue  # skip this page
 
@@ -693,13 +966,26 @@ def fetch_gallery_ids(
                 data = resp.json()
             except Exception as e:
                 logger.warning(f"{query_type}{query_str}, Page {page}: Failed to decode JSON: {e}")
+                crawl_finished = False # Keep the checkpoint so the next run retries from this page
                 break
+
+            if isinstance(data.get("num_pages"), int):
+                if listing_pages is None and data["num_pages"] > page:
+                    log(f"Fetcher: {query_type}{query_str}: {data['num_pages']} pages, fetching {page_workers} at a time", "debug")
+                listing_pages = data["num_pages"]
+                stats["num_pages"] = listing_pages
+            if isinstance(data.get("per_page"), int):
+                stats["per_page"] = data["per_page"]
             
             # ------------------------------------
             # Filtering
             # ------------------------------------
             results = data.get("result", [])
+            if results:
+                stats["last_page"] = page
+                stats["results"] += len(results)
             batch = []
+            batch_metas = {}
 
             # --- Excluded Tags ---
             excluded_gallery_tags = [tag.lower() for tag in orchestrator.excluded_tags]
@@ -738,13 +1024,24 @@ def fetch_gallery_ids(
                         log(f"Skipping Gallery {g['id']} due to blocked languages: {blocked_langs}", "debug") # NOTE: DEBUGGING
                         continue
 
+                # --- Page count filter ---
+                gallery_pages = len(g.get("images", {}).get("pages", [])) or g.get("num_pages", 0)
+                if (orchestrator.min_gallery_pages and gallery_pages < orchestrator.min_gallery_pages) or (
+                    orchestrator.max_gallery_pages and gallery_pages > orchestrator.max_gallery_pages
+                ):
+                    log(f"Skipping Gallery {g['id']} due to page count: {gallery_pages}", "debug")
+                    continue
+
                 # If passed filters → keep
                 batch.append(int(g["id"]))
+                batch_metas[int(g["id"])] = g
                 
                 # --- Track total pages ---
                 images = g.get("images", {})
                 num_pages = len(images.get("pages", []))
-                orchestrator.total_gallery_images += num_pages
+                with total_gallery_images_lock:
+                    orchestrator.total_gallery_images += num_pages
+                crawl_images += num_pages
 
             log(f"Fetcher: {query_type}{query_str}, Page {page}: Fetched {len(batch)} Gallery IDs", "info")
             log(f"Current Total Images across All Galleries: {orchestrator.total_gallery_images}", "debug")
@@ -756,30 +1053,130 @@ def fetch_gallery_ids(
                 logger.info(f"Fetcher: {query_type}{query_str}, Page {page}: No more results from NHentai, stopping.")
                 break
 
+            page_ids = [int(g["id"]) for g in results]
+            highest_seen = max(highest_seen, *page_ids)
+
+            if high_water_mark and all(gid <= high_water_mark for gid in page_ids):
+                logger.info(f"Fetcher: {query_type}{query_str}, Page {page}: Reached galleries already seen (<= {high_water_mark}), stopping.")
+                break
+
             # If results exist but all were filtered out, just skip to next page
             if not batch:
                 logger.debug(f"Fetcher: {query_type}{query_str}, Page {page}: All galleries filtered out, continuing to next page.")
+                database.save_crawl_checkpoint(crawl_key, query_type, query_value, sort_value, start_page, end_page, page, [], crawl_images)
+                if progress_callback:
+                    progress_callback(page, len(ids))
                 page += 1
                 continue
 
             ids.update(batch)
+            metas.update(batch_metas)
+            cache_gallery_metadata_many(batch_metas) # Saves a metadata request per gallery later
+            if id_sink is not None:
+                id_sink.put_many(batch) # After caching, so the downloader finds the metadata
+            database.save_crawl_checkpoint(crawl_key, query_type, query_value, sort_value, start_page, end_page, page, batch, crawl_images)
+            if progress_callback:
+                progress_callback(page, len(ids))
             page += 1
 
+        stats["finished"] = crawl_finished
+        if crawl_finished:
+            database.clear_crawl_checkpoint(crawl_key)
+            # A walk that skipped failed pages has a gap, raising the mark over it would skip those galleries for good.
+            if sort_value == "date" and highest_seen and stats["failed_pages"] == 0:
+                database.set_high_water_mark(high_water_key, highest_seen)
+
         log(f"Fetched total {len(ids)} Galleries for {query_type}{query_str}", "warning")
         log(f"Overall Total Images across All Galleries: {orchestrator.total_gallery_images}", "debug")
-        return ids
+        return (ids, metas) if return_metadata else ids
 
     except Exception as e:
         logger.warning(f"Failed to fetch Galleries for {query_type}{query_str}: {e}")
+        return (set(), {}) if return_metadata else set()
+
+    finally:
+        # Pages fetched ahead of a stop aren't needed, don't wait for them.
+        page_executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_gallery_ids_many(crawls: list[dict], id_sink=None) -> set[int]:
+    """
+    Run many fetch_gallery_ids crawls on a bounded pool (--threads-queries).
+    crawls are dicts of fetch_gallery_ids keyword arguments. Duplicate crawls are only run once.
+    id_sink (a gallery_stream.GalleryStream) receives IDs from every crawl as they are found.
+    Every crawl draws from the shared "api" rate limit, so running them together doesn't raise the request rate.
+    Returns the merged, deduplicated set of gallery IDs.
+    """
+
+    orchestrator.refresh_globals()
+
+    unique_crawls = {}
+    for crawl in crawls:
+        key = tuple(sorted((k, str(v)) for k, v in crawl.items()))
+        unique_crawls.setdefault(key, crawl)
+    crawls = list(unique_crawls.values())
+
+    if not crawls:
         return set()
 
+    gallery_ids = set()
+    ids_lock = threading.Lock()
+    progress = {} # label -> "p<page> (<ids>)" for crawls still running
+    progress_lock = threading.Lock() # Written from every crawl thread
+
+    def _label(crawl):
+        value = crawl.get("query_value")
+        return f"{crawl['query_type']}" + (f":{value}" if value else "")
+
+    with tqdm(total=len(crawls), desc="Query crawls", unit="query", dynamic_ncols=True) as pbar:
+
+        def _update_postfix():
+            with progress_lock:
+                running = ", ".join(f"{label} {state}" for label, state in list(progress.items())[:3])
+            pbar.set_postfix_str(f"{len(gallery_ids)} IDs" + (f" | {running}" if running else ""))
+
+        def _run(crawl):
+            label = _label(crawl)
+
+            def _on_page(page, num_ids):
+                with progress_lock:
+                    progress[label] = f"p{page} ({num_ids})"
+                _update_postfix()
+
+            with progress_lock:
+                progress[label] = "starting"
+            try:
+                return label, fetch_gallery_ids(**crawl, progress_callback=_on_page, id_sink=id_sink)
+            finally:
+                with progress_lock:
+                    progress.pop(label, None)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, orchestrator.threads_queries)) as executor:
+            futures = [executor.submit(_run, crawl) for crawl in crawls]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    label, ids = future.result()
+                except Exception as e:
+                    logger.warning(f"Query crawl failed: {e}")
+                    pbar.update(1)
+                    continue
+
+                # Merge as each crawl finishes
+                with ids_lock:
+                    new_ids = ids - gallery_ids
+                    gallery_ids.update(ids)
+                log(f"Fetcher: {label}: {len(ids)} Gallery IDs ({len(new_ids)} new, {len(gallery_ids)} total)", "debug")
+                pbar.update(1)
+                _update_postfix()
+
+    return gallery_ids
+
 # ===============================
 # FETCH IMAGE URLS AND DOUJINSHI METADATA
 # ===============================
 def fetch_image_urls(meta: dict, page: int):
     """
     Returns the full image URL for a gallery page.
-    Tries mirrors from NHENTAI_MIRRORS in order until one succeeds.
+    Mirrors from NHENTAI_MIRRORS are ordered by health (mirror_registry), with pages striped across the healthy ones.
     Handles missing metadata, unknown types, and defaulting to webp.
     """
     
@@ -816,7 +1213,7 @@ def fetch_image_urls(meta: dict, page: int):
         #    nhentai_mirrors = [nhentai_mirrors]
         urls = [
             f"{mirror}/galleries/{meta.get('media_id', '')}/{filename}"
-            for mirror in orchestrator.nhentai_mirrors
+            for mirror in mirror_registry.mirrors_for_page(orchestrator.nhentai_mirrors, page)
         ]
 
         log(f"Fetcher: Built image URLs for Gallery {meta.get('id','?')}: Page {page}: {urls}", "debug") # NOTE: DEBUGGING
@@ -826,10 +1223,91 @@ def fetch_image_urls(meta: dict, page: int):
         logger.warning(f"Failed to build image URL for Gallery {meta.get('id','?')}: Page {page}: {e}")
         return None
 
+# ===============================
+# GALLERY METADATA
+# ===============================
+refreshed_metadata = set() # Galleries already re-fetched this run with --refresh-metadata
+refreshed_metadata_lock = threading.Lock()
+
+MAX_CACHED_METADATA = 100000 # Most recently fetched galleries kept by prune_gallery_metadata_cache()
+
+def get_cached_gallery_metadata(gallery_id: int):
+    """
+    Return cached metadata for a gallery, or None if it isn't cached, has expired,
+    or --refresh-metadata is set (and it hasn't been re-fetched yet this run).
+    """
+
+    orchestrator.refresh_globals()
+
+    if orchestrator.refresh_metadata:
+        with refreshed_metadata_lock:
+            if gallery_id not in refreshed_metadata:
+                return None
+
+    meta = database.get_cached_metadata(gallery_id, max_age_days=orchestrator.metadata_cache_ttl)
+    if meta is not None:
+        log(f"Fetcher: Using cached metadata for Gallery: {gallery_id}", "debug")
+    return meta
+
+def cache_gallery_metadata(gallery_id: int, meta):
+    """
+    Store freshly fetched metadata for a gallery.
+    """
+
+    if not isinstance(meta, dict):
+        return
+
+    database.cache_metadata(gallery_id, meta)
+    with refreshed_metadata_lock:
+        refreshed_metadata.add(gallery_id)
+
+def cache_gallery_metadata_many(metas: dict):
+    """
+    Store metadata harvested from listing pages: { gallery_id: meta }.
+    Gallery objects without page info are skipped, they'd be useless to the downloader.
+    """
+
+    metas = {
+        gallery_id: meta for gallery_id, meta in metas.items()
+        if isinstance(meta, dict) and meta.get("media_id") and meta.get("images", {}).get("pages")
+    }
+    if not metas:
+        return
+
+    database.cache_metadata_many(metas)
+    with refreshed_metadata_lock:
+        refreshed_metadata.update(metas)
+
+def prune_gallery_metadata_cache() -> int:
+    """
+    Drop cached metadata past --metadata-cache-ttl (it would be fetched again anyway) and all but the
+    MAX_CACHED_METADATA most recent galleries. Returns how many were dropped.
+    """
+
+    orchestrator.refresh_globals()
+
+    pruned = database.prune_cached_metadata(max_age_days=orchestrator.metadata_cache_ttl, max_rows=MAX_CACHED_METADATA)
+    if pruned:
+        log(f"Fetcher: Pruned cached metadata for {pruned} Galleries", "debug")
+    return pruned
+
 def fetch_gallery_metadata(gallery_id: int):
+    """
+    Return metadata for a gallery, from the local metadata cache if possible, otherwise from the API.
+    """
+
+    meta = get_cached_gallery_metadata(gallery_id)
+    if meta is not None:
+        return meta
+
+    meta = fetch_gallery_metadata_from_api(gallery_id)
+    cache_gallery_metadata(gallery_id, meta)
+    return meta
+
+def fetch_gallery_metadata_from_api(gallery_id: int):
     orchestrator.refresh_globals()
 
-    metadata_session = get_session(referrer="API", status="return")
+    metadata_session = get_worker_session(referrer="API")
     
     url = f"{nhentai_api_base}/gallery/{gallery_id}"
     for attempt in range(1, orchestrator.max_retries + 1):
@@ -837,18 +1315,22 @@ def fetch_gallery_metadata(gallery_id: int):
             log_clarification("debug")
             log(f"Fetcher: Fetching metadata for Gallery: {gallery_id}, URL: {url}", "debug")
 
-            resp = metadata_session.get(url, timeout=(60, 60))
+            circuit_breaker.check(url, park=True)
+            rate_limiter.acquire("gallery", priority=True)
+            resp = circuit_breaker.get(metadata_session, url, timeout=adaptive_timeouts.timeout("metadata"))
             if resp.status_code == 429:
-                wait = dynamic_sleep("api", attempt=(attempt))
+                wait = concurrency_controller.throttle_wait(resp, dynamic_sleep("api", attempt=(attempt)))
                 logger.warning(f"Gallery: {gallery_id}: Attempt {attempt}: 429 rate limit hit, waiting {wait}s")
-                time.sleep(wait)
+                concurrency_controller.backoff("gallery", resp.status_code, wait)
                 continue
             if resp.status_code == 403:
-                wait = dynamic_sleep("api", attempt=(attempt))
-                time.sleep(wait)
+                wait = concurrency_controller.throttle_wait(resp, dynamic_sleep("api", attempt=(attempt)))
+                concurrency_controller.backoff("gallery", resp.status_code, wait)
                 continue
             
             resp.raise_for_status()
+            concurrency_controller.record("gallery", resp.status_code, resp.elapsed.total_seconds())
+            adaptive_timeouts.record_latency("metadata", resp.elapsed.total_seconds())
             
             data = resp.json()
 
@@ -861,6 +1343,9 @@ def fetch_gallery_metadata(gallery_id: int):
             log(f"Fetcher: Fetched metadata for Gallery: {gallery_id}", "debug")
             #log(f"Fetcher: Metadata for Gallery: {gallery_id}: {data}", "debug") # NOTE: DEBUGGING
             return data
+        except circuit_breaker.CircuitOpenError as e:
+            logger.warning(f"Gallery: {gallery_id}: {e}")
+            return None
         except requests.HTTPError as e:
             if "404 Client Error: Not Found for url" in str(e):
                 logger.warning(f"Gallery: {gallery_id}: Not found (404), skipping retries.")
@@ -872,9 +1357,12 @@ def fetch_gallery_metadata(gallery_id: int):
                     wait = dynamic_sleep("api", attempt=(attempt)) * 2
                     logger.warning(f"Gallery: {gallery_id}: Attempt {attempt}: Metadata fetch failed: {e}, retrying with new Tor Node in {wait:.2f}s")
                     time.sleep(wait)
-                    metadata_session = get_session(referrer="API", status="rebuild")
+                    rotate_tor_identity(referrer="API")
+                    metadata_session = get_worker_session(referrer="API")
                     try:
-                        resp = metadata_session.get(url, timeout=(60, 60))
+                        circuit_breaker.check(url, park=True)
+                        rate_limiter.acquire("gallery", priority=True)
+                        resp = circuit_breaker.get(metadata_session, url, timeout=adaptive_timeouts.timeout("metadata"))
                         resp.raise_for_status()
                         return resp.json()
                     except Exception as e2:
@@ -884,6 +1372,7 @@ def fetch_gallery_metadata(gallery_id: int):
             logger.warning(f"Attempt {attempt} failed for Gallery: {gallery_id}: {e}, retrying in {wait:.2f}s")
             time.sleep(wait)
         except requests.RequestException as e:
+            adaptive_timeouts.record_error("metadata", e)
             if attempt >= orchestrator.max_retries:
                 logger.warning(f"Failed to fetch metadata for Gallery: {gallery_id} after max retries: {e}")
                 # Rebuild session with Tor and try again once
@@ -891,9 +1380,12 @@ def fetch_gallery_metadata(gallery_id: int):
                     wait = dynamic_sleep("api", attempt=(attempt)) * 2
                     logger.warning(f"Gallery: {gallery_id}: Attempt {attempt}: Metadata fetch failed: {e}, retrying with new Tor Node in {wait:.2f}s")
                     time.sleep(wait)
-                    metadata_session = get_session(referrer="API", status="rebuild")
+                    rotate_tor_identity(referrer="API")
+                    metadata_session = get_worker_session(referrer="API")
                     try:
-                        resp = metadata_session.get(url, timeout=(60, 60))
+                        circuit_breaker.check(url, park=True)
+                        rate_limiter.acquire("gallery", priority=True)
+                        resp = circuit_breaker.get(metadata_session, url, timeout=adaptive_timeouts.timeout("metadata"))
                         resp.raise_for_status()
                         return resp.json()
                     except Exception as e2:
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# mangascraper/core/archive_planner.py
+
+from datetime import date, datetime, timedelta, timezone
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import database
+from mangascraper.core import api
+
+# Partitioned --archive-all.
+#
+# Walking galleries/all?page=N from page 1 to the end is one long serial crawl, and the deep pages are the slowest
+# and most rate-limited requests on the site. Instead the archive is split into disjoint upload-date windows of
+# --archive-window-days days on a fixed calendar grid (so windows line up between runs), each crawled as an
+# "uploaded" search (api.build_url) with shallow pagination. plan_crawls returns the windows as crawls, which
+# build_gallery_list runs together with the other query crawls on one pool (api.fetch_gallery_ids_many,
+# --threads-queries), and record_crawls records the ones that completed.
+#
+# A window counts as complete once its crawl reached the last page the search reported, skipped no pages, and saw
+# the number of results that page count implies. Complete windows are recorded in the database (absolute dates,
+# with the search filters they were crawled with) and skipped by later runs. The open window containing today
+# is never recorded, new uploads keep landing in it.
+#
+# NHentai only takes upload ages relative to now, so an interrupted window is only resumed from its checkpoint by a
+# run asking the same ages (api.query_crawl_key), i.e. within the hour; the hour of widening on each bound absorbs
+# the drift in between. Older window checkpoints can't line up with the current pages any more and are dropped.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+ARCHIVE_EPOCH = date(2014, 6, 1) # Before the first NHentai upload; the oldest window is open-ended anyway
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _filters() -> str:
+    return " ".join(api.search_filter_terms())
+
+def _window_key(start: str, end: str) -> str:
+    return f"{start}..{end}"
+
+def _covered(start: str, end: str, completed) -> bool:
+    """
+    True if a completed window contains [start, end). "" is an open end.
+    """
+
+    for done_start, done_end in completed:
+        starts_before = done_start == "" or (start != "" and done_start <= start)
+        ends_after = done_end == "" or (end != "" and done_end >= end)
+        if starts_before and ends_after:
+            return True
+    return False
+
+def _is_complete(stats: dict) -> tuple[bool, str]:
+    """
+    Check a window crawl's stats (api.fetch_gallery_ids crawl_stats) for completeness.
+    """
+
+    if not stats.get("finished"):
+        return False, "crawl stopped early"
+    if stats["failed_pages"]:
+        return False, f"{stats['failed_pages']} pages failed"
+
+    num_pages = stats["num_pages"]
+    if num_pages is None:
+        return False, "no page count reported"
+    if num_pages == 0:
+        return True, "empty"
+    if stats["last_page"] < num_pages:
+        return False, f"stopped at page {stats['last_page']} of {num_pages}"
+
+    # Every page before the last one is full.
+    per_page = stats["per_page"]
+    if per_page:
+        walked = stats["last_page"] - stats["first_page"] + 1
+        expected = (walked - 1) * per_page + 1
+        if stats["results"] < expected:
+            return False, f"{stats['results']} results, expected at least {expected}"
+    return True, f"{num_pages} pages, {stats['results']} results"
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def plan_windows(window_days: int, today: date | None = None) -> list[tuple[str, str]]:
+    """
+    Split the archive into (start, end) upload-date windows, newest first.
+    Dates are "YYYY-MM-DD" (UTC, end exclusive); the oldest window has an open start and the newest an open end.
+    """
+
+    today = today or datetime.now(timezone.utc).date()
+    step = timedelta(days=window_days)
+
+    boundaries = []
+    boundary = ARCHIVE_EPOCH + step
+    while boundary <= today:
+        boundaries.append(boundary.isoformat())
+        boundary += step
+
+    edges = [""] + boundaries + [""]
+    windows = [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+    return list(reversed(windows))
+
+def plan_crawls() -> list[dict]:
+    """
+    api.fetch_gallery_ids_many crawls for every upload-date window not already recorded as complete.
+    Run them (on their own or with other query crawls), then pass them to record_crawls.
+    """
+
+    orchestrator.refresh_globals()
+
+    filters = _filters()
+    completed = database.list_archive_windows(filters)
+    windows = plan_windows(orchestrator.archive_window_days)
+    pending = [(start, end) for start, end in windows if not _covered(start, end, completed)]
+
+    log_clarification()
+    logger.info(
+        f"Archive Planner: {len(windows)} windows of {orchestrator.archive_window_days} days, "
+        f"{len(windows) - len(pending)} already complete, crawling {len(pending)}"
+    )
+
+    crawls = []
+    for start, end in pending:
+        crawls.append(dict(
+            query_type="uploaded",
+            query_value=_window_key(start, end),
+            sort_value="date",
+            start_page=1,
+            end_page=None,
+            fetch_as_archival=True,
+            crawl_stats={},
+        ))
+
+    # Drop window checkpoints made with different upload ages, their pages no longer line up.
+    current_keys = {api.query_crawl_key("uploaded", crawl["query_value"], "date", 1, None) for crawl in crawls}
+    for crawl_key, query_type, *_ in database.list_crawl_checkpoints():
+        if query_type.lower() == "uploaded" and crawl_key not in current_keys:
+            database.clear_crawl_checkpoint(crawl_key)
+            log(f"Archive Planner: Dropped stale window checkpoint {crawl_key}", "debug")
+
+    return crawls
+
+def record_crawls(crawls: list[dict]):
+    """
+    Record the windows plan_crawls' crawls completed, and reset the high-water marks of the incomplete ones.
+    """
+
+    filters = _filters()
+    incomplete = 0
+    for crawl in crawls:
+        start, _, end = crawl["query_value"].partition("..")
+        complete, detail = _is_complete(crawl["crawl_stats"])
+
+        if complete and end and end <= datetime.now(timezone.utc).date().isoformat():
+            stats = crawl["crawl_stats"]
+            database.mark_archive_window_completed(start, end, filters, stats["num_pages"], stats["results"])
+            log(f"Archive Planner: Window {crawl['query_value']} complete ({detail})", "debug")
+        elif not complete:
+            incomplete += 1
+            # Don't let an incremental re-run stop at galleries this partial crawl already saw.
+            database.clear_high_water_mark(api.query_high_water_key("uploaded", crawl["query_value"]))
+            logger.warning(f"Archive Planner: Window {crawl['query_value']} incomplete ({detail}), it will be crawled again next run")
+
+    results = sum(crawl["crawl_stats"].get("results", 0) for crawl in crawls)
+    logger.info(f"Archive Planner: {results} Gallery IDs, {len(crawls) - incomplete} of {len(crawls)} windows complete")
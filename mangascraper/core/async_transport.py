@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# mangascraper/core/async_transport.py
+
+import time, asyncio, threading
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core.api import get_session, rotate_tor_identity, dynamic_sleep, get_cached_gallery_metadata, cache_gallery_metadata
+from mangascraper.core import rate_limiter
+from mangascraper.core import concurrency_controller
+from mangascraper.core import circuit_breaker
+
+# aiohttp (and aiohttp-socks for Tor) are optional. If they are missing, is_available() returns False
+# and callers fall back to the threaded requests transport.
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from aiohttp_socks import ProxyConnector
+except ImportError:
+    ProxyConnector = None
+
+# This module drives gallery metadata requests from a single event loop running in a background thread.
+# With --use-async the downloader's prefetch stage hands it batches of galleries (fetch_gallery_metadata_many),
+# and up to --async-concurrency requests are in flight at once without a thread each. Images stay on the image
+# threads and the extension's download hook, which owns .part resume, the transfer watchdog, hedging and
+# the circuit breaker.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+TOR_PROXY = "socks5://127.0.0.1:9050"
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+_client = None # aiohttp.ClientSession, only touched from inside the event loop
+_client_lock = None # asyncio.Lock, created on the event loop
+_client_generation = 0 # Tor rotation (api.rotate_tor_identity) the client was built after
+_semaphore = None # asyncio.Semaphore bounding in-flight requests
+
+_fallback_warned = False
+
+################################################################################################################
+# EVENT LOOP
+################################################################################################################
+
+def is_available() -> bool:
+    """
+    Return True if the asyncio transport can be used with the current config.
+    """
+
+    global _fallback_warned
+
+    orchestrator.refresh_globals()
+
+    missing = None
+    if aiohttp is None:
+        missing = "aiohttp"
+    elif orchestrator.use_tor and ProxyConnector is None:
+        missing = "aiohttp-socks (needed for Tor)"
+
+    if missing is None:
+        return True
+
+    # Only warn once, this is checked for every gallery.
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning(f"Async Transport: {missing} is not installed, falling back to threaded requests.")
+    return False
+
+def _get_loop():
+    """
+    Start the background event loop on first use and return it.
+    """
+
+    global _loop, _loop_thread
+
+    with _loop_lock:
+        if _loop is None or not _loop_thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="AsyncTransport", daemon=True)
+            _loop_thread.start()
+            log("Async Transport: Event loop started.", "debug")
+        return _loop
+
+def run(coro):
+    """
+    Run a coroutine on the transport's event loop and block until it completes.
+    Safe to call from any number of threads.
+    """
+
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+def shutdown():
+    """
+    Close the client session and stop the event loop.
+    """
+
+    global _loop, _loop_thread, _client_lock, _semaphore
+
+    with _loop_lock:
+        if _loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(_close_client(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop_thread.join(timeout=5)
+        _loop = None
+        _loop_thread = None
+        _client_lock = None # asyncio primitives are bound to the loop that used them
+        _semaphore = None
+        log("Async Transport: Event loop stopped.", "debug")
+
+################################################################################################################
+# CLIENT SESSION
+################################################################################################################
+
+def _build_connector():
+    """
+    Build the connection pool, routed through Tor if enabled.
+    """
+
+    limit = max(1, orchestrator.async_concurrency)
+
+    if orchestrator.use_tor:
+        # rdns=True resolves hostnames through Tor, the same as socks5h:// in requests.
+        return ProxyConnector.from_url(TOR_PROXY, rdns=True, limit=limit, limit_per_host=limit)
+
+    return aiohttp.TCPConnector(limit=limit, limit_per_host=limit, ttl_dns_cache=300)
+
+async def _build_client(status: str = "build"):
+    """
+    Build (or rebuild) the aiohttp session, seeded with the headers and cookies of the cloudscraper session
+    so Cloudflare clearance carries over.
+    """
+
+    global _client
+
+    orchestrator.refresh_globals()
+
+    # get_session() blocks, so keep it off the event loop.
+    sync_session = await asyncio.to_thread(get_session, "Async Transport", status)
+    if sync_session is None:
+        sync_session = await asyncio.to_thread(get_session, "Async Transport", "build")
+
+    if _client is not None and not _client.closed:
+        await _client.close()
+
+    cookies = {cookie.name: cookie.value for cookie in sync_session.cookies}
+
+    _client = aiohttp.ClientSession(
+        connector=_build_connector(),
+        headers=dict(sync_session.headers),
+        cookies=cookies,
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=60),
+    )
+
+    log(f"Async Transport: {'Rebuilt' if status == 'rebuild' else 'Built'} client session (Concurrency: {orchestrator.async_concurrency}).", "debug")
+    return _client
+
+async def _get_client(status: str = "none"):
+    """
+    Return the shared aiohttp session, building it on first use.
+    status="rebuild" rotates the Tor identity (api.rotate_tor_identity) and rebuilds the client once per rotation,
+    as aiohttp can't drop its pooled connections (still on the old circuits) without closing the client.
+    """
+
+    global _client_lock, _semaphore, _client_generation
+
+    if _client_lock is None:
+        _client_lock = asyncio.Lock()
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, orchestrator.async_concurrency))
+
+    generation = await asyncio.to_thread(rotate_tor_identity, "Async Transport") if status == "rebuild" else None
+
+    async with _client_lock:
+        if generation is not None and (generation > _client_generation or _client is None or _client.closed):
+            _client_generation = generation
+            return await _build_client("return")
+        if _client is None or _client.closed:
+            return await _build_client("return")
+        return _client
+
+async def _close_client():
+    global _client
+
+    if _client is not None and not _client.closed:
+        await _client.close()
+    _client = None
+
+################################################################################################################
+# REQUESTS
+################################################################################################################
+
+async def fetch_json_async(url: str, label: str, budget: str = "gallery", priority: bool = False):
+    """
+    GET a JSON document with the same retry / Tor fallback behaviour as api.fetch_gallery_metadata.
+    Every request draws a token from the given rate limiter budget.
+    Returns the decoded JSON, or None on failure / 404.
+    """
+
+    orchestrator.refresh_globals()
+
+    client = await _get_client()
+
+    for attempt in range(1, orchestrator.max_retries + 1):
+        if not await circuit_breaker.allow_async(url, park=True):
+            logger.warning(f"{label}: Host is down, giving up.")
+            return None
+
+        try:
+            await rate_limiter.acquire_async(budget, priority=priority)
+            async with _semaphore:
+                start = time.monotonic()
+                async with client.get(url) as resp:
+                    status = resp.status
+                    circuit_breaker.record(url, status)
+                    if status not in (429, 403, 404):
+                        resp.raise_for_status()
+                        concurrency_controller.record("gallery", status, time.monotonic() - start)
+                        return await resp.json(content_type=None)
+                    wait = concurrency_controller.throttle_wait(resp, dynamic_sleep("api", attempt=attempt))
+
+            if status == 404:
+                logger.warning(f"{label}: Not found (404), skipping retries.")
+                return None
+
+            # 429 / 403: back off outside the semaphore so the slot is free for other requests.
+            logger.warning(f"{label}: Attempt {attempt}: {status} response, waiting {wait:.2f}s")
+            await concurrency_controller.backoff_async("gallery", status, wait)
+            continue
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+                circuit_breaker.record(url)
+
+            if attempt >= orchestrator.max_retries:
+                logger.warning(f"{label}: Failed after max retries: {e}")
+                break
+
+            wait = dynamic_sleep("api", attempt=attempt)
+            logger.warning(f"{label}: Attempt {attempt} failed: {e}, retrying in {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    # Rebuild session with Tor and try again once
+    if orchestrator.use_tor:
+        wait = dynamic_sleep("api", attempt=orchestrator.max_retries) * 2
+        logger.warning(f"{label}: Retrying with new Tor node in {wait:.2f}s")
+        await asyncio.sleep(wait)
+        client = await _get_client("rebuild")
+        try:
+            await rate_limiter.acquire_async(budget, priority=priority)
+            async with _semaphore:
+                async with client.get(url) as resp:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+        except Exception as e2:
+            logger.warning(f"{label}: Still failed after Tor rotate: {e2}")
+
+    return None
+
+async def fetch_gallery_metadata_async(gallery_id: int):
+    orchestrator.refresh_globals()
+
+    # The metadata cache is SQLite, keep it off the event loop.
+    meta = await asyncio.to_thread(get_cached_gallery_metadata, gallery_id)
+    if meta is not None:
+        return meta
+
+    url = f"{orchestrator.nhentai_api_base}/gallery/{gallery_id}"
+    log(f"Async Transport: Fetching metadata for Gallery: {gallery_id}, URL: {url}", "debug")
+
+    data = await fetch_json_async(url, f"Gallery: {gallery_id}", budget="gallery", priority=True)
+    if data is not None and not isinstance(data, dict):
+        logger.error(f"Unexpected response type for Gallery: {gallery_id}: {type(data)}")
+        return None
+
+    await asyncio.to_thread(cache_gallery_metadata, gallery_id, data)
+    return data
+
+################################################################################################################
+# SYNC WRAPPERS
+################################################################################################################
+
+def fetch_gallery_metadata(gallery_id: int):
+    """
+    Drop-in replacement for api.fetch_gallery_metadata.
+    """
+
+    return run(fetch_gallery_metadata_async(gallery_id))
+
+def fetch_gallery_metadata_many(gallery_ids: list[int]) -> dict:
+    """
+    Fetch metadata for many galleries concurrently (at most --async-concurrency requests in flight).
+    Returns {gallery_id: meta or None}; a gallery that failed is None rather than failing the whole batch.
+    """
+
+    async def _gather():
+        results = await asyncio.gather(*(fetch_gallery_metadata_async(gid) for gid in gallery_ids), return_exceptions=True)
+        return {gid: (None if isinstance(meta, BaseException) else meta) for gid, meta in zip(gallery_ids, results)}
+
+    return run(_gather())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# mangascraper/core/circuit_breaker.py
+
+import time, threading, asyncio, requests
+
+from urllib.parse import urlparse
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Per-host circuit breakers.
+#
+# When a host (the API, an image mirror, the Suwayomi server) goes down, every worker would otherwise spend
+# max_retries attempts and their sleeps finding that out for itself. Instead, requests report their outcome here
+# and each host's breaker moves between:
+# - closed:    requests flow normally. FAILURE_THRESHOLD consecutive failures open it.
+# - open:      requests fail fast (CircuitOpenError), or are parked until the host recovers.
+#              After the cooldown ONE request is let through as a probe (half-open).
+# - half-open: the probe's outcome decides: success closes the breaker (waking parked requests),
+#              failure reopens it with a longer cooldown.
+#
+# Only connection errors / timeouts and 5xx responses count as failures. 4xx (including 429 / 403, which are
+# handled by the concurrency controller) mean the host is up.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+FAILURE_THRESHOLD = 5 # Consecutive failures that open a breaker
+OPEN_COOLDOWN = 30.0 # Seconds before the first probe
+MAX_COOLDOWN = 300.0 # Cooldown doubles on every failed probe, up to this
+PROBE_TIMEOUT = 120.0 # A probe that never reports back is given up on after this
+MAX_PARK = 600.0 # Parked requests give up (fail) after this many seconds
+
+_breakers = {}
+_lock = threading.Lock()
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of sending a request to a host whose breaker is open.
+    """
+
+################################################################################################################
+# CIRCUIT BREAKER
+################################################################################################################
+
+class CircuitBreaker:
+    """
+    Breaker for one host.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = OPEN_COOLDOWN
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.fast_failures = 0
+        self._cond = threading.Condition()
+
+    def _open(self, reason: str):
+        # Caller holds _cond
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+        logger.warning(f"Circuit Breaker: {self.host} is down ({reason}), pausing requests for {self.cooldown:.0f}s")
+
+    def try_acquire(self) -> bool:
+        """
+        True if a request may be sent now (closed, or this caller is the half-open probe).
+        """
+
+        with self._cond:
+            now = time.monotonic()
+
+            if self.state == CLOSED:
+                return True
+
+            if self.state == HALF_OPEN and self.probe_started is not None and now - self.probe_started < PROBE_TIMEOUT:
+                return False
+
+            if self.state == OPEN and now - self.opened_at < self.cooldown:
+                return False
+
+            self.state = HALF_OPEN
+            self.probe_started = now
+            log(f"Circuit Breaker: Probing {self.host}", "debug")
+            return True
+
+    def wait_time(self) -> float:
+        with self._cond:
+            if self.state == OPEN:
+                return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            if self.state == HALF_OPEN and self.probe_started is not None:
+                return max(0.0, PROBE_TIMEOUT - (time.monotonic() - self.probe_started))
+            return 0.0
+
+    def park(self, timeout: float):
+        with self._cond:
+            if self.state != CLOSED:
+                self._cond.wait(timeout)
+
+    def on_success(self):
+        with self._cond:
+            if self.state != CLOSED:
+                logger.info(f"Circuit Breaker: {self.host} is back up, resuming requests.")
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = OPEN_COOLDOWN
+            self.probe_started = None
+            self._cond.notify_all()
+
+    def on_failure(self):
+        with self._cond:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+                self._open("probe failed")
+                self._cond.notify_all()
+            elif self.state == CLOSED and self.failures >= FAILURE_THRESHOLD:
+                self._open(f"{self.failures} consecutive failures")
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc or url
+
+def get_breaker(url: str) -> CircuitBreaker:
+    host = _host(url)
+    with _lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            _breakers[host] = breaker
+    return breaker
+
+def _is_failure(status_code) -> bool:
+    return status_code is None or status_code >= 500
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def allow(url: str, park: bool = False) -> bool:
+    """
+    Whether a request to url's host may be sent now.
+    park=True blocks while the host is down, until a probe succeeds (or this caller becomes the probe),
+    giving up after MAX_PARK seconds.
+    """
+
+    breaker = get_breaker(url)
+    deadline = time.monotonic() + MAX_PARK
+
+    while True:
+        if breaker.try_acquire():
+            return True
+
+        remaining = deadline - time.monotonic()
+        if not park or remaining <= 0:
+            breaker.fast_failures += 1
+            return False
+
+        breaker.park(min(remaining, max(0.1, breaker.wait_time())))
+
+async def allow_async(url: str, park: bool = False) -> bool:
+    breaker = get_breaker(url)
+    deadline = time.monotonic() + MAX_PARK
+
+    while True:
+        if breaker.try_acquire():
+            return True
+
+        remaining = deadline - time.monotonic()
+        if not park or remaining <= 0:
+            breaker.fast_failures += 1
+            return False
+
+        # Polls rather than waiting on the condition, which would block the event loop.
+        await asyncio.sleep(min(remaining, max(0.1, min(breaker.wait_time(), 1.0))))
+
+def check(url: str, park: bool = False):
+    """
+    allow(), raising CircuitOpenError if the request may not be sent.
+    """
+
+    if not allow(url, park=park):
+        raise CircuitOpenError(f"Circuit open for {_host(url)}, not sending request to {url}")
+
+def record(url: str, status_code=None):
+    """
+    Report a request's outcome. status_code None means no response (connection error / timeout).
+    """
+
+    breaker = get_breaker(url)
+    if _is_failure(status_code):
+        breaker.on_failure()
+    else:
+        breaker.on_success()
+
+def request(session, method: str, url: str, **kwargs):
+    """
+    Send a request with session (a requests.Session, or the requests module) and record its outcome.
+    Call check() / allow() first, this doesn't gate the request.
+    """
+
+    try:
+        resp = session.request(method, url, **kwargs)
+    except requests.RequestException:
+        record(url)
+        raise
+
+    record(url, resp.status_code)
+    return resp
+
+def get(session, url: str, **kwargs):
+    return request(session, "GET", url, **kwargs)
+
+def summary() -> dict:
+    """
+    Current state per host, for logging / the dashboard.
+    """
+
+    with _lock:
+        breakers = list(_breakers.values())
+
+    return {
+        b.host: {"state": b.state, "failures": b.failures, "cooldown": b.cooldown, "fast_failures": b.fast_failures}
+        for b in breakers
+    }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# mangascraper/core/clearance_store.py
+
+import time, threading
+
+from urllib.parse import urlparse
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import database
+from mangascraper.core import rate_limiter
+
+# Persistent Cloudflare clearance / cookie store.
+#
+# Every session api.get_session() builds used to start with an empty cookie jar, so the Cloudflare challenge was
+# solved again on startup and after every session rebuild. Instead:
+# - Cookies the site sets (cf_clearance, __cf_bm, ...) are captured by a response hook and stored in the database,
+#   together with the User-Agent they were issued to (clearance is only valid for that User-Agent).
+# - New sessions are seeded from the store, including the User-Agent, so they start out cleared.
+# - A background thread re-requests the site shortly before the clearance expires, so the challenge is solved
+#   there rather than in the middle of a worker's request.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+CLEARANCE_COOKIE = "cf_clearance"
+SESSION_COOKIE_TTL = 1800 # Seconds to keep cookies that don't carry an expiry
+REFRESH_MARGIN = 300 # Refresh clearance this many seconds before it expires
+CHECK_INTERVAL = 60 # Seconds between expiry checks
+REFRESH_TIMEOUT = (30, 30)
+
+_cookies = None # (domain, name, path) -> cookie dict, loaded from the database on first use
+_user_agent = None
+_lock = threading.Lock()
+
+_refresher = None
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _load():
+    # Caller holds _lock
+    global _cookies, _user_agent
+
+    if _cookies is None:
+        rows = database.load_clearance_cookies()
+        _cookies = {(r["domain"], r["name"], r["path"]): r for r in rows}
+        _user_agent = next((r["user_agent"] for r in rows if r["user_agent"]), None)
+
+def _cookie_dict(cookie) -> dict:
+    return {
+        "domain": cookie.domain,
+        "name": cookie.name,
+        "path": cookie.path,
+        "value": cookie.value,
+        "expires": float(cookie.expires) if cookie.expires else time.time() + SESSION_COOKIE_TTL,
+    }
+
+def _store(cookies: list[dict], user_agent: str | None):
+    global _user_agent
+
+    with _lock:
+        _load()
+        for c in cookies:
+            _cookies[(c["domain"], c["name"], c["path"])] = c
+        if user_agent:
+            _user_agent = user_agent
+    database.save_clearance_cookies(cookies, user_agent)
+
+def _site_root() -> str:
+    parsed = urlparse(orchestrator.nhentai_api_base)
+    return f"{parsed.scheme}://{parsed.netloc}/"
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def seed(session) -> bool:
+    """
+    Load the stored cookies (and the User-Agent they belong to) into a newly built session.
+    Returns True if there was anything to load.
+    """
+
+    now = time.time()
+    with _lock:
+        _load()
+        cookies = [c for c in _cookies.values() if c["expires"] is None or c["expires"] > now]
+        user_agent = _user_agent
+
+    if not cookies:
+        return False
+
+    for c in cookies:
+        session.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"], expires=int(c["expires"]) if c["expires"] else None)
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+
+    log(f"Clearance Store: Seeded session with {len(cookies)} stored cookie(s).", "debug")
+    return True
+
+def on_response(resp, *args, **kwargs):
+    """
+    Session response hook: store any cookies the response set.
+    """
+
+    if not resp.cookies:
+        return
+
+    try:
+        cookies = [_cookie_dict(cookie) for cookie in resp.cookies]
+        _store(cookies, resp.request.headers.get("User-Agent") if resp.request is not None else None)
+        log(f"Clearance Store: Stored {', '.join(c['name'] for c in cookies)} from {resp.url}", "debug")
+    except Exception as e:
+        log(f"Clearance Store: Failed to store cookies from {resp.url}: {e}", "debug")
+
+def expires_at() -> float | None:
+    """
+    Unix time the stored clearance expires, None if there is none.
+    """
+
+    with _lock:
+        _load()
+        expiries = [c["expires"] for c in _cookies.values() if c["name"] == CLEARANCE_COOKIE and c["expires"]]
+    return min(expiries) if expiries else None
+
+def _refresh_loop(session_getter):
+    while True:
+        time.sleep(CHECK_INTERVAL)
+
+        expires = expires_at()
+        if expires is None or expires - time.time() > REFRESH_MARGIN or expires <= time.time():
+            continue
+
+        session = session_getter()
+        if session is None:
+            continue
+
+        url = _site_root()
+        log(f"Clearance Store: Clearance expires in {expires - time.time():.0f}s, refreshing via {url}", "debug")
+        try:
+            # cloudscraper solves the challenge if one is served, on_response stores the new cookies.
+            rate_limiter.acquire("api")
+            session.get(url, timeout=REFRESH_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Clearance Store: Background clearance refresh failed: {e}")
+
+def start_refresher(session_getter):
+    """
+    Start the background refresh thread (once). session_getter returns the current global session.
+    """
+
+    global _refresher
+
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _refresher = threading.Thread(target=_refresh_loop, args=(session_getter,), name="clearance-refresher", daemon=True)
+        _refresher.start()
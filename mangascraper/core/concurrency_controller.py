@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# mangascraper/core/concurrency_controller.py
+
+import time, random, threading, asyncio
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Central AIMD (additive increase / multiplicative decrease) concurrency controller.
+#
+# Every worker reports its response codes and latencies here. The number of active gallery and image workers
+# is then resized live:
+# - A full window of healthy responses raises the limit by one worker.
+# - A 429 / 403 halves it. Latency well above the recent baseline trims it (at most once per window).
+# - Throttle responses also start ONE coordinated pause for every worker (honouring Retry-After),
+#   instead of every thread backing off (and retrying) on its own.
+#
+# The thread pools keep their configured size (--threads-galleries / --threads-images), the controller
+# only gates how many of those threads may be active at once.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+DECREASE_FACTOR = 0.5 # Multiplicative decrease on 429 / 403
+LATENCY_DECREASE_FACTOR = 0.9 # Gentler decrease when latency climbs
+LATENCY_CONGESTION_FACTOR = 3.0 # Latency (EWMA) this many times the baseline counts as congestion
+LATENCY_BASELINE_DECAY = 0.01 # Share of the gap the baseline moves up toward the EWMA per response
+LATENCY_DECREASE_WINDOW = 30.0 # Seconds between latency-triggered decreases
+LATENCY_EWMA_ALPHA = 0.2
+DECREASE_COOLDOWN = 5.0 # Seconds between decreases, so one burst of 429s only counts once
+MAX_PAUSE = 300.0 # Never pause for longer than this, whatever Retry-After says
+RESUME_JITTER = 0.5 # Spread workers out a little when a pause ends
+
+_pause_until = 0.0
+_pause_lock = threading.Lock()
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+################################################################################################################
+# RESIZABLE SEMAPHORE
+################################################################################################################
+
+class ResizableSemaphore:
+    """
+    Semaphore whose limit can be changed while threads hold / wait on it.
+    Lowering the limit doesn't interrupt active workers, it just stops new ones starting.
+    """
+
+    def __init__(self, limit: int):
+        self._cond = threading.Condition()
+        self.limit = max(1, int(limit))
+        self.active = 0
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, int(limit))
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+################################################################################################################
+# AIMD CONTROLLER
+################################################################################################################
+
+class AIMDController:
+    """
+    AIMD limit for one worker pool ("gallery" or "image").
+    """
+
+    def __init__(self, name: str, max_limit: int):
+        self.name = name
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = 1
+        self.limit = float(self.max_limit)
+        self.semaphore = ResizableSemaphore(self.max_limit)
+
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.latency_ewma = None
+        self.best_latency = None # Latency baseline: follows drops at once, rises slowly toward the EWMA
+        self.last_latency_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _apply(self, reason: str):
+        old = self.semaphore.limit
+        new = max(self.min_limit, min(self.max_limit, int(self.limit)))
+        if new != old:
+            self.semaphore.set_limit(new)
+            log(f"Concurrency: {self.name.capitalize()} workers {old} -> {new} ({reason})", "debug" if new > old else "info")
+
+    def set_max_limit(self, max_limit: int):
+        with self._lock:
+            max_limit = max(1, int(max_limit))
+            if max_limit == self.max_limit:
+                return
+            self.max_limit = max_limit
+            self.limit = min(self.limit, max_limit)
+            self._apply("config changed")
+
+    def _decrease(self, factor: float, reason: str):
+        now = time.monotonic()
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.successes = 0
+        self.limit = max(self.min_limit, self.limit * factor)
+        self._apply(reason)
+
+    def on_response(self, latency: float = None):
+        with self._lock:
+            if latency is not None:
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma = (LATENCY_EWMA_ALPHA * latency) + ((1 - LATENCY_EWMA_ALPHA) * self.latency_ewma)
+                if self.best_latency is None or self.latency_ewma < self.best_latency:
+                    self.best_latency = self.latency_ewma
+                else:
+                    # Re-baseline slowly, so a lasting shift (slower Tor circuit, larger images) stops counting as congestion.
+                    self.best_latency += LATENCY_BASELINE_DECAY * (self.latency_ewma - self.best_latency)
+
+                now = time.monotonic()
+                if (
+                    self.latency_ewma > self.best_latency * LATENCY_CONGESTION_FACTOR
+                    and now - self.last_latency_decrease >= LATENCY_DECREASE_WINDOW
+                ):
+                    self.last_latency_decrease = now
+                    self._decrease(LATENCY_DECREASE_FACTOR, f"latency {self.latency_ewma:.2f}s")
+
+            # Additive increase: one extra worker per window of (limit) healthy responses.
+            self.successes += 1
+            if self.successes >= max(1, int(self.limit)):
+                self.successes = 0
+                if self.limit < self.max_limit:
+                    self.limit += 1
+                    self._apply("healthy")
+
+    def on_throttle(self, status_code):
+        with self._lock:
+            self._decrease(DECREASE_FACTOR, f"{status_code} response")
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def is_enabled() -> bool:
+    orchestrator.refresh_globals()
+    return bool(orchestrator.adaptive_concurrency)
+
+def _max_limit(kind: str) -> int:
+    orchestrator.refresh_globals()
+    if kind == "gallery":
+        return orchestrator.threads_galleries
+    return orchestrator.threads_galleries * orchestrator.threads_images
+
+def get_controller(kind: str) -> AIMDController:
+    """
+    Return the controller for "gallery" or "image", keeping its ceiling in line with the thread config.
+    """
+
+    max_limit = _max_limit(kind)
+    with _controllers_lock:
+        controller = _controllers.get(kind)
+        if controller is None:
+            controller = AIMDController(kind, max_limit)
+            _controllers[kind] = controller
+    controller.set_max_limit(max_limit)
+    return controller
+
+def retry_after_seconds(response) -> float | None:
+    """
+    Parse a Retry-After header (seconds or HTTP date). Returns None if missing / invalid.
+    """
+
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def throttle_wait(response, fallback_wait: float) -> float:
+    """
+    How long to back off after a throttle response: Retry-After if the server sent one, else fallback_wait.
+    """
+
+    retry_after = retry_after_seconds(response)
+    wait = retry_after if retry_after is not None else fallback_wait
+    return min(MAX_PAUSE, wait)
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def record(kind: str, status_code, latency: float = None):
+    """
+    Report a completed response. kind is "gallery" (API / metadata) or "image".
+    """
+
+    if not is_enabled():
+        return
+
+    if status_code in (429, 403):
+        get_controller(kind).on_throttle(status_code)
+    elif status_code is not None and status_code < 400:
+        get_controller(kind).on_response(latency)
+
+def _start_pause(kind: str, status_code, wait: float) -> bool:
+    """
+    Shrink the pool and start (or extend) the global pause. Returns False if adaptive concurrency is off.
+    """
+
+    global _pause_until
+
+    if not is_enabled():
+        return False
+
+    get_controller(kind).on_throttle(status_code)
+
+    with _pause_lock:
+        until = time.monotonic() + wait
+        if until > _pause_until:
+            _pause_until = until
+            logger.warning(f"Concurrency: {status_code} response, pausing all workers for {wait:.2f}s")
+    return True
+
+def backoff(kind: str, status_code, wait: float):
+    """
+    Back off after a 429 / 403. With adaptive concurrency this shrinks the pool and waits on the
+    global pause shared by every worker; otherwise it just sleeps this thread.
+    """
+
+    if _start_pause(kind, status_code, wait):
+        wait_if_paused()
+    else:
+        time.sleep(wait)
+
+async def backoff_async(kind: str, status_code, wait: float):
+    if _start_pause(kind, status_code, wait):
+        await wait_if_paused_async()
+    else:
+        await asyncio.sleep(wait)
+
+def pause_remaining() -> float:
+    return max(0.0, _pause_until - time.monotonic())
+
+def wait_if_paused():
+    """
+    Block while a global pause is active.
+    """
+
+    remaining = pause_remaining()
+    while remaining > 0:
+        time.sleep(remaining)
+        remaining = pause_remaining() # Pause may have been extended meanwhile
+        if remaining <= 0:
+            time.sleep(random.uniform(0, RESUME_JITTER))
+
+async def wait_if_paused_async():
+    remaining = pause_remaining()
+    while remaining > 0:
+        await asyncio.sleep(remaining)
+        remaining = pause_remaining()
+        if remaining <= 0:
+            await asyncio.sleep(random.uniform(0, RESUME_JITTER))
+
+@contextmanager
+def slot(kind: str):
+    """
+    Hold one of the active worker slots for "gallery" or "image" while the block runs.
+    """
+
+    if not is_enabled():
+        yield
+        return
+
+    semaphore = get_controller(kind).semaphore
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+def status() -> dict:
+    """
+    Current limits, for logging / the dashboard.
+    """
+
+    with _controllers_lock:
+        return {
+            kind: {
+                "limit": controller.semaphore.limit,
+                "max_limit": controller.max_limit,
+                "active": controller.semaphore.active,
+                "latency_ewma": controller.latency_ewma,
+            }
+            for kind, controller in _controllers.items()
+        } | {"paused_for": pause_remaining()}
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # mangascraper/core/database.py
 
-import os, sqlite3, threading
+import os, sqlite3, threading, json, zlib
 
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 from mangascraper.core import orchestrator
 from mangascraper.core.orchestrator import *
@@ -68,6 +68,68 @@ def init_db():
             FOREIGN KEY (tag_id) REFERENCES Tags(id)
         );
 
+        CREATE TABLE IF NOT EXISTS GalleryMetadata (
+            gallery_id INTEGER PRIMARY KEY,
+            data BLOB,
+            fetched_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS ResponseCache (
+            url TEXT PRIMARY KEY,
+            body BLOB,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at TEXT,
+            expires_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS CrawlCheckpoints (
+            crawl_key TEXT PRIMARY KEY,
+            query_type TEXT,
+            query_value TEXT,
+            sort TEXT,
+            start_page INTEGER,
+            end_page INTEGER,
+            last_page INTEGER,
+            num_images INTEGER DEFAULT 0,
+            started_at TEXT,
+            updated_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS CrawlCheckpointGalleries (
+            crawl_key TEXT,
+            gallery_id INTEGER,
+            PRIMARY KEY (crawl_key, gallery_id),
+            FOREIGN KEY (crawl_key) REFERENCES CrawlCheckpoints(crawl_key)
+        );
+
+        CREATE TABLE IF NOT EXISTS HighWaterMarks (
+            query_key TEXT PRIMARY KEY,
+            highest_gallery_id INTEGER,
+            updated_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS ArchiveWindows (
+            window_start TEXT,
+            window_end TEXT,
+            filters TEXT,
+            num_pages INTEGER,
+            num_results INTEGER,
+            completed_at TEXT,
+            PRIMARY KEY (window_start, window_end, filters)
+        );
+
+        CREATE TABLE IF NOT EXISTS ClearanceCookies (
+            domain TEXT,
+            name TEXT,
+            path TEXT,
+            value TEXT,
+            expires REAL,
+            user_agent TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (domain, name, path)
+        );
+
         CREATE TABLE IF NOT EXISTS BrokenSymbols (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             symbol TEXT UNIQUE,
@@ -151,7 +213,323 @@ def list_galleries(status=None):
         else:
             cursor.execute("SELECT id, status, started_at, completed_at FROM Galleries")
         return cursor.fetchall()
-    
+
+# ===============================
+# GALLERY METADATA CACHE
+# ===============================
+def _compress_metadata(meta: dict) -> bytes:
+    return zlib.compress(json.dumps(meta, separators=(",", ":")).encode("utf-8"))
+
+def _decompress_metadata(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+def get_cached_metadata(gallery_id, max_age_days=None):
+    """
+    Return the cached API metadata for a gallery, or None if it isn't cached (or is older than max_age_days).
+    max_age_days of None / 0 means cached metadata never expires.
+    """
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT data, fetched_at FROM GalleryMetadata WHERE gallery_id=?", (gallery_id,))
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+
+    data, fetched_at = row
+    if max_age_days:
+        try:
+            if datetime.fromisoformat(fetched_at) < datetime.now(timezone.utc) - timedelta(days=max_age_days):
+                return None
+        except (TypeError, ValueError):
+            return None
+
+    try:
+        return _decompress_metadata(data)
+    except (zlib.error, ValueError):
+        return None
+
+def cache_metadata(gallery_id, meta: dict):
+    """Store (or replace) the API metadata for a gallery."""
+    cache_metadata_many({gallery_id: meta})
+
+def cache_metadata_many(metas: dict):
+    """Store (or replace) API metadata for many galleries at once: { gallery_id: meta }."""
+    rows = [
+        (int(gallery_id), _compress_metadata(meta), datetime.now(timezone.utc).isoformat())
+        for gallery_id, meta in metas.items()
+        if isinstance(meta, dict)
+    ]
+    if not rows:
+        return
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+        INSERT INTO GalleryMetadata (gallery_id, data, fetched_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(gallery_id) DO UPDATE SET
+            data=excluded.data,
+            fetched_at=excluded.fetched_at
+        """, rows)
+        conn.commit()
+
+def delete_cached_metadata(gallery_id=None):
+    """Drop cached metadata for one gallery, or for every gallery if gallery_id is None."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        if gallery_id is None:
+            cursor.execute("DELETE FROM GalleryMetadata")
+        else:
+            cursor.execute("DELETE FROM GalleryMetadata WHERE gallery_id=?", (gallery_id,))
+        conn.commit()
+
+def prune_cached_metadata(max_age_days=None, max_rows=None) -> int:
+    """
+    Drop cached metadata older than max_age_days, then all but the max_rows most recently fetched galleries.
+    Returns the number of rows deleted.
+    """
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        deleted = 0
+        if max_age_days:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).isoformat()
+            cursor.execute("DELETE FROM GalleryMetadata WHERE fetched_at IS NULL OR fetched_at < ?", (cutoff,))
+            deleted += cursor.rowcount
+        if max_rows:
+            cursor.execute("""
+            DELETE FROM GalleryMetadata WHERE gallery_id NOT IN (
+                SELECT gallery_id FROM GalleryMetadata ORDER BY fetched_at DESC LIMIT ?
+            )
+            """, (max_rows,))
+            deleted += cursor.rowcount
+        conn.commit()
+    return deleted
+
+# ===============================
+# LISTING PAGE RESPONSE CACHE
+# ===============================
+def get_cached_response(url):
+    """Return the cached response for a URL as a dict (body, etag, last_modified, fetched_at, expires_at), or None."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT body, etag, last_modified, fetched_at, expires_at FROM ResponseCache WHERE url=?", (url,))
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+
+    try:
+        body = zlib.decompress(row[0])
+    except zlib.error:
+        return None
+
+    return {"body": body, "etag": row[1], "last_modified": row[2], "fetched_at": row[3], "expires_at": row[4]}
+
+def cache_response(url, body: bytes, etag=None, last_modified=None, expires_at=None):
+    """Store (or replace) a response body and its validators."""
+    init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        INSERT INTO ResponseCache (url, body, etag, last_modified, fetched_at, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            body=excluded.body,
+            etag=excluded.etag,
+            last_modified=excluded.last_modified,
+            fetched_at=excluded.fetched_at,
+            expires_at=excluded.expires_at
+        """, (url, zlib.compress(body), etag, last_modified, now, expires_at))
+        conn.commit()
+
+def touch_cached_response(url, expires_at=None):
+    """Mark a cached response as revalidated (server answered 304 Not Modified)."""
+    init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE ResponseCache SET fetched_at = ?, expires_at = ? WHERE url = ?", (now, expires_at, url))
+        conn.commit()
+
+def prune_cached_responses(max_age_days=None, max_rows=None) -> int:
+    """
+    Drop cached responses not fetched or revalidated in max_age_days, then all but the max_rows most recent.
+    Returns the number of rows deleted.
+    """
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        deleted = 0
+        if max_age_days:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).isoformat()
+            cursor.execute("DELETE FROM ResponseCache WHERE fetched_at IS NULL OR fetched_at < ?", (cutoff,))
+            deleted += cursor.rowcount
+        if max_rows:
+            cursor.execute("""
+            DELETE FROM ResponseCache WHERE url NOT IN (
+                SELECT url FROM ResponseCache ORDER BY fetched_at DESC LIMIT ?
+            )
+            """, (max_rows,))
+            deleted += cursor.rowcount
+        conn.commit()
+    return deleted
+
+# ===============================
+# CRAWL CHECKPOINTS
+# ===============================
+def load_crawl_checkpoint(crawl_key):
+    """Return the saved state of an unfinished crawl as a dict (last_page, num_images, ids, updated_at), or None."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_page, num_images, updated_at FROM CrawlCheckpoints WHERE crawl_key=?", (crawl_key,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute("SELECT gallery_id FROM CrawlCheckpointGalleries WHERE crawl_key=?", (crawl_key,))
+        ids = {r[0] for r in cursor.fetchall()}
+    return {"last_page": row[0], "num_images": row[1] or 0, "updated_at": row[2], "ids": ids}
+
+def save_crawl_checkpoint(crawl_key, query_type, query_value, sort, start_page, end_page, last_page, new_ids, num_images):
+    """Record that a crawl has finished last_page, adding the IDs found on it."""
+    init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        INSERT INTO CrawlCheckpoints (crawl_key, query_type, query_value, sort, start_page, end_page, last_page, num_images, started_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(crawl_key) DO UPDATE SET
+            last_page=excluded.last_page,
+            num_images=excluded.num_images,
+            updated_at=excluded.updated_at
+        """, (crawl_key, query_type, query_value, sort, start_page, end_page, last_page, num_images, now, now))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO CrawlCheckpointGalleries (crawl_key, gallery_id) VALUES (?, ?)",
+            [(crawl_key, int(gallery_id)) for gallery_id in new_ids]
+        )
+        conn.commit()
+
+def clear_crawl_checkpoint(crawl_key):
+    """Drop a crawl's checkpoint once it has finished."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM CrawlCheckpointGalleries WHERE crawl_key=?", (crawl_key,))
+        cursor.execute("DELETE FROM CrawlCheckpoints WHERE crawl_key=?", (crawl_key,))
+        conn.commit()
+
+def list_crawl_checkpoints():
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT crawl_key, query_type, query_value, sort, last_page, started_at, updated_at FROM CrawlCheckpoints")
+        return cursor.fetchall()
+
+# ===============================
+# HIGH-WATER MARKS
+# ===============================
+def get_high_water_mark(query_key):
+    """Return the highest gallery ID seen by a completed date-sorted crawl of this query, or None."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT highest_gallery_id FROM HighWaterMarks WHERE query_key=?", (query_key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def set_high_water_mark(query_key, gallery_id):
+    """Raise a query's high-water mark (never lowers it)."""
+    init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        INSERT INTO HighWaterMarks (query_key, highest_gallery_id, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(query_key) DO UPDATE SET
+            highest_gallery_id=MAX(highest_gallery_id, excluded.highest_gallery_id),
+            updated_at=excluded.updated_at
+        """, (query_key, int(gallery_id), now))
+        conn.commit()
+
+def clear_high_water_mark(query_key):
+    """Forget a query's high-water mark, so its next incremental crawl walks every page again."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM HighWaterMarks WHERE query_key=?", (query_key,))
+        conn.commit()
+
+# ===============================
+# ARCHIVE WINDOWS
+# ===============================
+def list_archive_windows(filters):
+    """Return the (window_start, window_end) upload-date windows crawled completely with these search filters."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT window_start, window_end FROM ArchiveWindows WHERE filters=?", (filters,))
+        return cursor.fetchall()
+
+def mark_archive_window_completed(window_start, window_end, filters, num_pages, num_results):
+    """Record that an upload-date window (absolute UTC dates, "" = open-ended) was crawled completely."""
+    init_db()
+    now = datetime.now(timezone.utc).isoformat()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        INSERT INTO ArchiveWindows (window_start, window_end, filters, num_pages, num_results, completed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(window_start, window_end, filters) DO UPDATE SET
+            num_pages=excluded.num_pages,
+            num_results=excluded.num_results,
+            completed_at=excluded.completed_at
+        """, (window_start, window_end, filters, num_pages, num_results, now))
+        conn.commit()
+
+# ===============================
+# CLEARANCE COOKIES
+# ===============================
+def load_clearance_cookies():
+    """Return stored (unexpired) Cloudflare / site cookies as dicts, with the User-Agent they were issued to."""
+    init_db()
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT domain, name, path, value, expires, user_agent FROM ClearanceCookies WHERE expires IS NULL OR expires > ?",
+            (datetime.now(timezone.utc).timestamp(),),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+def save_clearance_cookies(cookies: list[dict], user_agent: str):
+    """Store cookies (dicts with domain, name, path, value, expires), replacing older copies. Drops expired ones."""
+    init_db()
+    now = datetime.now(timezone.utc)
+    with lock, sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+        INSERT INTO ClearanceCookies (domain, name, path, value, expires, user_agent, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(domain, name, path) DO UPDATE SET
+            value=excluded.value,
+            expires=excluded.expires,
+            user_agent=excluded.user_agent,
+            updated_at=excluded.updated_at
+        """, [
+            (c["domain"], c["name"], c["path"], c["value"], c["expires"], user_agent, now.isoformat())
+            for c in cookies
+        ])
+        cursor.execute("DELETE FROM ClearanceCookies WHERE expires IS NOT NULL AND expires <= ?", (now.timestamp(),))
+        conn.commit()
+
 # ===============================
 # BROKEN SYMBOLS MANAGEMENT
 # ===============================
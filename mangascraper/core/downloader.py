@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 # mangascraper/core/downloader.py
 
-import os, time, random, concurrent.futures, math
+import os, time, random, math, threading
 
-from tqdm.contrib.concurrent import thread_map
+from tqdm import tqdm
 
 from mangascraper.core import orchestrator
 from mangascraper.core.orchestrator import *
 from mangascraper.core import database as db
+from mangascraper.core import async_transport
+from mangascraper.core import session_pool
+from mangascraper.core import rate_limiter
+from mangascraper.core import concurrency_controller
+from mangascraper.core import mirror_registry
+from mangascraper.core import circuit_breaker
+from mangascraper.core import hedging
+from mangascraper.core import adaptive_timeouts
+from mangascraper.core import gallery_stream
+from mangascraper.core import pipeline
 from mangascraper.core.api import (
-    get_session, dynamic_sleep, fetch_gallery_metadata,
-    fetch_image_urls, get_meta_tags, make_filesystem_safe, clean_title
+    get_session, get_worker_session, dynamic_sleep, fetch_gallery_metadata,
+    fetch_image_urls, get_meta_tags, make_filesystem_safe, clean_title, prune_gallery_metadata_cache
 )
 from mangascraper.extensions.extension_manager import get_selected_extension  # Import active extension
 
@@ -250,61 +260,112 @@ def should_download_gallery(meta, gallery_title, num_pages, iteration: dict = No
 
     return True
 
-def submit_creator_tasks(executor, creator_tasks, gallery_id, local_session, safe_creator_name):
+class GalleryJob:
     """
-    Submit download tasks for a single creator's pages.
+    A gallery on its way through the download pipeline.
     """
-    
-    futures = [
-        executor.submit(
-            active_extension.download_images_hook,
-            gallery_id, page, urls, path, local_session, None, safe_creator_name
-        )
-        for page, urls, path, _ in creator_tasks
-    ]
-    # Just wait for completion
-    for _ in concurrent.futures.as_completed(futures):
-        pass
+
+    def __init__(self, gallery_id, meta):
+        self.gallery_id = gallery_id
+        self.meta = meta
+        self.tasks = [] # (page, img_urls, img_path, creator)
+        self.primary_creator = None
+        self.remaining = 0 # Pages still being downloaded
+        self.lock = threading.Lock()
 
 ####################################################################################################
 # CORE
 ####################################################################################################
-def process_galleries(batch_ids):
+def process_galleries(batch_ids, pbar=None):
+    """
+    Download galleries through a staged pipeline, each stage with its own workers and a bounded queue:
+    
+    prefetch  (2, only with --use-async)     fetch metadata in batches on the event loop (--async-concurrency)
+    metadata  (--threads-galleries)          fetch metadata, pacing and retries
+    planner   (2)                            skip checks, folders / symlinks, image URLs
+    images    (--threads-galleries x --threads-images)
+    finalize  (1)                            completion hooks and database
+    
+    Gallery threads no longer sit idle on image downloads and image threads no longer wait between galleries.
+    batch_ids can be any iterable (e.g. a GalleryStream batch), it is consumed as the metadata stage has room.
+    pbar (tqdm) is advanced once per gallery and shows each stage's busy workers and queue depth.
+    Returns the pipeline's stage metrics.
+    """
+
     orchestrator.refresh_globals()
     
-    for gallery_id in batch_ids:
-        extension_name = getattr(active_extension, "__name__", "skeleton")
+    # Use the asyncio transport for metadata if requested (and installed). Images always go through
+    # the extension's download hook, which owns .part resume, the watchdog, hedging and mirror bookkeeping.
+    # The prefetch stage fetches metadata for whole batches at once, so the metadata threads find it in the cache.
+    use_async = orchestrator.use_async and async_transport.is_available()
+    extension_name = getattr(active_extension, "__name__", "skeleton")
+    
+    def _gallery_done(gallery_id):
+        if pbar is not None:
+            pbar.update(1)
+            pbar.set_postfix_str(gallery_pipeline.status_line())
+
+    def _prefetch_metadata(gallery_ids, emit):
+        try:
+            metas = async_transport.fetch_gallery_metadata_many(gallery_ids)
+            fetched = sum(1 for meta in metas.values() if meta)
+            log(f"Downloader: Prefetched metadata for {fetched}/{len(gallery_ids)} Galleries via Async Transport", "debug")
+        finally:
+            for gallery_id in gallery_ids:
+                emit(gallery_id) # Failures are retried one by one in the metadata stage
+
+    def _resolve_metadata(gallery_id, emit):
         if not orchestrator.dry_run:
             db.mark_gallery_started(gallery_id, download_location, extension_name)
         else:
             log_clarification()
             logger.info(f"[DRY RUN] Downloader: Would mark Gallery {gallery_id} as started.")
 
-        gallery_attempts = 0
+        # Only as many galleries as the concurrency controller currently allows fetch metadata at once.
+        with concurrency_controller.slot("gallery"):
+            for gallery_attempts in range(1, orchestrator.max_retries + 1):
+                try:
+                    active_extension.pre_gallery_download_hook(gallery_id)
+                    log_clarification("debug")
+                    logger.debug("######################## GALLERY START ########################")
+                    log_clarification("debug")
+                    logger.debug(f"Downloader: Starting Gallery: {gallery_id} (Attempt {gallery_attempts}/{orchestrator.max_retries})")
+
+                    if use_async:
+                        meta = async_transport.fetch_gallery_metadata(gallery_id)
+                    else:
+                        meta = fetch_gallery_metadata(gallery_id)
+                    if not meta or not isinstance(meta, dict):
+                        logger.warning(f"Downloader: Failed to fetch metadata for Gallery: {gallery_id}")
+                        continue
+
+                    # Request pacing is done by the shared rate limiter. Only fall back to sleeping
+                    # before each gallery if the metadata budget is unlimited.
+                    if not (rate_limiter.is_enabled("gallery") or rate_limiter.is_enabled("total")):
+                        time.sleep(dynamic_sleep("gallery", attempt=gallery_attempts)) # Sleep before starting gallery.
 
-        while gallery_attempts < orchestrator.max_retries:
-            gallery_attempts += 1
-            try:
-                active_extension.pre_gallery_download_hook(gallery_id)
-                log_clarification("debug")
-                logger.debug("######################## GALLERY START ########################")
-                log_clarification("debug")
-                logger.debug(f"Downloader: Starting Gallery: {gallery_id} (Attempt {gallery_attempts}/{orchestrator.max_retries})")
-
-                meta = fetch_gallery_metadata(gallery_id)
-                if not meta or not isinstance(meta, dict):
-                    logger.warning(f"Downloader: Failed to fetch metadata for Gallery: {gallery_id}")
-                    if not orchestrator.dry_run and gallery_attempts >= orchestrator.max_retries:
-                        db.mark_gallery_failed(gallery_id)
-                    continue
+                    emit(GalleryJob(gallery_id, meta))
+                    return
 
+                except Exception as e:
+                    logger.error(f"Downloader: Error processing Gallery: {gallery_id}: {e}")
+
+        if not orchestrator.dry_run:
+            db.mark_gallery_failed(gallery_id)
+        _gallery_done(gallery_id)
+
+    def _plan_gallery(job, emit):
+        gallery_id = job.gallery_id
+        meta = job.meta
+        # Folders, symlinks and image URLs are retried like the metadata fetch before the gallery is failed.
+        for gallery_attempts in range(1, orchestrator.max_retries + 1):
+            job.tasks = []
+            try:
                 num_pages = len(meta.get("images", {}).get("pages", []))
                 active_extension.during_gallery_download_hook(gallery_id)
                 gallery_metas = active_extension.return_gallery_metas(meta)
                 creators = gallery_metas["creator"]
                 gallery_title = gallery_metas["title"]
-                
-                time.sleep(dynamic_sleep("gallery", attempt=gallery_attempts)) # Sleep before starting gallery.
 
                 # --- Decide if gallery should be skipped ---
                 skip_gallery = False
@@ -320,7 +381,8 @@ def process_galleries(batch_ids):
                     else:
                         log_clarification()
                         logger.info(f"[DRY RUN] Downloader: Would mark Gallery {gallery_id} as skipped.")
-                    break  # exit retry loop, skip gallery
+                    _gallery_done(gallery_id)
+                    return
 
                 # --- Prepare primary folder (first creator only) ---
                 primary_creator = make_filesystem_safe(creators[0]) if creators else "Unknown"
@@ -351,7 +413,6 @@ def process_galleries(batch_ids):
                         logger.info(f"Downloader: Symlinked {primary_creator} -> {extra_creator_safe}")
 
                 # --- Prepare download tasks (only once, for primary creator) ---
-                tasks = []
                 for i in range(num_pages):
                     page = i + 1
                     img_urls = fetch_image_urls(meta, page)
@@ -362,30 +423,87 @@ def process_galleries(batch_ids):
 
                     img_filename = f"{page}.{img_urls[0].split('.')[-1]}"
                     img_path = os.path.join(primary_folder, img_filename)
-                    tasks.append((page, img_urls, img_path, primary_creator))
-
-                # --- Download images (once, in primary creator's folder) ---
-                if tasks:
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=threads_images) as executor:
-                        if not orchestrator.dry_run:
-                            local_session = get_session(referrer="Downloader", status="return")
-                            submit_creator_tasks(executor, tasks, gallery_id, local_session, primary_creator)
-                        else:
-                            for _ in tasks:
-                                time.sleep(0.1)  # fake delay
-
-                if not orchestrator.dry_run:
-                    active_extension.after_completed_gallery_download_hook(meta, gallery_id)
-                    db.mark_gallery_completed(gallery_id)
+                    job.tasks.append((page, img_urls, img_path, primary_creator))
 
-                log_clarification()
-                logger.info(f"Downloader: Completed Gallery: {gallery_id}")
-                break  # exit retry loop on success
+                break
 
             except Exception as e:
-                logger.error(f"Downloader: Error processing Gallery: {gallery_id}: {e}")
-                if not orchestrator.dry_run and gallery_attempts >= orchestrator.max_retries:
-                    db.mark_gallery_failed(gallery_id)
+                logger.error(f"Downloader: Error processing Gallery: {gallery_id} (Attempt {gallery_attempts}/{orchestrator.max_retries}): {e}")
+        else:
+            if not orchestrator.dry_run:
+                db.mark_gallery_failed(gallery_id)
+            _gallery_done(gallery_id)
+            return
+
+        job.primary_creator = primary_creator
+        job.remaining = len(job.tasks)
+
+        # --- Download images (once, in primary creator's folder) ---
+        if not job.tasks:
+            emit(job, to="finalize")
+        else:
+            for task in job.tasks:
+                emit((job, task))
+
+    def _download_images(item, emit):
+        job, (page, urls, path, creator) = item
+        try:
+            if orchestrator.dry_run:
+                time.sleep(0.1)  # fake delay
+            else:
+                # Each image thread uses its own session (sharing cookies and the connection pool).
+                worker_session = get_worker_session(referrer="Downloader")
+                # Only as many image threads as the concurrency controller currently allows run at once.
+                with concurrency_controller.slot("image"):
+                    active_extension.download_images_hook(job.gallery_id, page, urls, path, worker_session, None, creator)
+        finally:
+            with job.lock:
+                job.remaining -= 1
+                last_page = job.remaining == 0
+            if last_page:
+                emit(job)
+
+    def _finalize(job, emit):
+        try:
+            if not orchestrator.dry_run:
+                active_extension.after_completed_gallery_download_hook(job.meta, job.gallery_id)
+                db.mark_gallery_completed(job.gallery_id)
+
+            log_clarification()
+            logger.info(f"Downloader: Completed Gallery: {job.gallery_id}")
+
+        except Exception as e:
+            logger.error(f"Downloader: Error processing Gallery: {job.gallery_id}: {e}")
+            if not orchestrator.dry_run:
+                db.mark_gallery_failed(job.gallery_id)
+
+        finally:
+            _gallery_done(job.gallery_id)
+
+    gallery_workers = max(1, orchestrator.threads_galleries)
+    image_workers = gallery_workers * max(1, orchestrator.threads_images)
+
+    stages = []
+    if use_async:
+        prefetch_batch = max(1, orchestrator.async_concurrency)
+        stages.append(pipeline.Stage("prefetch", _prefetch_metadata, workers=2, queue_size=prefetch_batch, batch_size=prefetch_batch))
+
+    gallery_pipeline = pipeline.Pipeline(stages + [
+        pipeline.Stage("metadata", _resolve_metadata, workers=gallery_workers, queue_size=gallery_workers * 2),
+        pipeline.Stage("planner", _plan_gallery, workers=2, queue_size=gallery_workers * 2),
+        pipeline.Stage("images", _download_images, workers=image_workers, queue_size=image_workers * 2),
+        pipeline.Stage("finalize", _finalize, workers=1, queue_size=gallery_workers * 4),
+    ])
+
+    with gallery_pipeline:
+        gallery_pipeline.feed(batch_ids)
+
+    stats = gallery_pipeline.stats()
+    log(f"Pipeline: {stats}", "debug")
+    bottleneck = gallery_pipeline.bottleneck()
+    if bottleneck:
+        log(f"Pipeline: Busiest stage: {bottleneck}", "debug")
+    return stats
 
 ####################################################################################################
 # MAIN
@@ -404,20 +522,44 @@ def start_batch(current_batch_number: int = 1, total_batch_numbers: int = 1, bat
     )
     log_clarification()
 
-    # Each gallery is processed in parallel with its own thread
-    thread_map(
-        lambda gid: process_galleries([gid]),
-        batch_list,
-        max_workers=orchestrator.threads_galleries,
-        desc=f"Batch {current_batch_number}/{total_batch_numbers}",
-        unit="gallery"
-    )
+    # Galleries go through the download pipeline (metadata -> planner -> images -> finalize) together
+    with tqdm(total=len(batch_list), desc=f"Batch {current_batch_number}/{total_batch_numbers}", unit="gallery", dynamic_ncols=True) as pbar:
+        process_galleries(batch_list, pbar)
 
     active_extension.post_batch_hook(current_batch_number, total_batch_numbers)
 
+def start_stream_batch(current_batch_number: int, stream: gallery_stream.GalleryStream) -> int:
+    """
+    Like start_batch, but takes up to BATCH_SIZE galleries from a GalleryStream as the crawls find them.
+    Returns the number of galleries processed (0 once the stream is exhausted).
+    """
+
+    load_extension(suppess_pre_run_hook=True) # Load extension without calling pre_run_hook again.
+
+    batch_list = [] # Filled in as galleries are taken from the stream
+    active_extension.pre_batch_hook(batch_list)
+
+    def _take():
+        # The pipeline's bounded metadata queue keeps this from taking galleries much faster than they start.
+        for gallery_id in stream.take(BATCH_SIZE):
+            batch_list.append(gallery_id)
+            yield gallery_id
+
+    with tqdm(desc=f"Batch {current_batch_number}", unit="gallery", dynamic_ncols=True) as pbar:
+        process_galleries(_take(), pbar)
+
+    if batch_list:
+        log_clarification()
+        logger.info(f"Batch {current_batch_number}: Processed {len(batch_list)} Galleries ({len(stream)} found so far)")
+        # The total isn't known until the crawls finish, estimate it from the galleries found so far.
+        total_batch_numbers = current_batch_number if stream.exhausted else max(current_batch_number + 1, math.ceil(len(stream) / BATCH_SIZE))
+        active_extension.post_batch_hook(current_batch_number, total_batch_numbers)
+    return len(batch_list)
+
 def start_downloader(gallery_list=None):
     """
     This is one this module's entrypoints.
+    gallery_list is a list of gallery IDs, or a gallery_stream.GalleryStream that query crawls are still filling.
     """
     
     global galleries
@@ -428,15 +570,41 @@ def start_downloader(gallery_list=None):
     
     orchestrator.refresh_globals()
     
-    orchestrator.galleries = gallery_list
+    streaming = isinstance(gallery_list, gallery_stream.GalleryStream)
+    if not streaming:
+        orchestrator.galleries = gallery_list
     
     start_time = time.perf_counter()  # Start timer
     
-    time_estimate(f"Run", gallery_list)
+    if streaming:
+        log_clarification()
+        logger.info("Downloader: Starting Run while Gallery IDs are still being fetched.")
+    else:
+        time_estimate(f"Run", gallery_list)
     
     load_extension(suppess_pre_run_hook=False) # Load extension and call pre_run_hook.
     
-    for batch_num in range(0, len(gallery_list), BATCH_SIZE):
+    # Open connections to the API host and image mirror before the first batch starts.
+    session_pool.prewarm_connections(get_session(referrer="Downloader", status="return"))
+    
+    if streaming:
+        stream = gallery_list
+        current_batch_number = 0
+        while stream.wait(): # Until the crawls are done and every gallery they found has been taken
+            current_batch_number += 1
+            start_stream_batch(current_batch_number, stream)
+            
+            if stream.wait(timeout=0) or not stream.exhausted: # Not last batch
+                log_clarification()
+                logger.info(f"Batch {current_batch_number} complete. Sleeping {orchestrator.batch_sleep_time}s before next batch...")
+                time.sleep(orchestrator.batch_sleep_time) # Pause between batches
+        
+        log_clarification()
+        logger.info(f"All batches complete.")
+        gallery_list = stream.seen()
+        orchestrator.galleries = gallery_list
+    
+    for batch_num in range(0, len(gallery_list) if not streaming else 0, BATCH_SIZE):
         batch_list = gallery_list[batch_num:batch_num + BATCH_SIZE]
         
         # batch_num is the start index (0, BATCH_SIZE, 2*BATCH_SIZE, ...)
@@ -474,5 +642,16 @@ def start_downloader(gallery_list=None):
     #update_skipped_galleries(True) # Report all skipped galleries at end
     log_clarification()
     log(f"All ({len(gallery_list)}) Galleries Processed In {human_runtime}.")
+    
+    async_transport.shutdown() # Stop the event loop if the asyncio transport was used.
+    prune_gallery_metadata_cache() # Every gallery this run needed has been downloaded
+
+    for mirror in mirror_registry.summary():
+        log(f"Mirror Registry: {mirror}", "debug")
+    for host, breaker in circuit_breaker.summary().items():
+        log(f"Circuit Breaker: {host}: {breaker}", "debug")
+    if orchestrator.hedge_requests:
+        log(f"Hedging: {hedging.summary()}", "debug")
+    log(f"Adaptive Timeouts: {adaptive_timeouts.summary()}", "debug")
 
     active_extension.post_run_hook()
\ No newline at end of file
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# mangascraper/core/gallery_stream.py
+
+import threading
+
+from collections import deque
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Streaming gallery ID producer / consumer.
+#
+# build_gallery_list used to run every query crawl, sort the whole ID set and only then hand it to
+# start_downloader, so a long archival crawl left the download threads idle for hours. With --stream-galleries
+# the crawls run in the background and push each listing page's IDs into a GalleryStream
+# (api.fetch_gallery_ids(id_sink=...)), and start_downloader consumes it as IDs arrive.
+#
+# The stream keeps one seen-set shared by every producer, so a gallery found by several crawls (or listed
+# explicitly as well) is only queued once. Galleries are downloaded in the order they are found rather than
+# highest ID first.
+
+################################################################################################################
+# GALLERY STREAM
+################################################################################################################
+
+class GalleryStream:
+    def __init__(self):
+        self._pending = deque()
+        self._seen = set()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put_many(self, gallery_ids) -> int:
+        """
+        Queue gallery IDs not seen before. Returns how many were new.
+        """
+
+        added = 0
+        with self._condition:
+            for gallery_id in gallery_ids:
+                gallery_id = int(gallery_id)
+                if gallery_id in self._seen:
+                    continue
+                self._seen.add(gallery_id)
+                self._pending.append(gallery_id)
+                added += 1
+            if added:
+                self._condition.notify_all()
+        return added
+
+    def close(self):
+        """
+        Mark the stream finished (all producers are done). Consumers drain what is left, then stop.
+        """
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Block until an ID is queued (True) or the stream is closed and drained (False).
+        Also returns False if timeout runs out with nothing queued.
+        """
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending or self._closed, timeout)
+            return bool(self._pending)
+
+    def take(self, limit: int):
+        """
+        Yield up to limit IDs as they arrive, waiting for producers. Stops early once the stream is closed and drained.
+        """
+
+        for _ in range(limit):
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                gallery_id = self._pending.popleft()
+            yield gallery_id
+
+    @property
+    def exhausted(self) -> bool:
+        with self._condition:
+            return self._closed and not self._pending
+
+    def seen(self) -> list[int]:
+        """
+        Every ID queued so far, highest first.
+        """
+
+        with self._condition:
+            return sorted(self._seen, reverse=True)
+
+    def __len__(self):
+        with self._condition:
+            return len(self._seen)
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def start_producer(produce, stream: GalleryStream, name: str = "gallery-producer") -> threading.Thread:
+    """
+    Run produce(stream) on a background thread, closing the stream when it returns (or fails).
+    """
+
+    def _run():
+        try:
+            produce(stream)
+        except Exception as e:
+            logger.error(f"Gallery Stream: Producer failed: {e}")
+        finally:
+            stream.close()
+            log(f"Gallery Stream: Producer finished, {len(stream)} Gallery IDs found", "debug")
+
+    thread = threading.Thread(target=_run, name=name, daemon=True)
+    thread.start()
+    return thread
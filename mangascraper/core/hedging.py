@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# mangascraper/core/hedging.py
+
+import time, threading, concurrent.futures
+
+from collections import deque
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import rate_limiter
+from mangascraper.core import circuit_breaker
+
+# Hedged image requests (--hedge-requests).
+#
+# A few image requests hang for most of their timeout while the rest answer in a fraction of a second, and one
+# slow page holds up its whole gallery. With hedging on, a request still waiting for its response headers after
+# the --hedge-percentile latency of recent requests gets a duplicate sent to another mirror. Whichever answers
+# first (successfully) is used, the other is closed when it returns.
+#
+# Hedges are capped at MAX_HEDGE_RATIO of image requests (plus a small burst), so a mirror slowing down across
+# the board can't double the load on everything else. Hedges draw their own image rate limiter token.
+#
+# The percentile is taken over the primary requests' latencies, recorded when each one returns, also when a hedge
+# answered first (leaving out the slow requests a hedge beat would drift the delay down).
+# A request only goes through the executor (so the caller can stop waiting on it) if it could be hedged;
+# otherwise it is sent from the calling thread.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+LATENCY_WINDOW = 500 # Recent response times the percentile is taken over
+MIN_SAMPLES = 20 # Don't hedge until this many responses have been seen
+MIN_HEDGE_DELAY = 0.25 # Never hedge sooner than this (seconds)
+MAX_HEDGE_RATIO = 0.1 # At most this fraction of requests get a hedge...
+HEDGE_BURST = 5 # ...plus this many, so the first slow requests can be hedged
+
+_latencies = deque(maxlen=LATENCY_WINDOW)
+_requests = 0
+_hedges = 0
+_hedge_wins = 0
+_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _get_executor():
+    """
+    Requests run on this pool so the caller can stop waiting on a slow one.
+    Sized for every image thread having a request and a hedge in flight.
+    """
+
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            workers = max(2, orchestrator.threads_galleries * orchestrator.threads_images * 2)
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        return _executor
+
+def hedge_delay() -> float | None:
+    """
+    Seconds to wait for a response before hedging, None until enough responses have been seen.
+    """
+
+    with _lock:
+        if len(_latencies) < MIN_SAMPLES:
+            return None
+        samples = sorted(_latencies)
+
+    index = min(len(samples) - 1, int(len(samples) * orchestrator.hedge_percentile / 100))
+    return max(MIN_HEDGE_DELAY, samples[index])
+
+def _hedge_available() -> bool:
+    with _lock:
+        return _hedges < (_requests * MAX_HEDGE_RATIO) + HEDGE_BURST
+
+def _take_hedge() -> bool:
+    global _hedges
+
+    with _lock:
+        if _hedges >= (_requests * MAX_HEDGE_RATIO) + HEDGE_BURST:
+            return False
+        _hedges += 1
+        return True
+
+def _send(session, url: str, kwargs: dict, hedge: bool):
+    if hedge:
+        rate_limiter.acquire("image")
+    start = time.monotonic()
+    resp = circuit_breaker.get(session, url, **kwargs)
+    latency = time.monotonic() - start
+    if not hedge:
+        with _lock:
+            _latencies.append(latency) # Whether or not this response ends up being used
+    return resp, url, latency
+
+def _discard(future):
+    """
+    Close the losing request's response once it arrives.
+    """
+
+    try:
+        resp, _, _ = future.result()
+        resp.close()
+    except Exception:
+        pass
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def get(session, url: str, alternates: list = (), **kwargs):
+    """
+    GET an image, hedging to the first available alternate mirror if the request is slow.
+    The caller should already hold an image rate limiter token for url.
+    Returns (response, url it came from). Raises the request's exception if every request sent failed.
+    """
+
+    global _requests, _hedge_wins
+
+    orchestrator.refresh_globals()
+
+    if not orchestrator.hedge_requests:
+        return circuit_breaker.get(session, url, **kwargs), url
+
+    with _lock:
+        _requests += 1
+
+    delay = hedge_delay()
+    if delay is None or not alternates or not _hedge_available():
+        # Nothing to hedge with, don't pay for the executor hand-off.
+        resp, _, _ = _send(session, url, kwargs, False)
+        return resp, url
+
+    executor = _get_executor()
+    primary = executor.submit(_send, session, url, kwargs, False)
+    pending = {primary}
+
+    done, _ = concurrent.futures.wait(pending, timeout=delay)
+    if not done:
+        alternate = next((a for a in alternates if circuit_breaker.allow(a)), None)
+        if alternate is not None and _take_hedge():
+            log(f"Hedging: {url} still waiting after {delay:.2f}s, also requesting {alternate}", "debug")
+            pending.add(executor.submit(_send, session, alternate, kwargs, True))
+
+    winner = None
+    fallback = None
+    error = None
+    while pending and winner is None:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            try:
+                resp, resp_url, latency = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+
+            if winner is None and resp.status_code < 400:
+                winner = (resp, resp_url, latency, future is not primary)
+            elif fallback is None:
+                fallback = (resp, resp_url)
+            else:
+                resp.close()
+
+    for future in pending:
+        future.add_done_callback(_discard)
+
+    if winner is None:
+        if fallback is not None:
+            return fallback
+        raise error
+
+    if fallback is not None:
+        fallback[0].close()
+
+    resp, resp_url, latency, hedged = winner
+    if hedged:
+        with _lock:
+            _hedge_wins += 1
+        log(f"Hedging: {resp_url} answered before {url}", "debug")
+    return resp, resp_url
+
+def summary() -> dict:
+    delay = hedge_delay()
+    with _lock:
+        return {
+            "requests": _requests,
+            "hedges": _hedges,
+            "hedge_wins": _hedge_wins,
+            "hedge_delay": delay,
+        }
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# mangascraper/core/http2_transport.py
+
+import threading, requests
+
+from urllib.parse import urlparse
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# httpx (with h2, and socksio for Tor) is optional. If it is missing, is_available() returns False
+# and image mirrors keep using the session's HTTP/1.1 adapters.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+try:
+    import socksio
+except ImportError:
+    socksio = None
+
+# HTTP/2 transport for image mirrors (--http2).
+#
+# Over HTTP/1.1 every concurrent image request needs its own connection (and TLS handshake, which is slow over
+# Tor). HTTP2Adapter is a requests transport adapter backed by an httpx HTTP/2 client, mounted by
+# api.get_session() on the image mirror prefixes. Requests from every image thread are multiplexed as streams
+# over a few connections per mirror, while callers keep using the normal requests API (stream=True,
+# iter_content, raise_for_status, ...).
+#
+# One httpx client is kept per proxy, so each Tor circuit (tor_circuits) gets its own multiplexed connections.
+# Mirrors that don't offer h2 are served over HTTP/1.1 by the same client.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+MAX_CONNECTIONS = 4 # Connections per client (per Tor circuit); each carries many concurrent streams
+KEEPALIVE_EXPIRY = 60.0
+RETIRE_DELAY = 120.0 # Seconds a replaced client is kept open for requests still using it
+
+_fallback_warned = False
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def is_available() -> bool:
+    """
+    Return True if the HTTP/2 transport can be used with the current config.
+    """
+
+    global _fallback_warned
+
+    orchestrator.refresh_globals()
+
+    missing = None
+    if httpx is None:
+        missing = "httpx"
+    elif h2 is None:
+        missing = "h2"
+    elif orchestrator.use_tor and socksio is None:
+        missing = "socksio (needed for Tor)"
+
+    if missing is None:
+        return True
+
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning(f"HTTP/2 Transport: {missing} is not installed, image mirrors will use HTTP/1.1.")
+    return False
+
+def _timeout(timeout):
+    """
+    Convert a requests timeout (number, (connect, read) tuple or None) to an httpx.Timeout.
+    The pool timeout matches the read timeout, threads wait for a stream rather than failing.
+    """
+
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return httpx.Timeout(connect=connect, read=read, write=read, pool=read)
+
+def _translate(e: Exception) -> requests.RequestException:
+    """
+    Map an httpx exception to the requests exception callers already handle.
+    """
+
+    if isinstance(e, httpx.ConnectTimeout):
+        return requests.ConnectTimeout(str(e))
+    if isinstance(e, (httpx.ReadTimeout, httpx.WriteTimeout, httpx.PoolTimeout)):
+        return requests.ReadTimeout(str(e))
+    if isinstance(e, httpx.ProxyError):
+        return requests.exceptions.ProxyError(str(e))
+    if isinstance(e, httpx.RemoteProtocolError):
+        return requests.exceptions.ChunkedEncodingError(str(e))
+    return requests.ConnectionError(str(e))
+
+class _RawResponse:
+    """
+    Stand-in for the urllib3 response requests expects on Response.raw.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self._iterator = None
+        self._buffer = b""
+        self._aborted = False
+
+    def stream(self, amt=None, decode_content=True):
+        try:
+            # iter_bytes decodes Content-Encoding, like urllib3 with decode_content=True.
+            for chunk in self._response.iter_bytes(amt):
+                if self._aborted:
+                    raise requests.ConnectionError("Transfer aborted")
+                yield chunk
+        except httpx.ReadTimeout as e:
+            # Mid-body, like urllib3's ReadTimeoutError surfacing from iter_content.
+            raise requests.ConnectionError(f"Read timed out: {e}")
+        except httpx.HTTPError as e:
+            raise _translate(e)
+        finally:
+            self._response.close()
+
+    def read(self, amt=None, decode_content=True):
+        if self._iterator is None:
+            self._iterator = self.stream(amt)
+        while amt is None or len(self._buffer) < amt:
+            try:
+                self._buffer += next(self._iterator)
+            except StopIteration:
+                break
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+
+    def abort(self):
+        """
+        Stop the transfer from another thread (transfer_watchdog). The connection is shared with other streams,
+        so only this stream is closed; a read blocked on it ends at the next chunk, or at the read timeout.
+        """
+
+        self._aborted = True
+        try:
+            self._response.close()
+        except Exception:
+            pass
+
+    def release_conn(self):
+        self._response.close()
+
+################################################################################################################
+# ADAPTER
+################################################################################################################
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    requests transport adapter sending requests through shared httpx HTTP/2 clients.
+    http1=False uses HTTP/2 prior knowledge (h2c) for plain http:// URLs.
+    """
+
+    def __init__(self, http1: bool = True, max_connections: int = MAX_CONNECTIONS):
+        super().__init__()
+        self.http1 = http1
+        self.max_connections = max_connections
+        self._clients = {} # proxy URL (or None) -> httpx.Client
+        self._lock = threading.Lock()
+
+    def _client(self, proxy: str | None):
+        with self._lock:
+            client = self._clients.get(proxy)
+            if client is None:
+                client = httpx.Client(
+                    http1=self.http1,
+                    http2=True,
+                    proxy=proxy,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    follow_redirects=False,
+                )
+                self._clients[proxy] = client
+                log(f"HTTP/2 Transport: Opened client{f' via {proxy}' if proxy else ''}", "debug")
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        scheme = urlparse(request.url).scheme
+        proxy = (proxies or {}).get(scheme) or (proxies or {}).get("all")
+
+        client = self._client(proxy)
+        try:
+            httpx_request = client.build_request(
+                request.method,
+                request.url,
+                headers=dict(request.headers),
+                content=request.body,
+                timeout=_timeout(timeout),
+            )
+            httpx_response = client.send(httpx_request, stream=True)
+        except httpx.HTTPError as e:
+            raise _translate(e)
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _RawResponse(httpx_response)
+        response.reason = httpx_response.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.http_version = httpx_response.http_version
+
+        if not stream:
+            response.content # Read the body now, like HTTPAdapter does
+        return response
+
+    def reset(self):
+        """
+        Start new clients (and connections) for future requests, e.g. after a Tor identity change.
+        Replaced clients are closed after RETIRE_DELAY, once requests still using them have finished.
+        """
+
+        with self._lock:
+            retired = list(self._clients.values())
+            self._clients = {}
+
+        for client in retired:
+            timer = threading.Timer(RETIRE_DELAY, client.close)
+            timer.daemon = True
+            timer.start()
+
+    def drop_proxy(self, proxy: str):
+        """
+        Retire the client for one proxy (a retired Tor circuit), closed after RETIRE_DELAY like reset().
+        """
+
+        with self._lock:
+            client = self._clients.pop(proxy, None)
+
+        if client is not None:
+            timer = threading.Timer(RETIRE_DELAY, client.close)
+            timer.daemon = True
+            timer.start()
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients = {}
+        for client in clients:
+            client.close()
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def mount(session, prefixes: list[str]):
+    """
+    Mount one shared HTTP2Adapter on the given URL prefixes (the image mirrors) of a session.
+    """
+
+    adapter = HTTP2Adapter()
+    for prefix in prefixes:
+        session.mount(prefix, adapter)
+    log(f"HTTP/2 Transport: Mounted on {', '.join(prefixes)}", "debug")
+    return adapter
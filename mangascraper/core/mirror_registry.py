@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# mangascraper/core/mirror_registry.py
+
+import time, threading
+
+from urllib.parse import urlparse
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Image mirror health registry.
+#
+# Image downloads report every attempt here (latency, bytes, success / failure) and each mirror keeps rolling
+# (EWMA) latency, throughput and error rate. api.fetch_image_urls() then:
+# - orders mirrors by score, so a slow or failing mirror stops being tried first, and
+# - stripes a gallery's pages across the healthy mirrors, so they share the load in parallel.
+#
+# Mirrors with no samples yet score as healthy, so every configured mirror gets tried.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4.0 # Score multiplier per unit of error rate (100% errors = 5x the latency)
+UNHEALTHY_ERROR_RATE = 0.5 # Mirrors above this error rate are left out of striping
+UNHEALTHY_SCORE_FACTOR = 3.0 # ...as are mirrors scoring worse than this many times the best mirror
+FAILURE_COOLDOWN = 60 # Seconds a mirror sits out of striping after its error rate makes it unhealthy
+
+_mirrors = {}
+_lock = threading.Lock()
+
+################################################################################################################
+# MIRROR STATS
+################################################################################################################
+
+class MirrorStats:
+    """
+    Rolling health of one mirror.
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.latency = None # Seconds per successful request (EWMA)
+        self.throughput = None # Bytes per second (EWMA)
+        self.error_rate = 0.0 # 0 - 1 (EWMA)
+        self.requests = 0
+        self.failures = 0
+        self.unhealthy_since = None
+
+    def record(self, ok: bool, latency: float = None, nbytes: int = None):
+        self.requests += 1
+        self.error_rate = (EWMA_ALPHA * (0.0 if ok else 1.0)) + ((1 - EWMA_ALPHA) * self.error_rate)
+
+        if not ok:
+            self.failures += 1
+            if self.error_rate >= UNHEALTHY_ERROR_RATE and self.unhealthy_since is None:
+                self.unhealthy_since = time.monotonic()
+                logger.warning(f"Mirror Registry: {self.origin} marked unhealthy (error rate {self.error_rate:.0%})")
+            return
+
+        if self.error_rate < UNHEALTHY_ERROR_RATE:
+            self.unhealthy_since = None
+
+        if latency is not None:
+            self.latency = latency if self.latency is None else (EWMA_ALPHA * latency) + ((1 - EWMA_ALPHA) * self.latency)
+            if nbytes and latency > 0:
+                rate = nbytes / latency
+                self.throughput = rate if self.throughput is None else (EWMA_ALPHA * rate) + ((1 - EWMA_ALPHA) * self.throughput)
+
+    def score(self) -> float:
+        """
+        Lower is better: expected seconds per request, penalised by error rate.
+        """
+
+        latency = self.latency if self.latency is not None else 0.0
+        return latency * (1 + ERROR_PENALTY * self.error_rate) + self.error_rate
+
+    def is_healthy(self) -> bool:
+        if self.unhealthy_since is None:
+            return True
+        # Give it another chance after the cooldown, the next result decides.
+        return time.monotonic() - self.unhealthy_since > FAILURE_COOLDOWN
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def _get_stats(origin: str) -> MirrorStats:
+    stats = _mirrors.get(origin)
+    if stats is None:
+        stats = MirrorStats(origin)
+        _mirrors[origin] = stats
+    return stats
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def record(url: str, ok: bool, latency: float = None, nbytes: int = None):
+    """
+    Report the outcome of an image request. latency is the full request time (including the body).
+    """
+
+    with _lock:
+        _get_stats(_origin(url)).record(ok, latency, nbytes)
+
+def ranked_mirrors(mirrors: list[str]) -> list[str]:
+    """
+    Return mirrors ordered best first. Ties keep the configured order.
+    """
+
+    with _lock:
+        scored = [(_get_stats(_origin(m)).score(), i, m) for i, m in enumerate(mirrors)]
+    return [m for _, _, m in sorted(scored)]
+
+def mirrors_for_page(mirrors: list[str], page: int) -> list[str]:
+    """
+    Mirror order for one page of a gallery. Pages are striped round-robin across the healthy mirrors
+    (those not failing and within UNHEALTHY_SCORE_FACTOR of the best), the rest follow as fallbacks.
+    """
+
+    ranked = ranked_mirrors(mirrors)
+    if len(ranked) <= 1:
+        return ranked
+
+    with _lock:
+        stats = {m: _get_stats(_origin(m)) for m in ranked}
+        best = stats[ranked[0]].score()
+        healthy = [
+            m for m in ranked
+            if stats[m].is_healthy() and stats[m].error_rate < UNHEALTHY_ERROR_RATE
+            and (best == 0 or stats[m].score() <= best * UNHEALTHY_SCORE_FACTOR)
+        ]
+
+    if not healthy:
+        return ranked
+
+    primary = healthy[(page - 1) % len(healthy)]
+    return [primary] + [m for m in ranked if m != primary]
+
+def summary() -> list[dict]:
+    """
+    Current stats per mirror, for logging / the dashboard.
+    """
+
+    with _lock:
+        return [
+            {
+                "mirror": s.origin,
+                "score": round(s.score(), 3),
+                "latency": s.latency,
+                "throughput": s.throughput,
+                "error_rate": round(s.error_rate, 3),
+                "requests": s.requests,
+                "failures": s.failures,
+                "healthy": s.is_healthy(),
+            }
+            for s in _mirrors.values()
+        ]
@@ -228,6 +228,12 @@ total_gallery_images = 0
 DEFAULT_ARCHIVING = False
 archiving = DEFAULT_RANGE_END
 
+DEFAULT_ARCHIVE_WINDOW_DAYS = 30 # --archive-all crawls upload-date windows of this many days (0 = walk the homepage serially)
+archive_window_days = DEFAULT_ARCHIVE_WINDOW_DAYS
+
+DEFAULT_STREAM_GALLERIES = False # Start downloading galleries while query crawls are still finding them
+stream_galleries = DEFAULT_STREAM_GALLERIES
+
 
 # ------------------------------------------------------------
 # Filters
@@ -240,6 +246,12 @@ DEFAULT_LANGUAGE = "english"
 # normalised into a list at import
 language = [DEFAULT_LANGUAGE.lower()]
 
+DEFAULT_MIN_GALLERY_PAGES = 0 # Skip galleries with fewer pages (0 = no minimum)
+min_gallery_pages = DEFAULT_MIN_GALLERY_PAGES
+
+DEFAULT_MAX_GALLERY_PAGES = 0 # Skip galleries with more pages (0 = no maximum)
+max_gallery_pages = DEFAULT_MAX_GALLERY_PAGES
+
 DEFAULT_TITLE_TYPE = "english"
 title_type = DEFAULT_TITLE_TYPE.lower()
 
@@ -266,6 +278,16 @@ DEFAULT_THREADS_IMAGES = 10
 calculated_threads_images = round(((MAX_ALLOWED_API_HITS / BATCH_SIZE) - threads_galleries) / threads_galleries)
 threads_images = min(max(MIN_THREADS_IMAGES, calculated_threads_images), MAX_THREADS_IMAGES)
 
+MIN_THREADS_QUERIES = 1
+MAX_THREADS_QUERIES = 100
+DEFAULT_THREADS_QUERIES = 4 # Query crawls (artists, tags, file lines, ...) run at once
+threads_queries = DEFAULT_THREADS_QUERIES
+
+MIN_THREADS_PAGES = 1
+MAX_THREADS_PAGES = 50
+DEFAULT_THREADS_PAGES = 4 # Listing pages of one query fetched at once, once num_pages is known
+threads_pages = DEFAULT_THREADS_PAGES
+
 DEFAULT_MAX_RETRIES = 3
 max_retries = DEFAULT_MAX_RETRIES
 
@@ -278,12 +300,34 @@ max_api_sleep = 0.75
 max_retry_sleep = DEFAULT_MAX_RETRY_SLEEP
 
 
+# ------------------------------------------------------------
+# Rate Limits (requests per second, 0 = unlimited)
+# ------------------------------------------------------------
+DEFAULT_RATE_LIMIT_API = 2.0 # Listing / search pages
+rate_limit_api = DEFAULT_RATE_LIMIT_API
+
+DEFAULT_RATE_LIMIT_GALLERY = 4.0 # Gallery metadata
+rate_limit_gallery = DEFAULT_RATE_LIMIT_GALLERY
+
+DEFAULT_RATE_LIMIT_IMAGES = 40.0 # Image fetches
+rate_limit_images = DEFAULT_RATE_LIMIT_IMAGES
+
+DEFAULT_RATE_LIMIT_TOTAL = 0.0 # Ceiling shared by all requests (metadata has priority)
+rate_limit_total = DEFAULT_RATE_LIMIT_TOTAL
+
+DEFAULT_ADAPTIVE_CONCURRENCY = True # Shrink / grow active workers on 429s / 403s and latency (AIMD)
+adaptive_concurrency = DEFAULT_ADAPTIVE_CONCURRENCY
+
+
 # ------------------------------------------------------------
 # Download Options
 # ------------------------------------------------------------
 DEFAULT_USE_TOR = True
 use_tor = DEFAULT_USE_TOR
 
+DEFAULT_TOR_CIRCUITS = 8 # Isolated Tor circuits shared by worker threads (1 = every thread on one circuit)
+tor_circuits = DEFAULT_TOR_CIRCUITS
+
 DEFAULT_SKIP_POST_BATCH = False
 skip_post_batch = DEFAULT_SKIP_POST_BATCH
 
@@ -299,6 +343,50 @@ calm = DEFAULT_CALM
 DEFAULT_DEBUG = False
 debug = DEFAULT_DEBUG
 
+
+# ------------------------------------------------------------
+# Transport
+# ------------------------------------------------------------
+DEFAULT_USE_ASYNC = False # Use the asyncio transport for metadata and image fetching
+use_async = DEFAULT_USE_ASYNC
+
+DEFAULT_ASYNC_CONCURRENCY = 100 # Maximum in-flight requests on the asyncio transport
+async_concurrency = DEFAULT_ASYNC_CONCURRENCY
+
+DEFAULT_HEDGE_REQUESTS = False # Send a duplicate image request to another mirror when one is slow
+hedge_requests = DEFAULT_HEDGE_REQUESTS
+
+DEFAULT_HEDGE_PERCENTILE = 95 # Image latency percentile after which a request is hedged
+hedge_percentile = DEFAULT_HEDGE_PERCENTILE
+
+DEFAULT_HTTP2 = False # Fetch images over HTTP/2 (httpx), multiplexing pages over a few connections per mirror
+http2 = DEFAULT_HTTP2
+
+DEFAULT_MIN_TRANSFER_RATE = 4.0 # KiB/s an image transfer must keep up over STALL_SECONDS (0 = no stall detection)
+min_transfer_rate = DEFAULT_MIN_TRANSFER_RATE
+
+DEFAULT_STALL_SECONDS = 20 # Seconds below MIN_TRANSFER_RATE before a transfer is aborted
+stall_seconds = DEFAULT_STALL_SECONDS
+
+
+# ------------------------------------------------------------
+# Metadata Cache
+# ------------------------------------------------------------
+DEFAULT_METADATA_CACHE_TTL = 30 # Days before cached gallery metadata is fetched again (0 = never expires)
+metadata_cache_ttl = DEFAULT_METADATA_CACHE_TTL
+
+DEFAULT_REFRESH_METADATA = False # Ignore cached metadata and fetch it from the API again
+refresh_metadata = DEFAULT_REFRESH_METADATA
+
+DEFAULT_CACHE_POLICY = "always-revalidate" # Listing page cache: always-revalidate / prefer-cache / offline
+cache_policy = DEFAULT_CACHE_POLICY
+
+DEFAULT_RESUME_CRAWLS = True # Resume interrupted page walks from their last checkpoint
+resume_crawls = DEFAULT_RESUME_CRAWLS
+
+DEFAULT_INCREMENTAL = False # Stop date-sorted walks once they reach galleries a previous walk has seen
+incremental = DEFAULT_INCREMENTAL
+
 # ------------------------------------------------------------
 # Helper: safe int from env
 # ------------------------------------------------------------
@@ -343,13 +431,37 @@ config = {
     "TITLE_TYPE": os.getenv("TITLE_TYPE", DEFAULT_TITLE_TYPE),
     "THREADS_GALLERIES": getenv_numeric_value("THREADS_GALLERIES", DEFAULT_THREADS_GALLERIES),
     "THREADS_IMAGES": getenv_numeric_value("THREADS_IMAGES", DEFAULT_THREADS_IMAGES),
+    "THREADS_QUERIES": getenv_numeric_value("THREADS_QUERIES", DEFAULT_THREADS_QUERIES),
     "MAX_RETRIES": getenv_numeric_value("MAX_RETRIES", DEFAULT_MAX_RETRIES),
     "USE_TOR": str(os.getenv("USE_TOR", DEFAULT_USE_TOR)).lower() == "true",
+    "TOR_CIRCUITS": getenv_numeric_value("TOR_CIRCUITS", DEFAULT_TOR_CIRCUITS),
     "SKIP_POST_BATCH": str(os.getenv("SKIP_POST_BATCH", DEFAULT_SKIP_POST_BATCH)).lower() == "true",
     "SKIP_POST_RUN": str(os.getenv("SKIP_POST_RUN", DEFAULT_SKIP_POST_RUN)).lower() == "true",
     "DRY_RUN": str(os.getenv("DRY_RUN", DEFAULT_DRY_RUN)).lower() == "true",
     "CALM": str(os.getenv("CALM", DEFAULT_CALM)).lower() == "true",
     "DEBUG": str(os.getenv("DEBUG", DEFAULT_DEBUG)).lower() == "true",
+    "USE_ASYNC": str(os.getenv("USE_ASYNC", DEFAULT_USE_ASYNC)).lower() == "true",
+    "ASYNC_CONCURRENCY": getenv_numeric_value("ASYNC_CONCURRENCY", DEFAULT_ASYNC_CONCURRENCY),
+    "RATE_LIMIT_API": getenv_numeric_value("RATE_LIMIT_API", DEFAULT_RATE_LIMIT_API),
+    "RATE_LIMIT_GALLERY": getenv_numeric_value("RATE_LIMIT_GALLERY", DEFAULT_RATE_LIMIT_GALLERY),
+    "RATE_LIMIT_IMAGES": getenv_numeric_value("RATE_LIMIT_IMAGES", DEFAULT_RATE_LIMIT_IMAGES),
+    "RATE_LIMIT_TOTAL": getenv_numeric_value("RATE_LIMIT_TOTAL", DEFAULT_RATE_LIMIT_TOTAL),
+    "ADAPTIVE_CONCURRENCY": str(os.getenv("ADAPTIVE_CONCURRENCY", DEFAULT_ADAPTIVE_CONCURRENCY)).lower() == "true",
+    "METADATA_CACHE_TTL": getenv_numeric_value("METADATA_CACHE_TTL", DEFAULT_METADATA_CACHE_TTL),
+    "REFRESH_METADATA": str(os.getenv("REFRESH_METADATA", DEFAULT_REFRESH_METADATA)).lower() == "true",
+    "CACHE_POLICY": os.getenv("CACHE_POLICY", DEFAULT_CACHE_POLICY),
+    "RESUME_CRAWLS": str(os.getenv("RESUME_CRAWLS", DEFAULT_RESUME_CRAWLS)).lower() == "true",
+    "INCREMENTAL": str(os.getenv("INCREMENTAL", DEFAULT_INCREMENTAL)).lower() == "true",
+    "HEDGE_REQUESTS": str(os.getenv("HEDGE_REQUESTS", DEFAULT_HEDGE_REQUESTS)).lower() == "true",
+    "HEDGE_PERCENTILE": getenv_numeric_value("HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE),
+    "HTTP2": str(os.getenv("HTTP2", DEFAULT_HTTP2)).lower() == "true",
+    "MIN_TRANSFER_RATE": getenv_numeric_value("MIN_TRANSFER_RATE", DEFAULT_MIN_TRANSFER_RATE),
+    "STALL_SECONDS": getenv_numeric_value("STALL_SECONDS", DEFAULT_STALL_SECONDS),
+    "THREADS_PAGES": getenv_numeric_value("THREADS_PAGES", DEFAULT_THREADS_PAGES),
+    "MIN_GALLERY_PAGES": getenv_numeric_value("MIN_GALLERY_PAGES", DEFAULT_MIN_GALLERY_PAGES),
+    "MAX_GALLERY_PAGES": getenv_numeric_value("MAX_GALLERY_PAGES", DEFAULT_MAX_GALLERY_PAGES),
+    "ARCHIVE_WINDOW_DAYS": getenv_numeric_value("ARCHIVE_WINDOW_DAYS", DEFAULT_ARCHIVE_WINDOW_DAYS),
+    "STREAM_GALLERIES": str(os.getenv("STREAM_GALLERIES", DEFAULT_STREAM_GALLERIES)).lower() == "true",
 }
 
 ##################
@@ -366,8 +478,10 @@ def refresh_globals():
         global download_path, doujin_txt_path, extension, extension_download_path
         global nhentai_api_base, nhentai_mirrors, page_sort, page_range_start, page_range_end
         global range_start, range_end, galleries, excluded_tags, language, title_type
-        global threads_galleries, threads_images, max_retries, min_retry_sleep, max_retry_sleep
-        global use_tor, skip_post_batch, skip_post_run, dry_run, calm, debug
+        global threads_galleries, threads_images, threads_queries, max_retries, min_retry_sleep, max_retry_sleep
+        global use_tor, tor_circuits, skip_post_batch, skip_post_run, dry_run, calm, debug
+        global use_async, async_concurrency, metadata_cache_ttl, refresh_metadata, cache_policy, resume_crawls, incremental
+        global rate_limit_api, rate_limit_gallery, rate_limit_images, rate_limit_total, adaptive_concurrency, hedge_requests, hedge_percentile, http2, min_transfer_rate, stall_seconds, threads_pages, min_gallery_pages, max_gallery_pages, archive_window_days, stream_galleries
 
         for key, default in {
             "DOWNLOAD_PATH": DEFAULT_DOWNLOAD_PATH,
@@ -387,13 +501,37 @@ def refresh_globals():
             "TITLE_TYPE": DEFAULT_TITLE_TYPE,
             "THREADS_GALLERIES": DEFAULT_THREADS_GALLERIES,
             "THREADS_IMAGES": DEFAULT_THREADS_IMAGES,
+            "THREADS_QUERIES": DEFAULT_THREADS_QUERIES,
             "MAX_RETRIES": DEFAULT_MAX_RETRIES,
             "USE_TOR": DEFAULT_USE_TOR,
+            "TOR_CIRCUITS": DEFAULT_TOR_CIRCUITS,
             "SKIP_POST_BATCH": DEFAULT_SKIP_POST_BATCH,
             "SKIP_POST_RUN": DEFAULT_SKIP_POST_RUN,
             "DRY_RUN": DEFAULT_DRY_RUN,
             "CALM": DEFAULT_CALM,
             "DEBUG": DEFAULT_DEBUG,
+            "USE_ASYNC": DEFAULT_USE_ASYNC,
+            "ASYNC_CONCURRENCY": DEFAULT_ASYNC_CONCURRENCY,
+            "RATE_LIMIT_API": DEFAULT_RATE_LIMIT_API,
+            "RATE_LIMIT_GALLERY": DEFAULT_RATE_LIMIT_GALLERY,
+            "RATE_LIMIT_IMAGES": DEFAULT_RATE_LIMIT_IMAGES,
+            "RATE_LIMIT_TOTAL": DEFAULT_RATE_LIMIT_TOTAL,
+            "ADAPTIVE_CONCURRENCY": DEFAULT_ADAPTIVE_CONCURRENCY,
+            "METADATA_CACHE_TTL": DEFAULT_METADATA_CACHE_TTL,
+            "REFRESH_METADATA": DEFAULT_REFRESH_METADATA,
+            "CACHE_POLICY": DEFAULT_CACHE_POLICY,
+            "RESUME_CRAWLS": DEFAULT_RESUME_CRAWLS,
+            "INCREMENTAL": DEFAULT_INCREMENTAL,
+            "HEDGE_REQUESTS": DEFAULT_HEDGE_REQUESTS,
+            "HEDGE_PERCENTILE": DEFAULT_HEDGE_PERCENTILE,
+            "HTTP2": DEFAULT_HTTP2,
+            "MIN_TRANSFER_RATE": DEFAULT_MIN_TRANSFER_RATE,
+            "STALL_SECONDS": DEFAULT_STALL_SECONDS,
+            "THREADS_PAGES": DEFAULT_THREADS_PAGES,
+            "MIN_GALLERY_PAGES": DEFAULT_MIN_GALLERY_PAGES,
+            "MAX_GALLERY_PAGES": DEFAULT_MAX_GALLERY_PAGES,
+            "ARCHIVE_WINDOW_DAYS": DEFAULT_ARCHIVE_WINDOW_DAYS,
+            "STREAM_GALLERIES": DEFAULT_STREAM_GALLERIES,
         }.items():
             globals()[key.lower()] = normalise_value(key, config.get(key, default))
     
@@ -426,13 +564,37 @@ def normalise_config():
         "TITLE_TYPE": DEFAULT_TITLE_TYPE,
         "THREADS_GALLERIES": DEFAULT_THREADS_GALLERIES,
         "THREADS_IMAGES": DEFAULT_THREADS_IMAGES,
+        "THREADS_QUERIES": DEFAULT_THREADS_QUERIES,
         "MAX_RETRIES": DEFAULT_MAX_RETRIES,
         "USE_TOR": DEFAULT_USE_TOR,
+        "TOR_CIRCUITS": DEFAULT_TOR_CIRCUITS,
         "SKIP_POST_BATCH": DEFAULT_SKIP_POST_BATCH,
         "SKIP_POST_RUN": DEFAULT_SKIP_POST_RUN,
         "DRY_RUN": DEFAULT_DRY_RUN,
         "CALM": DEFAULT_CALM,
         "DEBUG": DEFAULT_DEBUG,
+        "USE_ASYNC": DEFAULT_USE_ASYNC,
+        "ASYNC_CONCURRENCY": DEFAULT_ASYNC_CONCURRENCY,
+        "RATE_LIMIT_API": DEFAULT_RATE_LIMIT_API,
+        "RATE_LIMIT_GALLERY": DEFAULT_RATE_LIMIT_GALLERY,
+        "RATE_LIMIT_IMAGES": DEFAULT_RATE_LIMIT_IMAGES,
+        "RATE_LIMIT_TOTAL": DEFAULT_RATE_LIMIT_TOTAL,
+        "ADAPTIVE_CONCURRENCY": DEFAULT_ADAPTIVE_CONCURRENCY,
+        "METADATA_CACHE_TTL": DEFAULT_METADATA_CACHE_TTL,
+        "REFRESH_METADATA": DEFAULT_REFRESH_METADATA,
+        "CACHE_POLICY": DEFAULT_CACHE_POLICY,
+        "RESUME_CRAWLS": DEFAULT_RESUME_CRAWLS,
+        "INCREMENTAL": DEFAULT_INCREMENTAL,
+        "HEDGE_REQUESTS": DEFAULT_HEDGE_REQUESTS,
+        "HEDGE_PERCENTILE": DEFAULT_HEDGE_PERCENTILE,
+        "HTTP2": DEFAULT_HTTP2,
+        "MIN_TRANSFER_RATE": DEFAULT_MIN_TRANSFER_RATE,
+        "STALL_SECONDS": DEFAULT_STALL_SECONDS,
+        "THREADS_PAGES": DEFAULT_THREADS_PAGES,
+        "MIN_GALLERY_PAGES": DEFAULT_MIN_GALLERY_PAGES,
+        "MAX_GALLERY_PAGES": DEFAULT_MAX_GALLERY_PAGES,
+        "ARCHIVE_WINDOW_DAYS": DEFAULT_ARCHIVE_WINDOW_DAYS,
+        "STREAM_GALLERIES": DEFAULT_STREAM_GALLERIES,
     }
 
     #for key, default_val in defaults.items():
@@ -469,12 +631,15 @@ def normalise_value(key: str, value):
         # Ensure default mirror is first
         return [DEFAULT_NHENTAI_MIRRORS] + [m for m in mirrors if m != DEFAULT_NHENTAI_MIRRORS]
 
-    if key in ("USE_TOR", "SKIP_POST_RUN", "DRY_RUN", "CALM", "DEBUG"):
+    if key in ("USE_TOR", "SKIP_POST_RUN", "DRY_RUN", "CALM", "DEBUG", "USE_ASYNC", "ADAPTIVE_CONCURRENCY", "REFRESH_METADATA", "RESUME_CRAWLS", "INCREMENTAL", "HEDGE_REQUESTS", "HTTP2", "STREAM_GALLERIES"):
         return str(value).lower() == "true"
 
-    if key in ("THREADS_GALLERIES", "THREADS_IMAGES", "MAX_RETRIES"):
+    if key in ("THREADS_GALLERIES", "THREADS_IMAGES", "THREADS_QUERIES", "TOR_CIRCUITS", "MAX_RETRIES", "ASYNC_CONCURRENCY", "METADATA_CACHE_TTL", "HEDGE_PERCENTILE", "STALL_SECONDS", "THREADS_PAGES", "MIN_GALLERY_PAGES", "MAX_GALLERY_PAGES", "ARCHIVE_WINDOW_DAYS"):
         return int(value)
 
+    if key in ("RATE_LIMIT_API", "RATE_LIMIT_GALLERY", "RATE_LIMIT_IMAGES", "RATE_LIMIT_TOTAL", "MIN_TRANSFER_RATE"):
+        return float(value)
+
     # Default: return as string
     return str(value)
 
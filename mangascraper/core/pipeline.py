@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# mangascraper/core/pipeline.py
+
+import time, queue, threading
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Staged work pipeline with bounded queues.
+#
+# A Pipeline is a chain of Stages. Each Stage has its own worker threads and a bounded input queue; a worker
+# takes an item, runs the stage's handler on it, and the handler passes results on with emit() (to the next
+# stage, or to a named one). A full queue blocks the stage feeding it, so a slow stage holds back the ones
+# before it instead of letting work pile up in memory.
+#
+# The downloader uses this for galleries ([prefetch ->] metadata -> planner -> images -> finalizer), see
+# downloader.process_galleries.
+#
+# A stage created with batch_size > 1 hands its handler a list: the item a worker took plus whatever else is
+# already queued, up to batch_size (it never waits to fill a batch).
+#
+# Every stage keeps metrics: items processed / failed, busy workers, queue depth (now and peak), and how long
+# its workers spent working, waiting for input, and blocked on a full downstream queue. A stage that is always
+# busy with a full input queue is the bottleneck; one that mostly waits for input has spare capacity.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+_STOP = object() # Sentinel telling a worker to exit
+
+################################################################################################################
+# STAGE
+################################################################################################################
+
+class Stage:
+    def __init__(self, name: str, handler, workers: int, queue_size: int, batch_size: int = 1):
+        """
+        handler(item, emit) processes one item; emit(result, to=None) sends a result to the next stage
+        (or the stage named to). Exceptions are logged and counted, the worker carries on.
+        With batch_size > 1 the handler gets a list of up to batch_size items instead.
+        """
+
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.pipeline = None
+        self.next = None
+
+        self._threads = []
+        self._lock = threading.Lock()
+        self._local = threading.local() # Per worker: seconds blocked in emit() during the current item
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.peak_depth = 0
+        self.busy_time = 0.0
+        self.idle_time = 0.0
+        self.blocked_time = 0.0
+
+    def put(self, item):
+        """
+        Queue an item for this stage, blocking while the queue is full. Returns the seconds spent blocked.
+        """
+
+        start = time.monotonic()
+        self.queue.put(item)
+        blocked = time.monotonic() - start
+        with self._lock:
+            self.peak_depth = max(self.peak_depth, self.queue.qsize())
+        return blocked
+
+    def emit(self, item, to: str | None = None):
+        target = self.pipeline.stages[to] if to else self.next
+        if target is None:
+            return
+        blocked = target.put(item)
+        self._local.blocked = getattr(self._local, "blocked", 0.0) + blocked
+        with self._lock:
+            self.blocked_time += blocked
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Let the workers finish everything queued, then wait for them to exit.
+        """
+
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _take_batch(self, item) -> tuple[list, bool]:
+        """
+        item plus whatever else is already queued, up to batch_size. Also returns whether a _STOP was taken.
+        """
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            waited = time.monotonic()
+            item = self.queue.get()
+            if item is _STOP:
+                return
+
+            count = 1
+            if self.batch_size > 1:
+                item, stopping = self._take_batch(item)
+                count = len(item)
+
+            start = time.monotonic()
+            self._local.blocked = 0.0
+            with self._lock:
+                self.idle_time += start - waited
+                self.busy += 1
+
+            failed = False
+            try:
+                self.handler(item, self.emit)
+            except Exception as e:
+                failed = True
+                logger.error(f"Pipeline: {self.name}: {e}")
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    # Time blocked in emit() is counted as blocked_time, not busy_time.
+                    self.busy_time += time.monotonic() - start - self._local.blocked
+                    self.processed += count
+                    self.failed += count if failed else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "peak_depth": self.peak_depth,
+                "processed": self.processed,
+                "failed": self.failed,
+                "busy_time": round(self.busy_time, 2),
+                "idle_time": round(self.idle_time, 2),
+                "blocked_time": round(self.blocked_time, 2),
+            }
+
+################################################################################################################
+# PIPELINE
+################################################################################################################
+
+class Pipeline:
+    def __init__(self, stages: list[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self._order = stages
+        for stage, following in zip(stages, stages[1:] + [None]):
+            stage.pipeline = self
+            stage.next = following
+
+    def __enter__(self):
+        for stage in self._order:
+            stage.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def feed(self, items):
+        """
+        Put items into the first stage, blocking while it is full.
+        """
+
+        first = self._order[0]
+        for item in items:
+            first.put(item)
+
+    def close(self):
+        """
+        Drain the stages in order: a stage is only stopped once every stage before it has stopped, so
+        everything emitted downstream is processed.
+        """
+
+        for stage in self._order:
+            stage.stop()
+
+    def stats(self) -> dict:
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def status_line(self) -> str:
+        """
+        Short live view for a progress bar: busy/workers and queue depth per stage.
+        """
+
+        parts = []
+        for name, stage in self.stages.items():
+            s = stage.stats()
+            parts.append(f"{name} {s['busy']}/{s['workers']} q{s['depth']}")
+        return " | ".join(parts)
+
+    def bottleneck(self) -> str | None:
+        """
+        The stage whose workers spent the largest share of their time working, None before any work.
+        """
+
+        best, best_share = None, 0.0
+        for name, stage in self.stages.items():
+            s = stage.stats()
+            total = s["busy_time"] + s["idle_time"] + s["blocked_time"]
+            if total and s["busy_time"] / total > best_share:
+                best, best_share = name, s["busy_time"] / total
+        return best
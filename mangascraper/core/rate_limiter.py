@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# mangascraper/core/rate_limiter.py
+
+import time, threading, asyncio
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import concurrency_controller
+
+# Shared token-bucket rate limiter. Every request to NHentai draws a token before it is sent,
+# so the total request rate is set once (in requests per second) instead of every thread sleeping on its own.
+#
+# Budgets:
+# - "api":     listing / search pages (api.fetch_gallery_ids)
+# - "gallery": gallery metadata (api.fetch_gallery_metadata)
+# - "image":   image fetches (extension download_images_hook)
+# - "total":   optional ceiling shared by all of the above. Metadata requests take tokens from it with priority,
+#              so the image pipeline is never left waiting on metadata that is queued behind image requests.
+#              Only the "total" bucket has this priority lane, so it only applies when --rate-total is set.
+#
+# A rate of 0 means unlimited.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+BUDGET_CONFIG_KEYS = {
+    "api": "rate_limit_api",
+    "gallery": "rate_limit_gallery",
+    "image": "rate_limit_images",
+    "total": "rate_limit_total",
+}
+
+BURST_SECONDS = 1.0 # Bucket capacity, in seconds worth of tokens
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+################################################################################################################
+# TOKEN BUCKET
+################################################################################################################
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Priority callers are served before any normal caller.
+    """
+
+    def __init__(self, name: str, rate: float):
+        self.name = name
+        self._cond = threading.Condition()
+        self._priority_waiting = 0
+        self.set_rate(rate)
+        self.tokens = self.capacity
+
+    def set_rate(self, rate: float):
+        with self._cond:
+            self.rate = max(0.0, float(rate))
+            self.capacity = max(1.0, self.rate * BURST_SECONDS)
+            self.tokens = min(getattr(self, "tokens", self.capacity), self.capacity)
+            self.updated = time.monotonic()
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _time_until_token(self) -> float:
+        return max(0.0, (1.0 - self.tokens) / self.rate) if self.rate > 0 else 0.0
+
+    def _priority_enter(self):
+        """
+        Register a waiting priority caller: normal callers hold off until _priority_exit().
+        """
+
+        with self._cond:
+            self._priority_waiting += 1
+
+    def _priority_exit(self):
+        with self._cond:
+            self._priority_waiting -= 1
+            self._cond.notify_all() # Let normal callers through once priority callers are served
+
+    def try_acquire(self, priority: bool = False) -> float:
+        """
+        Take a token if one is available. Returns 0 on success, otherwise the seconds to wait before trying again.
+        """
+
+        with self._cond:
+            if self.rate <= 0:
+                return 0.0
+
+            self._refill()
+            if self.tokens >= 1.0 and (priority or self._priority_waiting == 0):
+                self.tokens -= 1.0
+                return 0.0
+
+            return max(self._time_until_token(), 0.001)
+
+    def acquire(self, priority: bool = False) -> float:
+        """
+        Block until a token is available. Returns the time spent waiting.
+        """
+
+        start = time.monotonic()
+
+        with self._cond: # Condition's lock is re-entrant, _priority_enter / _priority_exit take it again
+            if self.rate <= 0:
+                return 0.0
+
+            if priority:
+                self._priority_enter()
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1.0 and (priority or self._priority_waiting == 0):
+                        self.tokens -= 1.0
+                        return time.monotonic() - start
+                    self._cond.wait(timeout=max(self._time_until_token(), 0.001))
+            finally:
+                if priority:
+                    self._priority_exit()
+
+################################################################################################################
+# BUDGETS
+################################################################################################################
+
+def _configured_rate(budget: str) -> float:
+    orchestrator.refresh_globals()
+    return float(getattr(orchestrator, BUDGET_CONFIG_KEYS[budget], 0) or 0)
+
+def get_bucket(budget: str) -> TokenBucket:
+    """
+    Return the bucket for a budget, creating it (or updating its rate from config) as needed.
+    """
+
+    if budget not in BUDGET_CONFIG_KEYS:
+        raise ValueError(f"Unknown rate limit budget: {budget}")
+
+    rate = _configured_rate(budget)
+
+    with _buckets_lock:
+        bucket = _buckets.get(budget)
+        if bucket is None:
+            bucket = TokenBucket(budget, rate)
+            _buckets[budget] = bucket
+            log(f"Rate Limiter: '{budget}' budget set to {rate if rate > 0 else 'unlimited'} requests/s", "debug")
+        elif bucket.rate != rate:
+            bucket.set_rate(rate)
+            log(f"Rate Limiter: '{budget}' budget changed to {rate if rate > 0 else 'unlimited'} requests/s", "debug")
+        return bucket
+
+def is_enabled(budget: str) -> bool:
+    return _configured_rate(budget) > 0
+
+def acquire(budget: str, priority: bool = False) -> float:
+    """
+    Block until a request in the given budget may be sent. Returns the time spent waiting.
+    Gallery metadata requests should pass priority=True.
+    Also waits out any global pause started by the concurrency controller.
+    """
+
+    start = time.monotonic()
+    concurrency_controller.wait_if_paused()
+
+    waited = time.monotonic() - start
+    waited += get_bucket(budget).acquire()
+    waited += get_bucket("total").acquire(priority=priority)
+
+    if waited > 1:
+        log(f"Rate Limiter: Waited {waited:.2f}s for '{budget}' token", "debug")
+    return waited
+
+async def acquire_async(budget: str, priority: bool = False) -> float:
+    """
+    Same as acquire(), for the asyncio transport. Never blocks the event loop.
+    """
+
+    start = time.monotonic()
+    await concurrency_controller.wait_if_paused_async()
+
+    for name, use_priority in ((budget, False), ("total", priority)):
+        bucket = get_bucket(name)
+        if use_priority:
+            bucket._priority_enter() # Normal (threaded) callers yield to this one while it waits
+        try:
+            while True:
+                wait = bucket.try_acquire(priority=use_priority)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            if use_priority:
+                bucket._priority_exit()
+
+    return time.monotonic() - start
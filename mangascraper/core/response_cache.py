@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# mangascraper/core/response_cache.py
+
+import re, requests
+
+from datetime import datetime, timezone, timedelta
+from requests.structures import CaseInsensitiveDict
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import database
+from mangascraper.core import rate_limiter
+from mangascraper.core import circuit_breaker
+
+# HTTP response cache for listing / search pages (api.fetch_gallery_ids).
+#
+# Bodies are stored in the database with their ETag / Last-Modified validators. Depending on --cache-policy:
+# - "always-revalidate": every request is sent, conditionally. A 304 is answered from the cache.
+# - "prefer-cache":      cached pages are used without a request until they expire (Cache-Control max-age,
+#                        or DEFAULT_TTL), then revalidated.
+# - "offline":           only the cache is used, nothing is sent.
+#
+# Responses served without a request have cache_status "hit", revalidated ones "revalidated".
+#
+# Expired entries are kept (their validators still save a full download, and "offline" serves them), but prune()
+# drops pages no crawl has fetched or revalidated in RETENTION_DAYS and caps the table at MAX_ENTRIES pages.
+# build_gallery_list calls it once the query crawls are done.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+CACHE_POLICIES = ("always-revalidate", "prefer-cache", "offline")
+
+DEFAULT_TTL = timedelta(hours=12) # Used when the server doesn't send Cache-Control max-age
+
+RETENTION_DAYS = 30  # Pages untouched for this long are dropped by prune()
+MAX_ENTRIES = 50000  # Most recently fetched pages kept by prune(), more than a full --archive-all crawl
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _expires_at(resp) -> str:
+    """
+    Expiry time for a response: Cache-Control max-age if present, otherwise DEFAULT_TTL.
+    """
+
+    ttl = DEFAULT_TTL
+    match = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+    if match:
+        ttl = timedelta(seconds=int(match.group(1)))
+    return (datetime.now(timezone.utc) + ttl).isoformat()
+
+def _is_fresh(entry: dict) -> bool:
+    try:
+        return datetime.fromisoformat(entry["expires_at"]) > datetime.now(timezone.utc)
+    except (TypeError, ValueError):
+        return False
+
+def _build_response(url: str, entry: dict, cache_status: str, source=None):
+    """
+    Build a requests.Response from a cache entry, so callers can't tell the difference.
+    """
+
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = url
+    resp._content = entry["body"]
+    resp.encoding = "utf-8"
+    resp.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+    if entry.get("etag"):
+        resp.headers["ETag"] = entry["etag"]
+    if entry.get("last_modified"):
+        resp.headers["Last-Modified"] = entry["last_modified"]
+    resp.elapsed = source.elapsed if source is not None else timedelta(0)
+    resp.cache_status = cache_status
+    return resp
+
+def _conditional_headers(entry: dict) -> dict:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def get(session, url: str, budget: str = "api", **kwargs):
+    """
+    GET a listing page through the response cache. Draws a rate limiter token only if a request is sent.
+    Returns a requests.Response, or None if the page isn't cached and --cache-policy is "offline".
+    Raises circuit_breaker.CircuitOpenError if the host stays down.
+    """
+
+    orchestrator.refresh_globals()
+
+    policy = orchestrator.cache_policy
+    entry = database.get_cached_response(url)
+
+    if entry is not None and (policy == "offline" or (policy == "prefer-cache" and _is_fresh(entry))):
+        log(f"Response Cache: Hit for {url}", "debug")
+        return _build_response(url, entry, "hit")
+
+    if policy == "offline":
+        log(f"Response Cache: Miss for {url} (offline)", "debug")
+        return None
+
+    headers = _conditional_headers(entry) if entry is not None else {}
+
+    # Park while the host is down rather than burning retries (raises CircuitOpenError if it stays down).
+    circuit_breaker.check(url, park=True)
+    rate_limiter.acquire(budget)
+    resp = circuit_breaker.get(session, url, headers=headers, **kwargs)
+
+    if resp.status_code == 304 and entry is not None:
+        database.touch_cached_response(url, _expires_at(resp))
+        log(f"Response Cache: Not modified, using cached {url}", "debug")
+        return _build_response(url, entry, "revalidated", source=resp)
+
+    if resp.status_code == 200:
+        database.cache_response(
+            url,
+            resp.content,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            expires_at=_expires_at(resp),
+        )
+
+    resp.cache_status = None
+    return resp
+
+def prune() -> int:
+    """
+    Drop pages older than RETENTION_DAYS and all but the MAX_ENTRIES most recent. Returns how many were dropped.
+    """
+
+    pruned = database.prune_cached_responses(max_age_days=RETENTION_DAYS, max_rows=MAX_ENTRIES)
+    if pruned:
+        log(f"Response Cache: Pruned {pruned} cached pages", "debug")
+    return pruned
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# mangascraper/core/session_pool.py
+
+import threading, concurrent.futures, cloudscraper, requests
+
+from urllib.parse import urlparse
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import tor_circuits
+
+# Connection pool management for the global cloudscraper session built in api.get_session().
+#
+# - size_session_pools() resizes the session's adapters so every image thread can keep its own
+#   connection alive (urllib3 defaults to 10 per host, which discards connections above --threads-images 10).
+# - worker_session() hands each thread its own session object. Worker sessions share the global session's
+#   cookie jar (so Cloudflare clearance is shared), headers, proxies and adapters (so they share one pool).
+#   With Tor, each worker session is routed through its thread's isolated circuit (tor_circuits).
+# - prewarm_connections() opens connections to the API host and image mirror before the first batch,
+#   so the TLS handshakes aren't paid on the first gallery.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+MIN_POOL_SIZE = 10 # urllib3 default, never go below it
+MAX_PREWARM_CONNECTIONS = 32 # Cap on connections opened per host when pre-warming
+PREWARM_TIMEOUT = (10, 10)
+
+_worker_sessions = threading.local()
+
+################################################################################################################
+# POOL SIZING
+################################################################################################################
+
+def pool_size() -> int:
+    """
+    Connections needed per host: one per image thread of every gallery thread,
+    plus one per gallery thread for metadata requests.
+    """
+
+    orchestrator.refresh_globals()
+
+    size = (orchestrator.threads_galleries * orchestrator.threads_images) + orchestrator.threads_galleries
+    return max(MIN_POOL_SIZE, size)
+
+def pool_hosts() -> int:
+    """
+    Number of hosts a pool is kept for (API host + image mirrors).
+    """
+
+    orchestrator.refresh_globals()
+
+    return max(MIN_POOL_SIZE, len(orchestrator.nhentai_mirrors) + 1)
+
+def size_session_pools(session):
+    """
+    Resize every adapter mounted on a session (including cloudscraper's CipherSuiteAdapter,
+    which must be kept so the TLS fingerprint doesn't change).
+    """
+
+    size = pool_size()
+    hosts = pool_hosts()
+
+    for prefix, adapter in session.adapters.items():
+        if not isinstance(adapter, requests.adapters.HTTPAdapter):
+            continue # HTTP/2 adapters (http2_transport) manage their own connections
+        adapter._pool_connections = hosts
+        adapter._pool_maxsize = size
+        adapter._pool_block = False
+        adapter.init_poolmanager(hosts, size, block=False)
+
+        # Proxy (Tor) pools are created lazily from the attributes above, drop any made before resizing.
+        for manager in adapter.proxy_manager.values():
+            manager.clear()
+        adapter.proxy_manager.clear()
+
+    log(f"Session Pool: Sized connection pools to {size} connections across {hosts} hosts.", "debug")
+
+def drop_idle_connections(session):
+    """
+    Close the session's idle proxy (Tor) connections, keeping the session and its adapters.
+    Used after a Tor identity change: pooled connections stay on their old circuits until closed.
+    Connections in use finish their request and are closed when returned.
+    """
+
+    if session is None:
+        return
+
+    dropped = 0
+    for adapter in set(session.adapters.values()):
+        if hasattr(adapter, "reset"):
+            adapter.reset() # HTTP/2 adapter, new clients for new requests
+            dropped += 1
+            continue
+        for manager in adapter.proxy_manager.values():
+            manager.clear()
+            dropped += 1
+
+    log(f"Session Pool: Dropped idle connections from {dropped} proxy pool(s).", "debug")
+
+def drop_proxy_pools(session, proxy: str):
+    """
+    Remove the connection pools every adapter keeps for one proxy (a retired Tor circuit), closing their idle
+    connections. Connections in use are closed when returned.
+    """
+
+    for adapter in set(session.adapters.values()):
+        if hasattr(adapter, "drop_proxy"):
+            adapter.drop_proxy(proxy) # HTTP/2 adapter
+            continue
+        manager = adapter.proxy_manager.pop(proxy, None)
+        if manager is not None:
+            manager.clear()
+
+    log(f"Session Pool: Dropped connection pools for retired proxy {proxy}", "debug")
+
+################################################################################################################
+# WORKER SESSIONS
+################################################################################################################
+
+def worker_session(base_session):
+    """
+    Return the calling thread's session, derived from base_session.
+    A new worker session is made if the base session has been rebuilt since this thread last asked.
+    """
+
+    # Retired Tor circuits are never used again, don't keep their pools in the shared adapters.
+    for proxy in tor_circuits.take_retired_proxies():
+        drop_proxy_pools(base_session, proxy)
+
+    entry = getattr(_worker_sessions, "entry", None)
+    if entry is not None and entry[0] is base_session:
+        return tor_circuits.apply(entry[1])
+
+    # Shares cookies, headers, hooks and proxies with the base session.
+    session = cloudscraper.create_scraper(sess=base_session)
+
+    # Share the base session's (sized) adapters so all workers draw from one connection pool.
+    for prefix, adapter in base_session.adapters.items():
+        session.mount(prefix, adapter)
+
+    _worker_sessions.entry = (base_session, session)
+    log(f"Session Pool: Created worker session for {threading.current_thread().name}", "debug")
+    return tor_circuits.apply(session)
+
+################################################################################################################
+# PRE-WARMING
+################################################################################################################
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}/"
+
+def prewarm_connections(session):
+    """
+    Open connections to the API host and the primary image mirror ahead of the first batch.
+    Connections are returned to the pool and reused by the first galleries.
+    """
+
+    orchestrator.refresh_globals()
+
+    if session is None or orchestrator.dry_run:
+        return
+
+    image_connections = min(MAX_PREWARM_CONNECTIONS, orchestrator.threads_galleries * orchestrator.threads_images)
+    api_connections = min(MAX_PREWARM_CONNECTIONS, orchestrator.threads_galleries)
+
+    targets = {_origin(orchestrator.nhentai_api_base): api_connections}
+    if orchestrator.nhentai_mirrors:
+        image_origin = _origin(orchestrator.nhentai_mirrors[0])
+        targets[image_origin] = targets.get(image_origin, 0) + image_connections
+
+    def _warm(origin):
+        try:
+            session.head(origin, timeout=PREWARM_TIMEOUT, allow_redirects=False)
+            return True
+        except Exception as e:
+            log(f"Session Pool: Pre-warm request to {origin} failed: {e}", "debug")
+            return False
+
+    total = sum(targets.values())
+    # All requests run at once, otherwise they'd just reuse the same connection.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, total)) as executor:
+        futures = [
+            executor.submit(_warm, origin)
+            for origin, count in targets.items()
+            for _ in range(count)
+        ]
+        warmed = sum(1 for f in concurrent.futures.as_completed(futures) if f.result())
+
+    log(f"Session Pool: Pre-warmed {warmed}/{total} connections to {', '.join(targets)}", "debug")
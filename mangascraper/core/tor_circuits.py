@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# mangascraper/core/tor_circuits.py
+
+import threading, itertools, statistics
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Pool of stream-isolated Tor circuits for worker sessions.
+#
+# Tor puts streams with different SOCKS credentials on different circuits (IsolateSOCKSAuth, on by default),
+# so each circuit here is just a username / password pair on the usual SocksPort. Worker threads are
+# assigned circuits round-robin (session_pool.worker_session), which spreads traffic over --tor-circuits
+# circuits instead of one.
+#
+# Downloads report their throughput per circuit. A circuit that falls well behind the others is retired:
+# its credentials change, so Tor builds a fresh circuit for the threads using it. The old proxy URL is queued
+# (take_retired_proxies) so session_pool can drop the connection pools the session's adapters keep for it.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+TOR_SOCKS_ADDRESS = "127.0.0.1:9050"
+
+EWMA_ALPHA = 0.2
+MIN_SAMPLES = 5 # Transfers a circuit needs before it can be judged
+RETIRE_FRACTION = 0.25 # Retire circuits slower than this fraction of the median circuit
+
+_generations = {} # circuit index -> credential generation
+_stats = {} # circuit index -> {"throughput": EWMA bytes/s, "samples": int}
+_retired_proxies = [] # Proxy URLs of retired circuits, not yet dropped from the session's adapters
+_lock = threading.Lock()
+
+_assignments = itertools.count()
+_local = threading.local()
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def is_enabled() -> bool:
+    orchestrator.refresh_globals()
+    return bool(orchestrator.use_tor) and orchestrator.tor_circuits > 1
+
+def proxy_url(index: int | None = None) -> str:
+    """
+    SOCKS proxy URL for a circuit. index None is the shared (non-isolated) circuit.
+    """
+
+    if index is None:
+        return f"socks5h://{TOR_SOCKS_ADDRESS}"
+
+    with _lock:
+        generation = _generations.setdefault(index, 0)
+    return _proxy_url(index, generation)
+
+def _proxy_url(index: int, generation: int) -> str:
+    return f"socks5h://mangascraper-{index}:{generation}@{TOR_SOCKS_ADDRESS}"
+
+def current_circuit() -> int | None:
+    """
+    The calling thread's circuit, assigning one on first use. None if the pool is disabled.
+    """
+
+    if not is_enabled():
+        return None
+
+    index = getattr(_local, "index", None)
+    if index is None or index >= orchestrator.tor_circuits:
+        index = next(_assignments) % orchestrator.tor_circuits
+        _local.index = index
+        log(f"Tor Circuits: {threading.current_thread().name} assigned circuit {index}", "debug")
+    return index
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def apply(session):
+    """
+    Route a worker session through the calling thread's circuit (no-op unless Tor and the pool are enabled).
+    Called every time a worker session is handed out, so retired circuits are picked up straight away.
+    """
+
+    index = current_circuit()
+    if index is None:
+        return session
+
+    proxy = proxy_url(index)
+    if session.proxies.get("https") != proxy:
+        session.proxies = {"http": proxy, "https": proxy}
+    return session
+
+def record_transfer(nbytes: int, seconds: float):
+    """
+    Report a completed transfer on the calling thread's circuit.
+    """
+
+    index = getattr(_local, "index", None)
+    if index is None or not nbytes or seconds <= 0 or not is_enabled():
+        return
+
+    rate = nbytes / seconds
+    with _lock:
+        stats = _stats.setdefault(index, {"throughput": None, "samples": 0})
+        stats["throughput"] = rate if stats["throughput"] is None else (EWMA_ALPHA * rate) + ((1 - EWMA_ALPHA) * stats["throughput"])
+        stats["samples"] += 1
+
+        judged = [s["throughput"] for s in _stats.values() if s["samples"] >= MIN_SAMPLES]
+        if stats["samples"] < MIN_SAMPLES or len(judged) < 2:
+            return
+
+        median = statistics.median(judged)
+        if stats["throughput"] >= median * RETIRE_FRACTION:
+            return
+
+        _retire(index, f"{stats['throughput'] / 1024:.1f} KiB/s vs median {median / 1024:.1f} KiB/s")
+
+def _retire(index: int, reason: str):
+    # Caller holds _lock
+    generation = _generations.get(index, 0)
+    _retired_proxies.append(_proxy_url(index, generation))
+    _generations[index] = generation + 1
+    _stats.pop(index, None)
+    logger.info(f"Tor Circuits: Retiring circuit {index} ({reason}), switching to a new one.")
+
+def retire(index: int, reason: str = "requested"):
+    with _lock:
+        _retire(index, reason)
+
+def take_retired_proxies() -> list[str]:
+    """
+    Proxy URLs of circuits retired since the last call.
+    """
+
+    with _lock:
+        retired = _retired_proxies[:]
+        _retired_proxies.clear()
+    return retired
+
+def summary() -> dict:
+    with _lock:
+        return {
+            index: {
+                "generation": _generations.get(index, 0),
+                "throughput": stats["throughput"],
+                "samples": stats["samples"],
+            }
+            for index, stats in _stats.items()
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# mangascraper/core/tor_control.py
+
+import os, socket
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Minimal Tor control port client, used to rotate the Tor identity with SIGNAL NEWNYM.
+#
+# NEWNYM makes Tor stop putting new streams on its existing circuits, so the next connections leave through
+# new exits. That is far cheaper than rebuilding the HTTP session (and its Cloudflare clearance / TLS pool),
+# which is what a "Tor rotate" used to mean. Only new connections are affected, so callers should drop their
+# idle pooled connections afterwards (api.rotate_tor_identity does).
+#
+# Authentication, in order: TOR_CONTROL_PASSWORD (HashedControlPassword), the control auth cookie
+# (CookieAuthentication), then no authentication. Anything going wrong returns False, so callers can fall
+# back to rebuilding the session.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+TOR_CONTROL_ADDRESS = ("127.0.0.1", 9051)
+TOR_COOKIE_PATHS = [
+    "/run/tor/control.authcookie",
+    "/var/run/tor/control.authcookie",
+    "/var/lib/tor/control_auth_cookie",
+]
+
+CONTROL_TIMEOUT = 5 # Seconds
+NEWNYM_INTERVAL = 10 # Tor ignores NEWNYM signals sent more often than this (seconds)
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def _authenticate_command() -> str:
+    password = os.getenv("TOR_CONTROL_PASSWORD")
+    if password:
+        escaped = password.replace("\\", "\\\\").replace('"', '\\"')
+        return f'AUTHENTICATE "{escaped}"'
+
+    for path in TOR_COOKIE_PATHS:
+        try:
+            with open(path, "rb") as f:
+                return f"AUTHENTICATE {f.read().hex()}"
+        except OSError:
+            continue
+
+    return "AUTHENTICATE"
+
+def _send(conn, reader, command: str) -> tuple[int, str]:
+    """
+    Send one command and read its (possibly multi-line) reply. Returns (status code, last line).
+    """
+
+    conn.sendall(f"{command}\r\n".encode())
+
+    while True:
+        line = reader.readline().decode(errors="replace").rstrip("\r\n")
+        if not line:
+            raise ConnectionError("Control port closed the connection")
+        # "250-" / "250+" continue the reply, "250 " ends it.
+        if len(line) >= 4 and line[3] == " ":
+            return int(line[:3]), line[4:]
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def signal_newnym() -> bool:
+    """
+    Ask Tor for a new identity. Returns True if Tor accepted the signal.
+    """
+
+    orchestrator.refresh_globals()
+
+    try:
+        with socket.create_connection(TOR_CONTROL_ADDRESS, timeout=CONTROL_TIMEOUT) as conn:
+            reader = conn.makefile("rb")
+
+            code, message = _send(conn, reader, _authenticate_command())
+            if code != 250:
+                logger.warning(f"Tor Control: Authentication failed ({code} {message})")
+                return False
+
+            code, message = _send(conn, reader, "SIGNAL NEWNYM")
+            if code != 250:
+                logger.warning(f"Tor Control: NEWNYM refused ({code} {message})")
+                return False
+
+            conn.sendall(b"QUIT\r\n")
+    except (OSError, ValueError) as e:
+        log(f"Tor Control: Control port {TOR_CONTROL_ADDRESS[0]}:{TOR_CONTROL_ADDRESS[1]} unavailable: {e}", "debug")
+        return False
+
+    logger.info("Tor Control: Requested a new Tor identity (NEWNYM).")
+    return True
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# mangascraper/core/transfer.py
+
+import os, re, time
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+from mangascraper.core import adaptive_timeouts
+from mangascraper.core import transfer_watchdog
+
+# Resumable, atomic image writes for the download hooks.
+#
+# Pages are streamed to "<path>.part" and only renamed to <path> once the body is complete (checked against
+# Content-Length / Content-Range), so a file at <path> is always a finished page and the "already downloaded"
+# checks can trust it. If a transfer is cut off, the .part file is kept and the next attempt asks for the rest
+# with a Range request. Servers that ignore Range (200 instead of 206) just send the whole page again.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 8192
+
+class IncompleteTransferError(IOError):
+    """
+    The response body ended before the length the server announced. The .part file is kept for resuming.
+    """
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def part_path(path: str) -> str:
+    return path + PART_SUFFIX
+
+def _expected_length(resp, offset: int) -> int | None:
+    """
+    Final size of the file, if the server said. None if unknown (or the body is content-encoded).
+    """
+
+    if resp.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+
+    if resp.status_code == 206:
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", resp.headers.get("Content-Range", ""))
+        if match and match.group(3) != "*":
+            return int(match.group(3))
+
+    length = resp.headers.get("Content-Length")
+    if length is not None and length.isdigit():
+        return int(length) + offset
+    return None
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+def resume_headers(path: str) -> dict:
+    """
+    Range header to continue a partial download of path, if there is one.
+    """
+
+    part = part_path(path)
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset:
+        log(f"Transfer: Resuming {path} from byte {offset}", "debug")
+        return {"Range": f"bytes={offset}-"}
+    return {}
+
+def write_response(resp, path: str) -> int:
+    """
+    Stream a (stream=True) response into path's .part file, then move it into place.
+    Handles 206 continuations of an existing .part file and servers that ignore Range.
+    Returns the number of bytes received. Raises IncompleteTransferError if the body was cut short,
+    or transfer_watchdog.StalledTransferError if the watchdog aborted it (the .part file is kept either way).
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part = part_path(path)
+
+    offset = 0
+    mode = "wb"
+    if resp.status_code == 206:
+        existing = os.path.getsize(part) if os.path.exists(part) else 0
+        match = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+        start = int(match.group(1)) if match else None
+        if start is not None and start == existing:
+            offset = existing
+            mode = "ab" if existing else "wb"
+        else:
+            # Continuation doesn't line up with what we have (or the .part file is gone): drop both, so the
+            # retry finds no .part file and asks for the whole page without a Range header.
+            resp.close()
+            discard_partial(path)
+            raise IncompleteTransferError(
+                f"Range response for {path} starts at byte {start}, partial file has {existing}, restarting"
+            )
+
+    expected = _expected_length(resp, offset)
+
+    nbytes = 0
+    start = last_chunk = time.monotonic()
+    max_gap = 0.0
+    with transfer_watchdog.watch(resp, path) as watched, open(part, mode) as f:
+        try:
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    now = time.monotonic()
+                    max_gap = max(max_gap, now - last_chunk)
+                    last_chunk = now
+                    f.write(chunk)
+                    nbytes += len(chunk)
+                    watched.add(len(chunk))
+        except Exception as e:
+            if watched.stalled:
+                raise transfer_watchdog.StalledTransferError(f"Transfer of {path} stalled after {offset + nbytes} bytes") from e
+            raise
+
+    if watched.stalled:
+        raise transfer_watchdog.StalledTransferError(f"Transfer of {path} stalled after {offset + nbytes} bytes")
+
+    adaptive_timeouts.record_transfer(nbytes, time.monotonic() - start, max_gap)
+
+    size = offset + nbytes
+    if expected is not None and size != expected:
+        if size > expected:
+            os.remove(part) # Not something a retry can continue from
+        raise IncompleteTransferError(f"Received {size} of {expected} bytes for {path}")
+
+    os.replace(part, path)
+    return nbytes
+
+def write_bytes(path: str, data: bytes):
+    """
+    Write a complete body to path atomically (via the .part file).
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part = part_path(path)
+    with open(part, "wb") as f:
+        f.write(data)
+    os.replace(part, path)
+
+def discard_partial(path: str):
+    """
+    Remove a .part file that can't be resumed (e.g. the server answered 416).
+    """
+
+    try:
+        os.remove(part_path(path))
+    except FileNotFoundError:
+        pass
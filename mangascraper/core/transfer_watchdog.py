@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# mangascraper/core/transfer_watchdog.py
+
+import time, socket, threading
+
+from collections import deque
+from contextlib import contextmanager
+
+from mangascraper.core import orchestrator
+from mangascraper.core.orchestrator import *
+
+# Stalled-transfer watchdog for image bodies.
+#
+# A connection that trickles a few bytes at a time never hits the read timeout (urllib3 keeps reading until a
+# whole chunk has arrived), so it can hold an image worker for minutes. Transfers streamed by
+# transfer.write_response() are registered here, and a background thread checks their throughput over the last
+# --stall-seconds. One below --min-transfer-rate is aborted: its socket is shut down, which wakes the blocked
+# read, and write_response() raises StalledTransferError. The download hooks then move on to the next mirror
+# (and Tor circuit), resuming from the .part file.
+
+################################################################################################################
+# GLOBAL VARIABLES
+################################################################################################################
+
+CHECK_INTERVAL = 1.0 # Seconds between watchdog checks
+
+_transfers = set()
+_lock = threading.Lock()
+_thread = None
+
+class StalledTransferError(IOError):
+    """
+    A transfer was aborted for staying below the minimum transfer rate.
+    """
+
+################################################################################################################
+# WATCHED TRANSFER
+################################################################################################################
+
+class WatchedTransfer:
+    def __init__(self, resp, label: str):
+        self.resp = resp
+        self.label = label
+        self.started = time.monotonic()
+        self.total = 0
+        self.samples = deque([(self.started, 0)]) # (time, total bytes)
+        self.stalled = False
+
+    def add(self, nbytes: int):
+        self.total += nbytes
+        self.samples.append((time.monotonic(), self.total))
+
+    def rate(self, window: float) -> float | None:
+        """
+        Bytes per second over the last window seconds, None until the transfer is that old.
+        """
+
+        now = time.monotonic()
+        if now - self.started < window:
+            return None
+
+        # Keep one sample at or before the window start as the baseline.
+        while len(self.samples) > 1 and self.samples[1][0] <= now - window:
+            self.samples.popleft()
+        return (self.total - self.samples[0][1]) / window
+
+    def abort(self, reason: str):
+        self.stalled = True
+        logger.warning(f"Transfer Watchdog: Aborting {self.label} ({reason})")
+
+        # Shutting the socket down wakes a read blocked on it; closing alone may not.
+        # Raw responses without a socket of their own (http2_transport) provide an abort() hook instead.
+        raw = getattr(self.resp, "raw", None)
+        if callable(getattr(raw, "abort", None)):
+            raw.abort()
+        for path in (("_connection", "sock"), ("_fp", "fp", "raw", "_sock")):
+            sock = raw
+            for attr in path:
+                sock = getattr(sock, attr, None)
+            if isinstance(sock, socket.socket):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                break
+
+        try:
+            self.resp.close()
+        except Exception:
+            pass
+
+################################################################################################################
+# HELPERS
+################################################################################################################
+
+def is_enabled() -> bool:
+    orchestrator.refresh_globals()
+    return orchestrator.min_transfer_rate > 0 and orchestrator.stall_seconds > 0
+
+def _watch_loop():
+    while True:
+        time.sleep(CHECK_INTERVAL)
+
+        floor = orchestrator.min_transfer_rate * 1024
+        window = orchestrator.stall_seconds
+        with _lock:
+            transfers = list(_transfers)
+
+        for transfer in transfers:
+            if transfer.stalled:
+                continue
+            rate = transfer.rate(window)
+            if rate is not None and rate < floor:
+                transfer.abort(f"{rate / 1024:.1f} KiB/s over the last {window}s, minimum {orchestrator.min_transfer_rate:g} KiB/s")
+
+def _ensure_thread():
+    global _thread
+
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_watch_loop, name="transfer-watchdog", daemon=True)
+            _thread.start()
+
+################################################################################################################
+# PUBLIC API
+################################################################################################################
+
+@contextmanager
+def watch(resp, label: str):
+    """
+    Watch a streamed response while the block reads it. Yields a WatchedTransfer to report bytes with .add();
+    check .stalled afterwards (the read may end early or raise once the watchdog aborts it).
+    """
+
+    if not is_enabled():
+        yield WatchedTransfer(resp, label)
+        return
+
+    _ensure_thread()
+    transfer = WatchedTransfer(resp, label)
+    with _lock:
+        _transfers.add(transfer)
+    try:
+        yield transfer
+    finally:
+        with _lock:
+            _transfers.discard(transfer)
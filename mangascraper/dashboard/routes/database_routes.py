@@ -6,6 +6,7 @@ import os, time, random
 from flask import Blueprint, jsonify, request
 
 from mangascraper.core import database
+from mangascraper.core.api import get_cached_gallery_metadata, fetch_gallery_metadata
 
 db_bp = Blueprint("database", __name__)
 
@@ -18,4 +19,13 @@ def list_all():
 @db_bp.route("/get/<int:gallery_id>", methods=["GET"])
 def get_gallery(gallery_id):
     status = database.get_gallery_status(gallery_id)
-    return jsonify({"gallery_id": gallery_id, "status": status})
\ No newline at end of file
+    return jsonify({"gallery_id": gallery_id, "status": status})
+
+@db_bp.route("/metadata/<int:gallery_id>", methods=["GET"])
+def get_gallery_metadata(gallery_id):
+    """Return a gallery's metadata from the local cache. Pass ?fetch=1 to fetch it from the API if it isn't cached."""
+    meta = get_cached_gallery_metadata(gallery_id)
+    cached = meta is not None
+    if not cached and request.args.get("fetch") in ("1", "true"):
+        meta = fetch_gallery_metadata(gallery_id)
+    return jsonify({"gallery_id": gallery_id, "cached": cached, "metadata": meta})
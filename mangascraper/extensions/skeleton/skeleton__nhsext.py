@@ -5,7 +5,16 @@ import os, time, json, requests, math
 
 from mangascraper.core import orchestrator
 from mangascraper.core.orchestrator import *
-from mangascraper.core.api import get_session, get_meta_tags, make_filesystem_safe, clean_title, dynamic_sleep
+from mangascraper.core.api import get_session, get_worker_session, rotate_tor_identity, get_meta_tags, make_filesystem_safe, clean_title, dynamic_sleep
+from mangascraper.core import rate_limiter
+from mangascraper.core import concurrency_controller
+from mangascraper.core import mirror_registry
+from mangascraper.core import tor_circuits
+from mangascraper.core import circuit_breaker
+from mangascraper.core import hedging
+from mangascraper.core import transfer
+from mangascraper.core import adaptive_timeouts
+from mangascraper.core import transfer_watchdog
 
 # This is a skeleton/example extension for manga-scraper. It is also used as the default extension if none is specified.
 
@@ -265,26 +274,50 @@ def download_images_hook(gallery, page, urls, path, downloader_session, pbar=Non
         for url in mirrors:
             for attempt in range(1, retries + 1):
                 try:
-                    r = session.get(url, timeout=(60, 60), stream=True)
+                    circuit_breaker.check(url) # Fail fast on a mirror that's down, try the next one
+                    rate_limiter.acquire("image")
+                    start = time.monotonic()
+                    alternates = [m for m in mirrors if m != url]
+                    headers = transfer.resume_headers(path) # Continue a partial download from a previous attempt
+                    r, served_url = hedging.get(session, url, alternates, headers=headers, timeout=adaptive_timeouts.timeout("image"), stream=True)
                     if r.status_code == 429:
-                        wait = 2 ** attempt
+                        mirror_registry.record(served_url, False)
+                        wait = concurrency_controller.throttle_wait(r, 2 ** attempt)
                         logger.warning(f"429 rate limit hit for {url}, waiting {wait}s")
-                        time.sleep(wait)
+                        concurrency_controller.backoff("image", r.status_code, wait)
                         continue
+                    if r.status_code == 416:
+                        transfer.discard_partial(path) # Partial file doesn't match the image, start over
                     r.raise_for_status()
+                    concurrency_controller.record("image", r.status_code, r.elapsed.total_seconds())
+                    adaptive_timeouts.record_latency("image", r.elapsed.total_seconds())
 
-                    os.makedirs(os.path.dirname(path), exist_ok=True)
-                    with open(path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
+                    # Written to a .part file and renamed once complete, so a file at path is always whole.
+                    nbytes = transfer.write_response(r, path)
+                    mirror_registry.record(served_url, True, time.monotonic() - start, nbytes)
+                    tor_circuits.record_transfer(nbytes, time.monotonic() - start)
 
                     log(f"Downloaded Gallery {gallery}: Page {page} -> {path}", "debug")
                     if pbar and creator:
                         pbar.set_postfix_str(f"Creator: {creator}")
                     return True
 
+                except circuit_breaker.CircuitOpenError as e:
+                    log(f"Gallery {gallery}: Page {page}: {e}", "debug")
+                    break
+
+                except transfer_watchdog.StalledTransferError as e:
+                    # Don't keep retrying a trickling mirror / circuit, resume from the .part file on the next one.
+                    mirror_registry.record(served_url, False)
+                    index = tor_circuits.current_circuit()
+                    if index is not None:
+                        tor_circuits.retire(index, "stalled transfer")
+                    logger.warning(f"Gallery {gallery}: Page {page}: {e}, trying next mirror")
+                    break
+
                 except Exception as e:
+                    mirror_registry.record(url, False)
+                    adaptive_timeouts.record_error("image", e)
                     wait = dynamic_sleep("image", attempt=attempt)
                     log_clarification()
                     logger.warning(
@@ -300,12 +333,13 @@ def download_images_hook(gallery, page, urls, path, downloader_session, pbar=Non
     # First attempt: normal retries
     success = try_download(downloader_session, urls, orchestrator.max_retries)
 
-    # If still failed, rebuild Tor session once and retry
+    # If still failed, rotate Tor identity once and retry
     if not success and orchestrator.use_tor:
         logger.warning(
             f"Gallery {gallery}: Page {page}: All retries failed, rotating Tor node and retrying once more..."
         )
-        downloader_session = get_session(referrer=f"{EXTENSION_NAME}", status="rebuild")
+        rotate_tor_identity(referrer=f"{EXTENSION_NAME}")
+        downloader_session = get_worker_session(referrer=f"{EXTENSION_NAME}")
         success = try_download(downloader_session, urls, 1, tor_rotate=True)
 
     if not success: